@@ -1,5 +1,4 @@
 from typing import Optional
-from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict  # type: ignore
 
 
@@ -7,26 +6,101 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
     DEFAULT_CITY: str = "nyc"
+    CITY_PROVIDERS: Optional[str] = None  # extra providers: "code=package.module:Class,..."
     HOME_ADDRESS: Optional[str] = None
 
     GOOGLE_CALENDAR_ICS_URL: Optional[str] = None
+    CALENDAR_ICS_URLS: Optional[str] = None  # more ICS feeds, comma-separated; merged with the one above
+    CALENDAR_FEED_DEADLINE_SECONDS: float = 3.0  # slower feeds serve their previous events meanwhile
     GOOGLE_MAPS_API_KEY: Optional[str] = None
     OPENWEATHER_API_KEY: Optional[str] = None
     MTA_API_KEY: Optional[str] = None
 
-    REQUEST_TIMEOUT_SECONDS: float = 3.0
+    REQUEST_TIMEOUT_SECONDS: float = 3.0  # ceiling for adaptive per-upstream timeouts
+    ADAPTIVE_TIMEOUT_MIN_SECONDS: float = 0.5
+    ADAPTIVE_TIMEOUT_PERCENTILE: float = 0.95
+    ADAPTIVE_TIMEOUT_MULTIPLIER: float = 2.0
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_SECONDS: float = 30.0
+    NOMINATIM_RATE_PER_SECOND: float = 1.0  # usage policy: max 1 req/s
+    NOMINATIM_BURST: int = 1
+    OVERPASS_RATE_PER_SECOND: float = 1.0
+    OVERPASS_BURST: int = 2  # public instance slot count
+    RATE_LIMIT_MAX_QUEUE: int = 32
+    RATE_LIMIT_MAX_WAIT_SECONDS: float = 10.0
+    DIRECTIONS_MODES: str = "transit,walking,driving"  # fetched concurrently
+    DIRECTIONS_DEADLINE_SECONDS: float = 3.0  # per-mode cap on top of the adaptive timeout
+    GEOCODE_STRATEGY: str = "hedged"  # "sequential", "hedged" or "race"
+    GEOCODE_HEDGE_DELAY_SECONDS: Optional[float] = None  # default: observed Google p90
+    GAZETTEER_PATH: Optional[str] = None  # built by `python -m app.services.gazetteer`; checked before remote geocoders
+    GAZETTEER_MIN_SIMILARITY: float = 0.75  # trigram (Dice) score a fuzzy local match needs
     WEATHER_UNITS: str = "metric"  # or "imperial"
+    WEATHER_TILE_DEG: float = 0.1  # corridor points in the same tile share one forecast
+    WEATHER_CORRIDOR_STEP_KM: float = 2.0
     OSM_OVERPASS_URL: str = "https://overpass-api.de/api/interpreter"
+    OVERPASS_BATCH_SIZE: int = 25  # venues merged into one union query
+    DEM_PATH: Optional[str] = None  # uncompressed EPSG:4326 GeoTIFF or .flt/.bil + .hdr; unset disables slope analysis
+    DEM_CITATION: Optional[str] = None  # source of the elevation data, cited by the slope bullet
+    SLOPE_MAX_GRADE_PCT: float = 8.33  # 1:12, the steepest ramp ADA allows
+    SLOPE_SAMPLE_METERS: float = 10.0  # walking legs are sampled at this spacing
+    SLOPE_SUSTAINED_METERS: float = 50.0  # window for the sustained grade
 
-    MOCK_MODE: bool = True
-    LOG_LEVEL: str = "INFO"
+    LLM_PROMPT_FORMAT: str = "compact"  # or "json" (full model_dump)
+    LLM_PROMPT_TOKEN_BUDGET: int = 400  # tokens of the compact context part, legend included; 0 disables trimming
+
+    SESSION_MAX_SESSIONS: int = 10000
+    SESSION_TTL_SECONDS: float = 24 * 3600
+    SESSION_MAX_BYTES: int = 64 * 1024 * 1024
+
+    HISTORY_DB_PATH: Optional[str] = None  # e.g. "data/history.sqlite3"; unset disables history
+    HISTORY_BATCH_SIZE: int = 50
+    HISTORY_FLUSH_SECONDS: float = 0.5
+
+    LAST_GOOD_DB_PATH: Optional[str] = None  # e.g. "data/last_good.sqlite3"; unset keeps last-known-good data in memory only
+    LAST_GOOD_MAX_AGE_SECONDS: float = 24 * 3600  # older snapshots are never served
+    LAST_GOOD_RETRY_SECONDS: float = 30.0  # after a failure, answer from the snapshot without retrying for this long
+
+    FORKSERVER_SOCKET: Optional[str] = None  # default: <tmpdir>/mobility-mcp-<uid>.sock
+    FORKSERVER_POOL_SIZE: int = 4
 
+    GEOCODE_CACHE_TTL_SECONDS: float = 24 * 3600
+    DIRECTIONS_CACHE_TTL_SECONDS: float = 300
+    OUTAGES_CACHE_TTL_SECONDS: float = 60
+    VENUE_CACHE_TTL_SECONDS: float = 24 * 3600
+    WEATHER_CACHE_TTL_SECONDS: float = 600
+    CALENDAR_CACHE_TTL_SECONDS: float = 300
+    SHARED_CACHE_PATH: Optional[str] = None  # e.g. "/dev/shm/mobility-cache.sqlite3"; one cache for all workers on the host
+    SHARED_CACHE_LEASE_SECONDS: float = 10.0  # a worker refreshing a key holds it at most this long
+    SHARED_CACHE_WAIT_SECONDS: float = 3.0  # other workers wait this long for that refresh
 
-class RuntimeState(BaseModel):
-    home_address: Optional[str] = None
-    last_context_package: Optional[dict] = None
+    WARMUP_ENABLED: bool = True
+    WARMUP_BLOCK_READINESS: bool = False  # /health returns 503 until warm-up finishes
+    WARMUP_TIMEOUT_SECONDS: float = 20.0
+
+    PRECOMPUTE_ENABLED: bool = True  # needs an ICS feed and HOME_ADDRESS
+    PRECOMPUTE_LEAD_MINUTES: str = "240,90,30,10"  # rebuild as departure crosses each
+    PRECOMPUTE_POLL_SECONDS: float = 60.0
+    PRECOMPUTE_MAX_EVENTS: int = 5
+    PRECOMPUTE_BUFFER_MINUTES: int = 20
+    PRECOMPUTE_MAX_AGE_SECONDS: float = 15 * 60  # older packages are rebuilt on ask
+
+    OUTAGE_POLL_SECONDS: Optional[float] = None  # change stream refresh; default: the city's refresh interval
+    OUTAGE_STREAM_BACKLOG: int = 100  # deltas kept for Last-Event-ID resume
+    OUTAGE_STREAM_HEARTBEAT_SECONDS: float = 15.0
+    RELIABILITY_WINDOW_DAYS: float = 28  # rolling window of per-equipment outage history
+    RELIABILITY_BUCKET_SECONDS: float = 3600  # history resolution; one byte per equipment per bucket
+    RELIABILITY_PRIOR_BUCKETS: int = 24  # observations needed before a station's rate counts in full
+    RELIABILITY_PATH: Optional[str] = None  # directory to persist the history across restarts
+
+    PROFILING_ENABLED: bool = False  # honour X-Profile / ?profile=1 / the MCP "profile" argument
+    PROFILE_DIR: str = "profiles"
+    PROFILE_MAX_FILES: int = 50  # oldest profiles in PROFILE_DIR are deleted past this
+    PROFILE_FORMAT: str = "speedscope"  # or "collapsed" (flamegraph.pl)
+    PROFILE_INTERVAL_MS: float = 1.0
+
+    MOCK_MODE: bool = True
+    LOG_LEVEL: str = "INFO"
 
 
 settings = Settings()
-state = RuntimeState(home_address=settings.HOME_ADDRESS)
 
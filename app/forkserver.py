@@ -0,0 +1,158 @@
+"""
+Pre-forked MCP fork server.
+
+    python -m app.forkserver
+
+The parent imports the whole service stack once, warms it, then keeps
+FORKSERVER_POOL_SIZE children blocked in accept() on a Unix socket. Each MCP
+session (relayed by `app.mcp_shim`) is served by one child that already has
+every module loaded and shares the parent's warmed data copy-on-write; the
+parent immediately forks a replacement so the pool stays full. POSIX only.
+"""
+from __future__ import annotations
+import os
+import select
+import signal
+import socket
+import struct
+import sys
+import time
+from typing import Set
+
+from app.mcp_shim import socket_path
+
+_PID = struct.Struct("i")
+
+
+def _log(level: str, message: str, **kwargs) -> None:
+    from app.mcp_server import _log as mcp_log
+
+    mcp_log(level, f"[forkserver] {message}", **kwargs)
+
+
+def warm() -> None:
+    """Import everything a session needs and build the shared, fork-safe state."""
+    start = time.perf_counter()
+    import app.mcp_server  # noqa: F401
+    import app.services.pipeline  # noqa: F401
+    import app.services.calendar  # noqa: F401
+    import app.services.history  # noqa: F401
+    import app.services.llm  # noqa: F401
+    import app.services.sessions  # noqa: F401
+    from app.config import settings
+    from app.services.warmup import run_warmup
+    from app.utils.http import _get_ssl_context
+
+    _get_ssl_context()
+    if settings.WARMUP_ENABLED:
+        # Children inherit the filled caches copy-on-write
+        run_warmup()
+    _log("INFO", "Warm-up complete", elapsed_ms=f"{(time.perf_counter() - start) * 1000:.0f}")
+
+
+def _serve_child(listener: socket.socket, notify_fd: int, read_fd: int) -> None:
+    os.close(read_fd)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    code = 0
+    try:
+        conn, _ = listener.accept()
+        os.write(notify_fd, _PID.pack(os.getpid()))
+        listener.close()
+        os.close(notify_fd)
+        # The session speaks MCP over the socket exactly as it would over stdio
+        os.dup2(conn.fileno(), 0)
+        os.dup2(conn.fileno(), 1)
+        conn.close()
+        from app.mcp_server import main as serve_stdio
+
+        serve_stdio()
+    except BaseException:
+        code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+        except Exception:
+            pass
+        os._exit(code)
+
+
+def _spawn(listener: socket.socket, notify_fd: int, read_fd: int) -> int:
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        _serve_child(listener, notify_fd, read_fd)
+    return pid
+
+
+def serve(path: str, pool_size: int) -> None:
+    if os.path.exists(path):
+        os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    os.chmod(path, 0o600)
+    listener.listen(64)
+
+    read_fd, write_fd = os.pipe()
+    idle: Set[int] = set()
+    stopping = False
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(pool_size):
+        idle.add(_spawn(listener, write_fd, read_fd))
+    _log("INFO", "Listening", socket=path, pool_size=pool_size)
+
+    try:
+        while not stopping:
+            try:
+                ready, _, _ = select.select([read_fd], [], [], 1.0)
+            except InterruptedError:
+                continue
+            if ready:
+                data = os.read(read_fd, _PID.size * 64)
+                for (pid,) in _PID.iter_unpack(data[: len(data) - len(data) % _PID.size]):
+                    idle.discard(pid)
+                    idle.add(_spawn(listener, write_fd, read_fd))
+            # Reap finished sessions; replace idle children that died unexpectedly
+            while True:
+                try:
+                    pid, _ = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    break
+                if pid == 0:
+                    break
+                if pid in idle:
+                    idle.discard(pid)
+                    if not stopping:
+                        idle.add(_spawn(listener, write_fd, read_fd))
+    finally:
+        for pid in idle:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        listener.close()
+        if os.path.exists(path):
+            os.unlink(path)
+        _log("INFO", "Stopped")
+
+
+def main() -> None:
+    if not hasattr(os, "fork") or not hasattr(socket, "AF_UNIX"):
+        sys.stderr.write("Fork server requires a POSIX platform; run app.mcp_server directly.\n")
+        sys.exit(1)
+    warm()
+    from app.config import settings
+
+    serve(settings.FORKSERVER_SOCKET or socket_path(), max(1, settings.FORKSERVER_POOL_SIZE))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,53 @@
 from __future__ import annotations
+import os
+from contextlib import asynccontextmanager
+from dataclasses import asdict
 from datetime import datetime
 from typing import Optional, Tuple
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 import orjson
 
-from app.config import settings, state
-from app.models.schemas import BuildContextRequest, ContextPackage, SetHomeRequest, AskRequest
-from app.services.calendar import get_next_event
-from app.services.directions import get_candidate_routes
-from app.services.fusion import fuse_context
-from app.services.formatter import build_context_package
+from app.config import settings
+from app.models.schemas import BuildContextRequest, ContextPackage, SetHomeRequest, AskRequest, VenueBatchRequest
+from app.services.calendar import calendar_feeds_health, get_next_event
+from app.services.gazetteer import gazetteer_stats
 from app.services.geocode import geocode_address
-from app.services.osm import get_venue_wheelchair_tag
-from app.services.transit import outages_affecting_route_text
-from app.services.weather import get_weather_window
+from app.services.history import get_history_store, parse_time_bound, record_history
 from app.services.llm import generate_answer_with_gemini
+from app.services.cities import UnknownCityError, loaded_providers
+from app.services.osm import get_venue_accessibility_batch
+from app.services.outage_stream import OutageWatcher, get_watcher, sse_events, stop_watchers
+from app.services.pipeline import PipelineError, PipelineResult, run_pipeline
+from app.services.precompute import precomputer
+from app.services.sessions import SessionState, sessions
+from app.services.terrain import raster_stats
+from app.services.warmup import is_ready, start_warmup_background, status as warmup_status
+from app.utils.cache import cache_stats
+from app.utils.lastgood import last_good_stats
+from app.utils.profiling import PROFILE_NAME_RE, maybe_profiled, profile_requested
+from app.utils.ratelimit import limiter_health
+from app.utils.resilience import upstream_health
+from app.utils.shared_cache import shared_cache_stats
 
 
 def _json(obj) -> str:
     return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
 
 
-app = FastAPI(title="Accessibility Mobility Context Router (MVP)", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fill caches in the background so the first request is not cold
+    start_warmup_background()
+    precomputer.start()
+    yield
+    precomputer.stop()
+    stop_watchers()
+
+
+app = FastAPI(title="Accessibility Mobility Context Router (MVP)", version="0.1.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -35,22 +59,54 @@ app.add_middleware(
 
 @app.get("/health")
 def health():
-    return {"status": "ok", "mock_mode": settings.MOCK_MODE}
+    ready = is_ready()
+    body = {
+        "status": "ok" if ready else "warming",
+        "ready": ready,
+        "mock_mode": settings.MOCK_MODE,
+        "warmup": warmup_status.snapshot(),
+        "caches": cache_stats(),
+        "shared_cache": shared_cache_stats(),
+        "upstreams": upstream_health(),
+        "rate_limits": limiter_health(),
+        "sessions": sessions.stats(),
+        "cities": loaded_providers(),
+        "elevation": raster_stats(),
+        "gazetteer": gazetteer_stats(),
+        "last_good": last_good_stats(),
+        "calendar_feeds": calendar_feeds_health(),
+    }
+    if not ready and settings.WARMUP_BLOCK_READINESS:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
+def _session_id(x_session_id: Optional[str], x_user_id: Optional[str]) -> Optional[str]:
+    return x_session_id or x_user_id
 
 
 @app.post("/config/home")
-def set_home(req: SetHomeRequest):
-    state.home_address = req.address
-    return {"ok": True, "home_address": state.home_address}
+def set_home(
+    req: SetHomeRequest,
+    x_session_id: Optional[str] = Header(default=None),
+    x_user_id: Optional[str] = Header(default=None),
+):
+    session = sessions.set_home(_session_id(x_session_id, x_user_id), req.address)
+    return {"ok": True, "home_address": session.home_address}
 
 
 @app.get("/context/last", response_model=Optional[ContextPackage])
-def get_last_context():
-    return state.last_context_package
+def get_last_context(
+    x_session_id: Optional[str] = Header(default=None),
+    x_user_id: Optional[str] = Header(default=None),
+):
+    session = sessions.peek(_session_id(x_session_id, x_user_id))
+    return session.last_context_package if session else None
 
 
 def resolve_event_and_origin(
     req: BuildContextRequest,
+    session: SessionState,
 ) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
     """
     Returns (event_title, event_start_iso, event_location_text, origin_address)
@@ -69,132 +125,183 @@ def resolve_event_and_origin(
         event_start_iso = req.arrival_time_iso
         event_location_text = req.destination
 
-    origin_address = req.origin or state.home_address or settings.HOME_ADDRESS
+    origin_address = req.origin or session.home_address or settings.HOME_ADDRESS
     return event_title, event_start_iso, event_location_text, origin_address
 
 
+def _run_pipeline(
+    event_title: Optional[str],
+    event_start_iso: Optional[str],
+    event_location_text: str,
+    origin_address: str,
+    buffer_minutes: int,
+    city: Optional[str] = None,
+) -> PipelineResult:
+    try:
+        return run_pipeline(event_title, event_start_iso, event_location_text, origin_address, buffer_minutes, city=city)
+    except PipelineError as e:
+        raise HTTPException(status_code=e.status_code, detail=f"{e}.")
+
+
+def _attach_profile(response: Response, profiler) -> None:
+    if profiler is not None and profiler.path:
+        response.headers["X-Profile"] = os.path.basename(profiler.path)
+
+
 @app.post("/build_context", response_model=ContextPackage)
-def build_context(req: BuildContextRequest):
+def build_context(
+    req: BuildContextRequest,
+    response: Response,
+    x_session_id: Optional[str] = Header(default=None),
+    x_user_id: Optional[str] = Header(default=None),
+    x_profile: Optional[str] = Header(default=None),
+    profile: bool = False,
+):
+    session_id = _session_id(x_session_id, x_user_id)
     # Resolve event/origin
-    event_title, event_start_iso, event_location_text, origin_address = resolve_event_and_origin(req)
+    event_title, event_start_iso, event_location_text, origin_address = resolve_event_and_origin(
+        req, sessions.get(session_id)
+    )
     if not event_location_text:
         raise HTTPException(status_code=400, detail="Destination is required (no calendar integration yet).")
     if not origin_address:
         raise HTTPException(status_code=400, detail="Origin is required (set HOME_ADDRESS or pass 'origin').")
 
-    # Geocode destination for OSM and weather
-    dest_geo = geocode_address(event_location_text)
-    if not dest_geo:
-        raise HTTPException(status_code=400, detail="Failed to geocode destination.")
-    dest_lat, dest_lng, resolved_dest = dest_geo
-
-    # Build candidate routes
-    candidates = get_candidate_routes(origin_address, resolved_dest, event_start_iso)
-    if not candidates:
-        raise HTTPException(status_code=502, detail="No routes available.")
-
-    # Transit/elevator outages (MVP text matching on route summaries)
-    # A more robust approach would map steps to station IDs.
-    station_tokens = ["86 St (Q)", "Times Sq-42 St", "57 St", "96 St"]  # simple tokens to scan
-    outage_msgs = outages_affecting_route_text(station_tokens)
-
-    # Venue wheelchair from OSM
-    venue_wc = get_venue_wheelchair_tag(dest_lat, dest_lng)
-
-    # Weather around arrival
-    weather_risk, weather_cite = get_weather_window(dest_lat, dest_lng, event_start_iso)
-
-    # Fuse into bullets
-    fused = fuse_context(
-        candidates=candidates,
-        arrivals_iso=event_start_iso,
-        buffer_min=req.buffer_minutes,
-        outages_texts=outage_msgs,
-        venue_wc=venue_wc,
-        weather_risk=weather_risk,
-    )
+    with maybe_profiled(profile or profile_requested(x_profile), "build_context") as profiler:
+        result = _run_pipeline(event_title, event_start_iso, event_location_text, origin_address, req.buffer_minutes, req.city)
+    _attach_profile(response, profiler)
+    pkg = result.package
 
-    alternative_summary = fused.alternative.summary if fused.alternative else None
-    sources = [
-        "directions",
-        "gtfs_rt_elevators",
-        "osm_overpass",
-        "openweather",
-    ]
-
-    pkg = build_context_package(
-        event_title=event_title,
-        event_start_iso=event_start_iso,
-        event_location=resolved_dest,
-        origin_label="Home",
-        origin_address=origin_address,
-        bullets=fused.bullets,
-        alternative=alternative_summary,
-        raw_links=fused.raw_links,
-        sources=sources,
-    )
-
-    state.last_context_package = pkg.model_dump()
+    sessions.set_last_package(session_id, pkg.model_dump())
+    record_history(session_id, result)
     return pkg
 
 
 @app.post("/ask")
-def ask(req: AskRequest):
+def ask(
+    req: AskRequest,
+    response: Response,
+    x_session_id: Optional[str] = Header(default=None),
+    x_user_id: Optional[str] = Header(default=None),
+    x_profile: Optional[str] = Header(default=None),
+    profile: bool = False,
+):
+    session_id = _session_id(x_session_id, x_user_id)
     # Single entry point: assume "next meeting" intent for MVP
-    # Resolve event via stub and origin via state or request
+    # Resolve event via stub and origin via session or request
     event_title, event_start_iso, event_location_text, origin_address = resolve_event_and_origin(
-        BuildContextRequest(use_next_event=True, query=req.question, origin=req.origin, buffer_minutes=req.buffer_minutes)
+        BuildContextRequest(use_next_event=True, query=req.question, origin=req.origin, buffer_minutes=req.buffer_minutes),
+        sessions.get(session_id),
     )
     if not event_location_text:
         raise HTTPException(status_code=400, detail="No upcoming event with a destination found (stub). Provide destination via /build_context.")
     if not origin_address:
         raise HTTPException(status_code=400, detail="Origin is required (set HOME_ADDRESS or call /config/home).")
 
-    # Geocode destination
-    dest_geo = geocode_address(event_location_text)
-    if not dest_geo:
-        raise HTTPException(status_code=400, detail="Failed to geocode destination.")
-    dest_lat, dest_lng, resolved_dest = dest_geo
-
-    # Routes
-    candidates = get_candidate_routes(origin_address, resolved_dest, event_start_iso)
-    if not candidates:
-        raise HTTPException(status_code=502, detail="No routes available.")
-
-    # Outages (simple token-based check for MVP)
-    station_tokens = ["86 St (Q)", "Times Sq-42 St", "57 St", "96 St"]
-    outage_msgs = outages_affecting_route_text(station_tokens)
-
-    # Venue access
-    venue_wc = get_venue_wheelchair_tag(dest_lat, dest_lng)
-
-    # Weather
-    weather_risk, _ = get_weather_window(dest_lat, dest_lng, event_start_iso)
-
-    # Fuse
-    fused = fuse_context(
-        candidates=candidates,
-        arrivals_iso=event_start_iso,
-        buffer_min=req.buffer_minutes,
-        outages_texts=outage_msgs,
-        venue_wc=venue_wc,
-        weather_risk=weather_risk,
-    )
-
-    pkg = build_context_package(
-        event_title=event_title,
-        event_start_iso=event_start_iso,
-        event_location=resolved_dest,
-        origin_label="Home",
-        origin_address=origin_address,
-        bullets=fused.bullets,
-        alternative=fused.alternative.summary if fused.alternative else None,
-        raw_links=fused.raw_links,
-        sources=["directions", "gtfs_rt_elevators", "osm_overpass", "openweather"],
-    )
-
-    # Call Gemini (or synth fallback) and return answer + context
-    answer = generate_answer_with_gemini(req.question, pkg)
-    state.last_context_package = pkg.model_dump()
+    with maybe_profiled(profile or profile_requested(x_profile), "ask") as profiler:
+        pkg = precomputer.lookup(event_title, event_start_iso, event_location_text, origin_address, req.buffer_minutes)
+        result = None
+        if pkg is None:
+            result = _run_pipeline(event_title, event_start_iso, event_location_text, origin_address, req.buffer_minutes)
+            pkg = result.package
+
+        # Call Gemini (or synth fallback) and return answer + context
+        answer = generate_answer_with_gemini(req.question, pkg)
+    _attach_profile(response, profiler)
+    sessions.set_last_package(session_id, pkg.model_dump())
+    if result is not None:
+        record_history(session_id, result)
     return {"answer": answer, "context": pkg}
 
+
+@app.get("/profiles/{name}")
+def get_profile(name: str):
+    """A profile written for a request sent with X-Profile: 1 or ?profile=1 (name from its X-Profile header)."""
+    path = os.path.join(settings.PROFILE_DIR, name)
+    if not settings.PROFILING_ENABLED or not PROFILE_NAME_RE.match(name) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    media_type = "application/json" if name.endswith(".json") else "text/plain"
+    return FileResponse(path, media_type=media_type)
+
+
+@app.post("/venues/accessibility")
+def venues_accessibility(req: VenueBatchRequest):
+    """Wheelchair/entrance/toilets tags for many venues, fetched with one Overpass query per batch."""
+    points = []
+    for v in req.venues:
+        if v.lat is not None and v.lon is not None:
+            points.append((v.lat, v.lon))
+            continue
+        geo = geocode_address(v.address) if v.address else None
+        if not geo:
+            raise HTTPException(status_code=400, detail=f"Could not locate venue: {v.address or 'missing lat/lon'}.")
+        points.append((geo[0], geo[1]))
+    results = get_venue_accessibility_batch(points)
+    return {
+        "venues": [
+            {"lat": lat, "lon": lon, "address": v.address, "access": asdict(access) if access else None}
+            for v, (lat, lon), access in zip(req.venues, points, results)
+        ]
+    }
+
+
+@app.get("/history")
+def get_history(
+    event: Optional[str] = None,
+    user: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cursor: Optional[int] = None,
+    limit: int = 20,
+    include_package: bool = False,
+):
+    """Page through recorded context packages (newest first) by event key, user/session or time range."""
+    store = get_history_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="History is disabled (set HISTORY_DB_PATH).")
+    try:
+        since_ts, until_ts = parse_time_bound(since), parse_time_bound(until)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since/until must be epoch seconds or ISO-8601.")
+    items, next_cursor = store.query(
+        event_key=event,
+        session_id=user,
+        since=since_ts,
+        until=until_ts,
+        cursor=cursor,
+        limit=limit,
+        include_package=include_package,
+    )
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def _outage_watcher(city: Optional[str]) -> OutageWatcher:
+    try:
+        watcher = get_watcher(city)
+    except UnknownCityError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    watcher.start()
+    return watcher
+
+
+@app.get("/outages")
+def get_outages(city: Optional[str] = None):
+    """Current per-equipment outages for a city and the change-stream seq they reflect."""
+    watcher = _outage_watcher(city)
+    if watcher.snapshot()["at"] is None:
+        watcher.tick()
+    return watcher.snapshot()
+
+
+@app.get("/outages/stream")
+async def stream_outages(
+    request: Request,
+    city: Optional[str] = None,
+    last_event_id: Optional[str] = Header(default=None),
+):
+    """Server-Sent Events: a `snapshot` event, then a `delta` event per added/resolved/changed outage."""
+    return StreamingResponse(
+        sse_events(_outage_watcher(city), last_event_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
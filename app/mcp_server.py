@@ -1,22 +1,25 @@
 from __future__ import annotations
+import contextlib
 import sys
 import json
 import traceback
 import os
+import threading
 import time
 from datetime import datetime
-from typing import Optional, Tuple, List, Dict, Any
+from urllib.parse import parse_qs, urlsplit
+from typing import TYPE_CHECKING, Any, ContextManager, Dict, List, Optional, Tuple
 
-from app.config import state, settings
-from app.models.schemas import ContextPackage
-from app.services.calendar import get_next_event
-from app.services.directions import get_candidate_routes
-from app.services.fusion import fuse_context
-from app.services.formatter import build_context_package
-from app.services.geocode import geocode_address
-from app.services.osm import get_venue_wheelchair_tag
-from app.services.transit import outages_affecting_route_text
-from app.services.weather import get_weather_window
+# Only stdlib is imported at module load so `initialize` and `tools/list` are
+# answered before pydantic-settings, httpx, ics and the services are loaded.
+# Those are imported on first use inside the handlers below.
+if TYPE_CHECKING:
+	from app.models.schemas import ContextPackage
+
+# Responses and background notifications share stdout
+_send_lock = threading.Lock()
+# Resource URIs the client subscribed to via resources/subscribe
+_subscriptions: set = set()
 
 
 def _log(level: str, message: str, **kwargs) -> None:
@@ -35,16 +38,27 @@ def _orchestrate_build_context(
 	origin: Optional[str],
 	buffer_minutes: int,
 	question: Optional[str] = None,
+	session_id: Optional[str] = None,
+	city: Optional[str] = None,
 ) -> ContextPackage:
 	_log("INFO", "Starting context orchestration", 
 		 use_next_event=use_next_event, 
 		 origin=origin or "default", 
 		 buffer_minutes=buffer_minutes,
-		 has_question=question is not None)
+		 has_question=question is not None,
+		 session=session_id or "default",
+		 city=city or "default")
 	
 	start_time = time.time()
 	
 	try:
+		from app.config import settings
+		from app.services.calendar import get_next_event
+		from app.services.history import record_history
+		from app.services.pipeline import run_pipeline
+		from app.services.precompute import precomputer
+		from app.services.sessions import sessions
+
 		if use_next_event:
 			_log("DEBUG", "Fetching next event from calendar")
 			t, s, l = get_next_event()
@@ -56,77 +70,34 @@ def _orchestrate_build_context(
 		else:
 			raise ValueError("Direct destination mode not implemented in MCP MVP; set use_next_event=True")
 
-		origin_address = origin or state.home_address
+		session = sessions.get(session_id)
+		origin_address = origin or session.home_address or settings.HOME_ADDRESS
 		if not origin_address:
-			_log("ERROR", "Origin address not set", state_home=state.home_address, provided_origin=origin)
-			raise ValueError("Origin is required (set via REST /config/home or pass origin)")
+			_log("ERROR", "Origin address not set", session_home=session.home_address, provided_origin=origin)
+			raise ValueError("Origin is required (set HOME_ADDRESS or pass origin)")
 		_log("DEBUG", "Using origin address", address=origin_address)
 		
 		if not event_location_text:
 			_log("ERROR", "No event location available")
 			raise ValueError("No next event destination available")
 
-		_log("DEBUG", "Geocoding destination", location=event_location_text)
-		dest_geo = geocode_address(event_location_text)
-		if not dest_geo:
-			_log("ERROR", "Geocoding failed", location=event_location_text)
-			raise ValueError("Failed to geocode destination")
-		dest_lat, dest_lng, resolved_dest = dest_geo
-		_log("INFO", "Destination geocoded", 
-			 lat=dest_lat, 
-			 lng=dest_lng, 
-			 resolved=resolved_dest)
-
-		_log("DEBUG", "Fetching candidate routes", 
-			 origin=origin_address, 
-			 destination=resolved_dest, 
-			 arrival=event_start_iso)
-		candidates = get_candidate_routes(origin_address, resolved_dest, event_start_iso)
-		if not candidates:
-			_log("ERROR", "No routes found", origin=origin_address, dest=resolved_dest)
-			raise ValueError("No routes available")
-		_log("INFO", "Routes retrieved", count=len(candidates))
-
-		station_tokens = ["86 St (Q)", "Times Sq-42 St", "57 St", "96 St"]
-		_log("DEBUG", "Checking transit outages", stations=len(station_tokens))
-		outage_msgs = outages_affecting_route_text(station_tokens)
-		_log("INFO", "Outage check complete", outage_count=len(outage_msgs))
-		
-		_log("DEBUG", "Checking venue wheelchair accessibility", lat=dest_lat, lng=dest_lng)
-		venue_wc = get_venue_wheelchair_tag(dest_lat, dest_lng)
-		_log("INFO", "Venue accessibility checked", wheelchair_accessible=venue_wc)
-		
-		_log("DEBUG", "Fetching weather window", lat=dest_lat, lng=dest_lng, time=event_start_iso)
-		weather_risk, _ = get_weather_window(dest_lat, dest_lng, event_start_iso)
-		_log("INFO", "Weather check complete", risk=weather_risk)
-
-		_log("DEBUG", "Fusing context data", 
-			 candidates=len(candidates), 
-			 outages=len(outage_msgs),
-			 buffer_min=buffer_minutes)
-		fused = fuse_context(
-			candidates=candidates,
-			arrivals_iso=event_start_iso,
-			buffer_min=buffer_minutes,
-			outages_texts=outage_msgs,
-			venue_wc=venue_wc,
-			weather_risk=weather_risk,
-		)
-		_log("INFO", "Context fusion complete", bullets=len(fused.bullets), has_alternative=fused.alternative is not None)
-
-		_log("DEBUG", "Building context package")
-		pkg = build_context_package(
-			event_title=event_title,
-			event_start_iso=event_start_iso,
-			event_location=resolved_dest,
-			origin_label="Home",
-			origin_address=origin_address,
-			bullets=fused.bullets,
-			alternative=fused.alternative.summary if fused.alternative else None,
-			raw_links=fused.raw_links,
-			sources=["directions", "gtfs_rt_elevators", "osm_overpass", "openweather"],
-		)
-		state.last_context_package = pkg.model_dump()
+		# Precomputed packages are built for the default city only
+		pkg = None if city else precomputer.lookup(event_title, event_start_iso, event_location_text, origin_address, buffer_minutes)
+		if pkg is not None:
+			_log("INFO", "Using precomputed context package", precomputed_at=pkg.meta.get("precomputed_at"))
+		else:
+			result = run_pipeline(
+				event_title,
+				event_start_iso,
+				event_location_text,
+				origin_address,
+				buffer_minutes,
+				log=_log,
+				city=city,
+			)
+			pkg = result.package
+			record_history(session_id, result)
+		sessions.set_last_package(session_id, pkg.model_dump())
 		
 		elapsed = time.time() - start_time
 		_log("INFO", "Context orchestration complete", 
@@ -146,6 +117,22 @@ def _orchestrate_build_context(
 		raise
 
 
+def _maybe_profiled(args: Dict[str, Any], name: str) -> ContextManager[Any]:
+	"""Sampling profiler around a tool call when its `profile` argument is set; no import otherwise."""
+	if not args.get("profile"):
+		return contextlib.nullcontext(None)
+	from app.utils.profiling import maybe_profiled, profile_requested
+
+	return maybe_profiled(profile_requested(args.get("profile")), f"mcp-{name}")
+
+
+def _with_profile(result: Dict[str, Any], profiler: Any) -> Dict[str, Any]:
+	if profiler is not None:
+		result["_meta"] = {"profile": profiler.summary()}
+		_log("INFO", "Tool call profiled", **profiler.summary())
+	return result
+
+
 def _send(obj: Dict[str, Any]) -> None:
 	"""Send a JSON-RPC response using MCP stdio format (always with headers)"""
 	try:
@@ -155,10 +142,11 @@ def _send(obj: Dict[str, Any]) -> None:
 		
 		_log("DEBUG", "Sending response", size=len(data), id=obj.get("id"), has_result="result" in obj, has_error="error" in obj)
 		
-		sys.stdout.buffer.write(header)
-		sys.stdout.buffer.write(content_type)
-		sys.stdout.buffer.write(data)
-		sys.stdout.buffer.flush()
+		with _send_lock:
+			sys.stdout.buffer.write(header)
+			sys.stdout.buffer.write(content_type)
+			sys.stdout.buffer.write(data)
+			sys.stdout.buffer.flush()
 		
 		# Force flush stderr too to ensure logs are visible
 		sys.stderr.flush()
@@ -179,13 +167,31 @@ def _error(id_: Any, code: int, message: str) -> None:
 	_send({"jsonrpc": "2.0", "id": id_, "error": {"code": code, "message": message}})
 
 
+def _notify(method: str, params: Optional[Dict[str, Any]] = None) -> None:
+	msg: Dict[str, Any] = {"jsonrpc": "2.0", "method": method}
+	if params is not None:
+		msg["params"] = params
+	_send(msg)
+
+
+def _on_precompute_event(kind: str, uri: Optional[str]) -> None:
+	"""Forward precompute scheduler updates as MCP resource notifications."""
+	try:
+		if kind == "updated" and uri in _subscriptions:
+			_notify("notifications/resources/updated", {"uri": uri})
+		elif kind == "list_changed":
+			_notify("notifications/resources/list_changed")
+	except Exception as e:
+		_log("WARN", "Failed to send resource notification", uri=uri, error=str(e))
+
+
 def _initialize_result(requested_version: Optional[str]) -> Dict[str, Any]:
 	version = requested_version or "2025-06-18"
 	return {
 		"protocolVersion": version,
 		"capabilities": {
 			"tools": {},
-			"resources": {},
+			"resources": {"subscribe": True, "listChanged": True},
 		},
 		"serverInfo": {"name": "mobility-mcp", "version": "0.1.0"},
 	}
@@ -203,6 +209,9 @@ def _tools_list() -> Dict[str, Any]:
 						"question": {"type": "string"},
 						"origin": {"type": "string"},
 						"buffer_minutes": {"type": "integer", "default": 20},
+						"session_id": {"type": "string"},
+						"city": {"type": "string", "description": "City code (default: DEFAULT_CITY)"},
+						"profile": {"type": "boolean", "default": False, "description": "Profile this call; the profile file is named in _meta.profile"},
 					},
 					"required": ["question"],
 				},
@@ -215,6 +224,9 @@ def _tools_list() -> Dict[str, Any]:
 					"properties": {
 						"origin": {"type": "string"},
 						"buffer_minutes": {"type": "integer", "default": 20},
+						"session_id": {"type": "string"},
+						"city": {"type": "string", "description": "City code (default: DEFAULT_CITY)"},
+						"profile": {"type": "boolean", "default": False, "description": "Profile this call; the profile file is named in _meta.profile"},
 					},
 					"required": [],
 				},
@@ -224,17 +236,130 @@ def _tools_list() -> Dict[str, Any]:
 
 
 def _resources_list() -> Dict[str, Any]:
-	return {
-		"resources": [
-			{"uri": "context/last", "name": "Last Context", "mimeType": "application/json"},
-		]
-	}
+	resources = [
+		{"uri": "context/last", "name": "Last Context", "mimeType": "application/json"},
+		{"uri": "context/history", "name": "Context History", "mimeType": "application/json"},
+		{"uri": "outages/current", "name": "Accessibility Outages", "mimeType": "application/json"},
+	]
+	# Only list precomputed events if the scheduler is loaded; don't import it just for this
+	precompute = sys.modules.get("app.services.precompute")
+	if precompute is not None:
+		for entry in precompute.precomputer.entries():
+			resources.append({
+				"uri": entry.uri,
+				"name": f"Trip: {entry.title or 'Event'} ({entry.start_iso})",
+				"mimeType": "application/json",
+			})
+	return {"resources": resources}
+
+
+class InvalidParams(ValueError):
+	"""A malformed request argument; reported as JSON-RPC -32602 rather than a server error."""
+
+
+def _int_param(query: Dict[str, List[str]], name: str, default: Optional[int] = None) -> Optional[int]:
+	raw = (query.get(name) or [None])[0]
+	if not raw:
+		return default
+	try:
+		return int(raw)
+	except ValueError:
+		raise InvalidParams(f"'{name}' must be an integer, got {raw!r}")
+
+
+def _time_param(query: Dict[str, List[str]], name: str) -> Optional[float]:
+	from app.services.history import parse_time_bound
+
+	raw = (query.get(name) or [None])[0]
+	try:
+		return parse_time_bound(raw)
+	except ValueError:
+		raise InvalidParams(f"'{name}' must be epoch seconds or an ISO-8601 time, got {raw!r}")
+
+
+def _history_read(query: Dict[str, List[str]]) -> Dict[str, Any]:
+	# context/history?event=<key>&user=<id>&since=<iso|epoch>&until=<iso|epoch>&cursor=<id>&limit=<n>
+	from app.services.history import get_history_store
+
+	store = get_history_store()
+	if store is None:
+		raise ValueError("History is disabled (set HISTORY_DB_PATH)")
+	q = {k: v[0] for k, v in query.items() if v}
+	items, next_cursor = store.query(
+		event_key=q.get("event"),
+		session_id=q.get("user"),
+		since=_time_param(query, "since"),
+		until=_time_param(query, "until"),
+		cursor=_int_param(query, "cursor"),
+		limit=_int_param(query, "limit", 20),
+		include_package=q.get("include_package") in ("1", "true"),
+	)
+	return {"items": items, "next_cursor": next_cursor}
+
+
+def _outages_read(path: str, query: Dict[str, List[str]]) -> Dict[str, Any]:
+	# outages/current, or outages/changes?since=<seq> for the deltas after a seq; both take &city=<code>
+	from app.services.outage_stream import get_watcher
+
+	watcher = get_watcher((query.get("city") or [None])[0])
+	watcher.start()
+	if watcher.snapshot()["at"] is None:
+		watcher.tick()
+	if path == "outages/current":
+		return watcher.snapshot()
+	since = _int_param(query, "since", 0)
+	deltas = watcher.since(since)
+	if deltas is None:
+		# Backlog no longer reaches back: the client should resync from the snapshot
+		return {"resync": True, "snapshot": watcher.snapshot()}
+	return {"resync": False, "deltas": deltas}
+
+
+def _outages_city(uri: str) -> Optional[str]:
+	"""City code of an outages/current[?city=] URI, or None if the URI is something else."""
+	from app.config import settings
+
+	parts = urlsplit(uri)
+	if parts.path != "outages/current":
+		return None
+	return ((parse_qs(parts.query).get("city") or [settings.DEFAULT_CITY])[0] or "").lower()
+
+
+def _on_outage_delta(delta: Dict[str, Any]) -> None:
+	for uri in list(_subscriptions):
+		if _outages_city(uri) != delta["city"]:
+			continue
+		try:
+			_notify("notifications/resources/updated", {"uri": uri, "seq": delta["seq"]})
+		except Exception as e:
+			_log("WARN", "Failed to send outage notification", error=str(e))
 
 
 def _resources_read(uri: str) -> Dict[str, Any]:
-	if uri != "context/last":
+	# context/last or context/last?session=<id>
+	parts = urlsplit(uri)
+	query = parse_qs(parts.query)
+	if parts.path == "context/history":
+		text = json.dumps(_history_read(query), ensure_ascii=False, indent=2)
+		return {"contents": [{"type": "text", "text": text}]}
+	if parts.path in ("outages/current", "outages/changes"):
+		text = json.dumps(_outages_read(parts.path, query), ensure_ascii=False, indent=2)
+		return {"contents": [{"uri": uri, "mimeType": "application/json", "text": text}]}
+	if parts.path.startswith("context/event/"):
+		from app.services.precompute import EVENT_URI_PREFIX, precomputer
+
+		entry = precomputer.get(parts.path[len(EVENT_URI_PREFIX):])
+		if entry is None:
+			raise ValueError("Unknown or expired event resource")
+		text = json.dumps(entry.package.model_dump(), ensure_ascii=False, indent=2)
+		return {"contents": [{"uri": uri, "mimeType": "application/json", "text": text}]}
+	if parts.path != "context/last":
 		raise ValueError("Unknown resource")
-	text = json.dumps(state.last_context_package or {}, ensure_ascii=False, indent=2)
+	session_id = (query.get("session") or [None])[0]
+	from app.services.sessions import sessions
+
+	session = sessions.peek(session_id)
+	text = json.dumps((session.last_context_package if session else None) or {}, ensure_ascii=False, indent=2)
 	return {"contents": [{"type": "text", "text": text}]}
 
 
@@ -242,92 +367,53 @@ def _read_message(stdin) -> Optional[Dict[str, Any]]:
 	"""
 	Read a single JSON-RPC message from stdin.
 	Handles both MCP stdio format (with headers) and raw JSON format.
+	Reads line by line / exactly Content-Length bytes so a short message is
+	answered immediately and never swallows bytes of the next one.
 	"""
-	# Read first byte to detect format (non-blocking detection)
+	# Skip blank lines between messages, then use the first byte to detect format
 	first_byte = stdin.read(1)
+	while first_byte in (b"\r", b"\n", b" ", b"\t"):
+		first_byte = stdin.read(1)
 	if not first_byte:
 		return None
 	
-	buffer = bytearray(first_byte)
-	
-	# Read a bit more to determine format (up to 100 bytes)
-	peek_size = 99
-	peek = stdin.read(peek_size)
-	if peek:
-		buffer += peek
-	
-	text = buffer.decode("utf-8", errors="replace")
-	
-	# Check if it's raw JSON (starts with {) or has headers
-	if text.strip().startswith("{"):
-		_log("DEBUG", "Detected raw JSON format", preview=text[:100])
-		# Read until we have complete JSON
+	if first_byte == b"{":
+		_log("DEBUG", "Detected raw JSON format")
+		# Newline-delimited JSON; keep reading lines if the object spans several
+		buffer = bytearray(first_byte) + stdin.readline()
 		max_size = 100000  # 100KB limit
 		while len(buffer) < max_size:
 			try:
-				json_text = buffer.decode("utf-8").strip()
-				# Try parsing - if successful, we're done
-				result = json.loads(json_text)
+				result = json.loads(buffer.decode("utf-8").strip())
 				_log("DEBUG", "Successfully parsed raw JSON", size=len(buffer))
 				return result
 			except json.JSONDecodeError as e:
-				# Incomplete - read more (read in smaller chunks to avoid blocking)
-				more = stdin.read(256)  # Read 256 bytes at a time
+				more = stdin.readline()
 				if not more:
-					# EOF - try to parse what we have (might be complete)
-					try:
-						json_text = buffer.decode("utf-8").strip()
-						result = json.loads(json_text)
-						_log("DEBUG", "Parsed JSON at EOF", size=len(buffer))
-						return result
-					except:
-						_log("ERROR", "Incomplete JSON at EOF", size=len(buffer), error_pos=getattr(e, "pos", "unknown"))
-						return None
+					_log("ERROR", "Incomplete JSON at EOF", size=len(buffer), error_pos=getattr(e, "pos", "unknown"))
+					return None
 				buffer += more
 		_log("ERROR", "Message too large", size=len(buffer))
 		return None
 	
 	# Otherwise, it's MCP stdio format with headers
 	_log("DEBUG", "Detected MCP stdio format")
-	
-	# Find header delimiter
-	header_end = -1
-	delimiter_len = 0
-	
-	# Look for \r\n\r\n or \n\n
-	if b"\r\n\r\n" in buffer:
-		header_end = buffer.find(b"\r\n\r\n")
-		delimiter_len = 4
-	elif b"\n\n" in buffer:
-		header_end = buffer.find(b"\n\n")
-		delimiter_len = 2
-	
-	# If delimiter not found, read more
-	while header_end == -1 and len(buffer) < 8192:
-		more = stdin.read(256)
-		if not more:
-			_log("ERROR", "EOF before header delimiter", size=len(buffer))
-			return None
-		buffer += more
-		if b"\r\n\r\n" in buffer:
-			header_end = buffer.find(b"\r\n\r\n")
-			delimiter_len = 4
-		elif b"\n\n" in buffer:
-			header_end = buffer.find(b"\n\n")
-			delimiter_len = 2
-	
-	if header_end == -1:
-		_log("ERROR", "Header delimiter not found", size=len(buffer), preview=buffer[:200].decode("utf-8", errors="replace"))
-		return None
-	
-	# Parse headers
-	header_text = buffer[:header_end].decode("utf-8", errors="replace")
 	headers = {}
-	for line in header_text.splitlines():
-		line = line.strip()
-		if ":" in line:
-			k, v = line.split(":", 1)
+	line = first_byte + stdin.readline()
+	header_bytes = 0
+	while line.strip():
+		header_bytes += len(line)
+		if header_bytes > 8192:
+			_log("ERROR", "Header delimiter not found", size=header_bytes)
+			return None
+		text = line.decode("utf-8", errors="replace").strip()
+		if ":" in text:
+			k, v = text.split(":", 1)
 			headers[k.strip().lower()] = v.strip()
+		line = stdin.readline()
+		if not line:
+			_log("ERROR", "EOF before header delimiter", size=header_bytes)
+			return None
 	
 	_log("DEBUG", "Parsed headers", headers=list(headers.keys()))
 	
@@ -343,12 +429,8 @@ def _read_message(stdin) -> Optional[Dict[str, Any]]:
 		return None
 	
 	# Read payload
-	payload_start = header_end + delimiter_len
-	payload = bytearray(buffer[payload_start:])
-	remaining = content_length - len(payload)
-	
-	_log("DEBUG", "Reading payload", expected=content_length, already_have=len(payload), remaining=remaining)
-	
+	payload = bytearray()
+	remaining = content_length
 	while remaining > 0:
 		chunk = stdin.read(remaining)
 		if not chunk:
@@ -368,11 +450,33 @@ def _read_message(stdin) -> Optional[Dict[str, Any]]:
 		return None
 
 
+def _preload_services() -> None:
+	"""Import the service stack and warm caches in the background once the client is initialized."""
+	try:
+		start = time.perf_counter()
+		from app.config import settings
+		import app.services.pipeline  # noqa: F401
+		from app.services.warmup import run_warmup
+
+		_log("INFO", "Services loaded",
+			 mock_mode=settings.MOCK_MODE,
+			 elapsed_ms=f"{(time.perf_counter() - start) * 1000:.0f}")
+		from app.services.precompute import precomputer
+
+		precomputer.add_listener(_on_precompute_event)
+		if settings.WARMUP_ENABLED:
+			result = run_warmup()
+			_log("INFO", "Cache warm-up finished", elapsed_ms=result["elapsed_ms"],
+				 tasks=",".join(f"{k}:{'ok' if v['ok'] else 'fail'}" for k, v in result["tasks"].items()))
+		precomputer.start()
+	except Exception as e:
+		_log("WARN", "Service preload failed", error=str(e), error_type=type(e).__name__)
+
+
 def main() -> None:
 	"""Main MCP server loop"""
 	try:
 		_log("INFO", "MCP Server starting", 
-			 mock_mode=settings.MOCK_MODE,
 			 python_version=sys.version.split()[0],
 			 platform=sys.platform,
 			 working_dir=os.getcwd(),
@@ -428,13 +532,16 @@ def main() -> None:
 					
 					try:
 						if name == "ask":
-							pkg = _orchestrate_build_context(
-								use_next_event=True,
-								origin=args.get("origin"),
-								buffer_minutes=int(args.get("buffer_minutes") or 20),
-								question=args.get("question"),
-							)
-							lines: List[str] = [f"- {b.text}" for b in pkg.highlights[:5]]
+							with _maybe_profiled(args, name) as profiler:
+								pkg = _orchestrate_build_context(
+									use_next_event=True,
+									origin=args.get("origin"),
+									buffer_minutes=int(args.get("buffer_minutes") or 20),
+									question=args.get("question"),
+									session_id=args.get("session_id"),
+									city=args.get("city"),
+								)
+							lines: List[str] = [f"- {b.text}" for b in pkg.highlights]
 							if pkg.alternatives:
 								lines.append(f"- Alternative: {pkg.alternatives[0].summary}")
 							answer_text = "\n".join(lines)
@@ -443,16 +550,19 @@ def main() -> None:
 								{"type": "text", "text": answer_text},
 								{"type": "text", "text": json.dumps({"context": pkg.model_dump()}, ensure_ascii=False)}
 							]
-							_result(id_, {"content": content})
+							_result(id_, _with_profile({"content": content}, profiler))
 							
 						elif name == "build_context":
-							pkg = _orchestrate_build_context(
-								use_next_event=True,
-								origin=args.get("origin"),
-								buffer_minutes=int(args.get("buffer_minutes") or 20),
-							)
+							with _maybe_profiled(args, name) as profiler:
+								pkg = _orchestrate_build_context(
+									use_next_event=True,
+									origin=args.get("origin"),
+									buffer_minutes=int(args.get("buffer_minutes") or 20),
+									session_id=args.get("session_id"),
+									city=args.get("city"),
+								)
 							content = [{"type": "text", "text": json.dumps(pkg.model_dump(), ensure_ascii=False)}]
-							_result(id_, {"content": content})
+							_result(id_, _with_profile({"content": content}, profiler))
 						else:
 							_log("WARN", "Unknown tool", tool_name=name, request_id=id_)
 							_error(id_, -32601, f"Unknown tool: {name}")
@@ -473,16 +583,35 @@ def main() -> None:
 					try:
 						result = _resources_read(uri)
 						_result(id_, result)
+					except InvalidParams as e:
+						_log("WARN", "Invalid resource parameters", uri=uri, error=str(e), request_id=id_)
+						_error(id_, -32602, f"Invalid params: {e}")
 					except Exception as e:
 						_log("ERROR", "Resource read failed", uri=uri, error=str(e), request_id=id_)
 						_error(id_, -32000, f"Resource read failed: {str(e)}")
 					
+				elif method in ("resources/subscribe", "resources/unsubscribe"):
+					uri = params.get("uri") or ""
+					_log("INFO", f"Handling {method}", uri=uri, request_id=id_)
+					if method == "resources/subscribe":
+						if _outages_city(uri) is not None:
+							from app.services.outage_stream import get_watcher
+
+							watcher = get_watcher(_outages_city(uri))
+							watcher.add_listener(_on_outage_delta)
+							watcher.start()
+						_subscriptions.add(uri)
+					else:
+						_subscriptions.discard(uri)
+					_result(id_, {})
+					
 				elif method == "notifications/cancelled":
 					_log("DEBUG", "Received cancellation notification")
 					continue
 					
 				elif method == "notifications/initialized":
 					_log("DEBUG", "Received initialized notification")
+					threading.Thread(target=_preload_services, name="preload", daemon=True).start()
 					continue
 					
 				else:
@@ -0,0 +1,86 @@
+"""
+Thin stdio shim for the MCP fork server.
+
+MCP clients launch `python -m app.mcp_shim` instead of `python -m app.mcp_server`.
+The shim connects to the fork server's Unix socket and relays bytes between
+its stdio and a pre-forked, already warm server process. If no fork server is
+listening (or the platform has no Unix sockets) it runs the regular stdio
+server in-process, so the command is always safe to configure.
+
+Only the standard library is imported here to keep start-up minimal.
+"""
+from __future__ import annotations
+import os
+import socket
+import sys
+import tempfile
+import threading
+
+SOCKET_ENV = "FORKSERVER_SOCKET"
+
+
+def default_socket_path() -> str:
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.path.join(tempfile.gettempdir(), f"mobility-mcp-{uid}.sock")
+
+
+def socket_path() -> str:
+    return os.environ.get(SOCKET_ENV) or default_socket_path()
+
+
+def _connect() -> socket.socket | None:
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path())
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def _pump_stdin(sock: socket.socket) -> None:
+    stdin = sys.stdin.buffer
+    try:
+        while True:
+            data = stdin.read1(65536)
+            if not data:
+                break
+            sock.sendall(data)
+    except OSError:
+        pass
+    finally:
+        try:
+            sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+
+def relay(sock: socket.socket) -> None:
+    threading.Thread(target=_pump_stdin, args=(sock,), name="stdin-pump", daemon=True).start()
+    stdout = sys.stdout.buffer
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            break
+        stdout.write(data)
+        stdout.flush()
+
+
+def main() -> None:
+    sock = _connect()
+    if sock is None:
+        from app.mcp_server import main as serve_stdio
+
+        serve_stdio()
+        return
+    with sock:
+        relay(sock)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(0)
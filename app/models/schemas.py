@@ -19,9 +19,12 @@ class ContextBullet(BaseModel):
         "venue_access",
         "weather_risk",
         "buffer_recommendation",
+        "slope_warning",
     ]
     text: str
     citations: List[str] = []
+    # Fusion inputs this bullet was derived from; internal, not serialized
+    depends_on: List[str] = Field(default=[], exclude=True)
 
 
 class AlternativeRoute(BaseModel):
@@ -56,6 +59,16 @@ class SetHomeRequest(BaseModel):
     address: str
 
 
+class VenuePoint(BaseModel):
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    address: Optional[str] = None  # geocoded when lat/lon are missing
+
+
+class VenueBatchRequest(BaseModel):
+    venues: List[VenuePoint]
+
+
 class AskRequest(BaseModel):
     question: str
     origin: Optional[str] = None
@@ -1,56 +1,249 @@
 from __future__ import annotations
-from typing import Optional, Tuple
+import bisect
+import contextvars
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
 from datetime import datetime, timezone
 
 from ics import Calendar  # type: ignore
 
 from app.config import settings
-from app.utils.http import get_http_client
+from app.services.recurrence import FeedEvent, RecurringSeries, parse_ics_datetimes
+from app.utils.http import upstream_request
 
 
-def _parse_event_fields(e) -> Tuple[str, str, str]:
-    title = (e.name or "Calendar Event").strip()
-    # ics.Event.begin is an Arrow object; convert to ISO with tz
+def _event_begin(e) -> Optional[datetime]:
+    # ics.Event.begin is an Arrow object; keep its zone (not just the offset) for recurrence
     begin_dt = e.begin.datetime if hasattr(e.begin, "datetime") else None
     if begin_dt and begin_dt.tzinfo is None:
         begin_dt = begin_dt.replace(tzinfo=timezone.utc)
+    return begin_dt
+
+
+def _parse_event_fields(e) -> Tuple[str, str, str]:
+    title = (e.name or "Calendar Event").strip()
+    begin_dt = _event_begin(e)
     start_iso = begin_dt.isoformat() if begin_dt else None
     location = (getattr(e, "location", None) or "").strip()
     return title, start_iso, location
 
 
+@dataclass
+class FeedState:
+    """One ICS feed: its conditional-fetch validators and its upcoming located events, soonest first."""
+
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    events: List[FeedEvent] = field(default_factory=list)
+    starts: List[float] = field(default_factory=list)  # events' timestamps, for bisecting
+    series: List[RecurringSeries] = field(default_factory=list)
+    fetched_at: float = 0.0
+    error: Optional[str] = None
+    pending: Optional[Future] = None
+
+    @property
+    def upstream(self) -> str:
+        # Each feed gets its own circuit breaker and latency window
+        return "ics_" + hashlib.sha1(self.url.encode()).hexdigest()[:8]
+
+
+_feeds: Dict[str, FeedState] = {}
+_feeds_lock = threading.Lock()
+_calendar_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="calendar")
+
+
+def _reset_after_fork() -> None:
+    # Worker threads and in-flight futures do not survive fork
+    global _calendar_pool
+    _calendar_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="calendar")
+    for state in _feeds.values():
+        state.pending = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def calendar_feed_urls() -> List[str]:
+    """CALENDAR_ICS_URLS (comma-separated) plus GOOGLE_CALENDAR_ICS_URL, without duplicates."""
+    urls = [u.strip() for u in (settings.CALENDAR_ICS_URLS or "").split(",") if u.strip()]
+    if settings.GOOGLE_CALENDAR_ICS_URL:
+        urls.append(settings.GOOGLE_CALENDAR_ICS_URL.strip())
+    return list(dict.fromkeys(urls))
+
+
+def _feed_state(url: str) -> FeedState:
+    with _feeds_lock:
+        state = _feeds.get(url)
+        if state is None:
+            state = _feeds[url] = FeedState(url)
+        return state
+
+
+def _extra(e, name: str) -> List:
+    return [line for line in getattr(e, "extra", ()) if line.name == name]
+
+
+def _parse_feed(text: str) -> Tuple[List[FeedEvent], List[RecurringSeries]]:
+    """
+    Future one-off events, sorted, plus the recurring series to expand on
+    demand. A RECURRENCE-ID override is kept as a one-off event and removes
+    the instance it replaces from its series.
+    """
+    now = time.time()
+    events: List[FeedEvent] = []
+    masters = []
+    replaced: Dict[str, set] = {}
+    for e in Calendar(text).events:
+        try:
+            title, start_iso, location = _parse_event_fields(e)
+            begin = _event_begin(e)
+            if begin is None:
+                continue
+            recurrence_id = _extra(e, "RECURRENCE-ID")
+            if recurrence_id:
+                line = recurrence_id[0]
+                replaced.setdefault(e.uid, set()).update(
+                    dt.timestamp() for dt in parse_ics_datetimes(line.value, line.params, begin.tzinfo)
+                )
+                if (getattr(e, "status", None) or "").upper() == "CANCELLED":
+                    continue
+            elif _extra(e, "RRULE") or _extra(e, "RDATE"):
+                masters.append((e, title, begin, location))
+                continue
+            if location and begin.timestamp() > now:
+                events.append((begin.timestamp(), title, start_iso, location))
+        except Exception:
+            continue
+    events.sort()
+    series: List[RecurringSeries] = []
+    for e, title, begin, location in masters:
+        if not location:
+            continue
+        rdates, skip = [begin], set(replaced.get(e.uid, ()))
+        for line in _extra(e, "RDATE"):
+            rdates.extend(parse_ics_datetimes(line.value, line.params, begin.tzinfo))
+        for line in _extra(e, "EXDATE"):
+            skip.update(dt.timestamp() for dt in parse_ics_datetimes(line.value, line.params, begin.tzinfo))
+        rules = _extra(e, "RRULE")
+        series.append(
+            RecurringSeries(
+                title, location, begin,
+                rule=rules[0].value if rules else None,
+                rdates=sorted(rdates),
+                skip=frozenset(skip),
+            )
+        )
+    return events, series
+
+
+def _refresh(state: FeedState) -> None:
+    """Conditional GET; a 304 keeps the parsed events, anything else but a 200 keeps them too."""
+    headers = {}
+    if state.etag:
+        headers["If-None-Match"] = state.etag
+    if state.last_modified:
+        headers["If-Modified-Since"] = state.last_modified
+    try:
+        r = upstream_request(state.upstream, "GET", state.url, headers=headers)
+        if r.status_code == 304:
+            state.fetched_at, state.error = time.time(), None
+            return
+        if r.status_code != 200 or not r.text:
+            state.error = f"HTTP {r.status_code}"
+            return
+        events, series = _parse_feed(r.text)
+    except Exception as e:
+        state.error = type(e).__name__
+        return
+    state.events, state.starts, state.series = events, [ev[0] for ev in events], series
+    state.etag = r.headers.get("ETag")
+    state.last_modified = r.headers.get("Last-Modified")
+    state.fetched_at, state.error = time.time(), None
+
+
+def _refresh_due(states: List[FeedState]) -> None:
+    """
+    Refresh every feed older than CALENDAR_CACHE_TTL_SECONDS concurrently and
+    wait at most CALENDAR_FEED_DEADLINE_SECONDS. A feed that misses the
+    deadline keeps serving its previous events; its fetch finishes in the
+    background and is picked up by the next call.
+    """
+    futures: List[Future] = []
+    now = time.time()
+    with _feeds_lock:
+        for state in states:
+            if state.pending is not None and not state.pending.done():
+                futures.append(state.pending)  # already being fetched: share it
+            elif now - state.fetched_at >= settings.CALENDAR_CACHE_TTL_SECONDS:
+                state.pending = _calendar_pool.submit(contextvars.copy_context().run, _refresh, state)
+                futures.append(state.pending)
+    if futures:
+        wait(futures, timeout=settings.CALENDAR_FEED_DEADLINE_SECONDS)
+
+
+def _merged(states: List[FeedState], after: float) -> Iterator[FeedEvent]:
+    """
+    K-way heap merge of the feeds' sorted one-off events and their recurring
+    series, from the first event after `after`. Series are expanded lazily, so
+    taking the next few events only computes a few occurrences per series.
+    """
+    streams: List[Iterator[FeedEvent]] = []
+    for state in states:
+        events, starts = state.events, state.starts
+        streams.append(itertools.islice(events, bisect.bisect_right(starts, after), None))
+        streams.extend(s.occurrences(after) for s in state.series)
+    previous = None
+    for ev in heapq.merge(*streams):
+        # The same event in two shared calendars
+        if ev != previous:
+            yield ev
+        previous = ev
+
+
+def get_upcoming_events_from_ics(limit: int = 10) -> List[Tuple[str, str, str]]:
+    """
+    Returns up to `limit` upcoming events with a non-empty location, soonest first,
+    as (title, start_iso, location), across every configured ICS feed.
+    Source: Google Calendar (or any) private ICS URLs (no OAuth needed).
+    """
+    urls = calendar_feed_urls()
+    if not urls:
+        return []
+    states = [_feed_state(u) for u in urls]
+    _refresh_due(states)
+    return [(title, start_iso, location) for _, title, start_iso, location in itertools.islice(_merged(states, time.time()), limit)]
+
+
+def calendar_feeds_health() -> List[Dict[str, object]]:
+    with _feeds_lock:
+        states = list(_feeds.values())
+    return [
+        {
+            "upstream": s.upstream,
+            "events": len(s.events),
+            "recurring": len(s.series),
+            "age_seconds": round(time.time() - s.fetched_at, 1) if s.fetched_at else None,
+            "error": s.error,
+        }
+        for s in states
+    ]
+
+
 def get_next_event_from_ics() -> Optional[Tuple[str, str, str]]:
     """
     Returns the next upcoming event with a non-empty location as (title, start_iso, location).
-    Source: Google Calendar private ICS URL (no OAuth needed).
     """
-    ics_url = settings.GOOGLE_CALENDAR_ICS_URL
-    if not ics_url:
-        return None
-    try:
-        with get_http_client() as client:
-            r = client.get(ics_url)
-            if r.status_code != 200 or not r.text:
-                return None
-            cal = Calendar(r.text)
-            now = datetime.now(timezone.utc)
-            candidates = []
-            for e in cal.events:
-                try:
-                    title, start_iso, location = _parse_event_fields(e)
-                    if not location or not start_iso:
-                        continue
-                    start_dt = datetime.fromisoformat(start_iso)
-                    if start_dt > now:
-                        candidates.append((start_dt, (title, start_iso, location)))
-                except Exception:
-                    continue
-            if not candidates:
-                return None
-            candidates.sort(key=lambda x: x[0])
-            return candidates[0][1]
-    except Exception:
-        return None
+    upcoming = get_upcoming_events_from_ics(limit=1)
+    return upcoming[0] if upcoming else None
 
 
 def get_next_event() -> Optional[Tuple[str, str, str]]:
@@ -59,4 +252,3 @@ def get_next_event() -> Optional[Tuple[str, str, str]]:
         return ev
     # Fallback deterministic stub
     return "Museum Visit", "2025-11-08T16:00:00-05:00", "The Met, 1000 5th Ave, New York, NY"
-
@@ -0,0 +1,69 @@
+"""
+Per-city provider registry.
+
+Providers are registered by city code as "module:Class" strings and imported
+on first use, so a deployment only loads (and refreshes) the cities that
+actually receive requests. Extra providers can be added with the
+CITY_PROVIDERS setting ("code=package.module:Class,...") or `register()`.
+"""
+from __future__ import annotations
+import importlib
+import threading
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.services.cities.base import CityProvider
+
+_REGISTRY: Dict[str, str] = {
+    "nyc": "app.services.cities.nyc:NycProvider",
+}
+_loaded: Dict[str, CityProvider] = {}
+_lock = threading.Lock()
+
+
+class UnknownCityError(ValueError):
+    pass
+
+
+def register(code: str, target: str) -> None:
+    """Register (or replace) the provider for `code`; `target` is "module:Class"."""
+    with _lock:
+        _REGISTRY[code.lower()] = target
+        _loaded.pop(code.lower(), None)
+
+
+def _register_configured() -> None:
+    for entry in (settings.CITY_PROVIDERS or "").split(","):
+        code, sep, target = entry.strip().partition("=")
+        if sep and code.strip() and target.strip():
+            register(code.strip(), target.strip())
+
+
+def available_cities() -> List[str]:
+    return sorted(_REGISTRY)
+
+
+def get_provider(city: Optional[str] = None) -> CityProvider:
+    """Provider for `city` (default: DEFAULT_CITY), loading it on first use."""
+    code = (city or settings.DEFAULT_CITY or "").strip().lower()
+    provider = _loaded.get(code)
+    if provider is not None:
+        return provider
+    with _lock:
+        provider = _loaded.get(code)
+        if provider is None:
+            target = _REGISTRY.get(code)
+            if target is None:
+                raise UnknownCityError(f"Unsupported city '{code}' (available: {', '.join(sorted(_REGISTRY))})")
+            module_name, _, class_name = target.partition(":")
+            provider = getattr(importlib.import_module(module_name), class_name)()
+            _loaded[code] = provider
+    return provider
+
+
+def loaded_providers() -> Dict[str, Dict[str, object]]:
+    """Stats for the cities loaded so far (for /health)."""
+    return {code: p.stats() for code, p in sorted(_loaded.items())}
+
+
+_register_configured()
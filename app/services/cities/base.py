@@ -0,0 +1,209 @@
+from __future__ import annotations
+import functools
+import threading
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+from app.services.cities.reliability import EquipmentHistory
+from app.utils import codec
+from app.utils.cache import ttl_cache
+from app.utils.lastgood import last_good
+from app.utils.singleflight import singleflight
+
+# (station, equipment id)
+OutageKey = Tuple[str, str]
+
+# (summary, duration_min, transfers, mode) for a mock route candidate
+MockRoute = Tuple[str, int, int, str]
+
+
+@dataclass(frozen=True)
+class OutageRecord:
+    """One out-of-service elevator/escalator from a city's outage feed."""
+
+    station: str
+    equipment: str
+    equipment_type: str  # "EL" or "ES"
+    feed: str  # e.g. "current" or "upcoming"
+    serving: Optional[str] = None
+    reason: Optional[str] = None
+    outage_date: Optional[str] = None
+    estimated_return: Optional[str] = None
+
+    @property
+    def key(self) -> OutageKey:
+        return (self.station, self.equipment)
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Optional[str]]) -> "OutageRecord":
+        return cls(**data)  # type: ignore[arg-type]
+
+
+codec.register("outage", OutageRecord, OutageRecord.to_dict, OutageRecord.from_dict)
+
+
+def summarize_outages(records: Iterable[OutageRecord]) -> Dict[str, str]:
+    """Aggregate per-equipment records to station -> status string."""
+    stations: Dict[str, int] = {}
+    for rec in records:
+        weight = 2 if rec.equipment_type == "EL" else 1  # elevators have higher accessibility impact
+        stations[rec.station] = stations.get(rec.station, 0) + weight
+    result: Dict[str, str] = {}
+    for st, count in stations.items():
+        if count >= 2:
+            result[st] = "Multiple accessibility equipment outages"
+        else:
+            result[st] = "Accessibility equipment outage"
+    return result
+
+
+class CityProvider:
+    """
+    Everything city-specific: the accessibility outage feed, how often it is
+    refreshed, the station index used to spot stations on a route, and the
+    mock data served in MOCK_MODE. Subclasses set the class attributes and
+    implement `fetch_outage_records`.
+
+    Each provider owns its snapshot caches (namespaced by city code), so a
+    city that never gets a request never loads, fetches or holds anything.
+    When the live feed fails, the last-known-good records are served instead;
+    mock data is only ever used in MOCK_MODE. Every fresh snapshot, whether
+    this worker read the feed or took it from the shared cache, also goes
+    into the city's equipment history, from which `station_unavailability`
+    gives each station's rolling outage rate; a last-known-good snapshot is
+    never recorded again, and neither are planned ("upcoming") outages.
+    """
+
+    code: str = ""
+    name: str = ""
+    outage_citation: Optional[str] = None
+    outage_refresh_seconds: Optional[float] = None  # default: OUTAGES_CACHE_TTL_SECONDS
+    # Stations always checked for outages, in addition to those found on routes
+    key_stations: Tuple[str, ...] = ()
+    mock_outages: Tuple[OutageRecord, ...] = ()
+    mock_station_statuses: Dict[str, str] = {}
+    mock_routes: Tuple[MockRoute, ...] = (
+        ("Transit route (45 min, 1 transfer)", 45, 1, "transit"),
+        ("Accessible bus (55 min, 1 transfer)", 55, 1, "bus"),
+        ("Taxi/ride (25 min, no transfers)", 25, 0, "drive"),
+    )
+
+    def __init__(self) -> None:
+        ttl = self.refresh_seconds
+        # Everything below last_good is fresh, so that is where the history is fed
+        self.outage_records = last_good(f"{self.code}_outage_records", "gtfs_rt_elevators")(
+            self._recording(
+                ttl_cache(f"{self.code}_outage_records", ttl)(singleflight(f"{self.code}_outage_records")(self._outage_records))
+            )
+        )
+        self._recorded: Optional[Dict[OutageKey, OutageRecord]] = None
+        # Statuses are derived per records snapshot, so a stale snapshot is never cached as fresh
+        self._summary: Tuple[Optional[Dict[OutageKey, OutageRecord]], Dict[str, str]] = (None, {})
+        self._index_lock = threading.Lock()
+        self._index: Dict[str, str] = {s.lower(): s for s in self.key_stations}
+        self.history = EquipmentHistory(self.code)
+
+    @property
+    def refresh_seconds(self) -> float:
+        return self.outage_refresh_seconds or settings.OUTAGES_CACHE_TTL_SECONDS
+
+    def fetch_outage_records(self) -> Optional[Dict[OutageKey, OutageRecord]]:
+        """Read the live feed. None if it could not be read (vs {} for "no outages")."""
+        return None
+
+    def _outage_records(self) -> Optional[Dict[OutageKey, OutageRecord]]:
+        if settings.MOCK_MODE:
+            records: Optional[Dict[OutageKey, OutageRecord]] = {r.key: r for r in self.mock_outages}
+        else:
+            records = self.fetch_outage_records()
+        if records:
+            self._index_stations(r.station for r in records.values())
+        return records
+
+    def _recording(self, fetch: Callable[[], Optional[Dict[OutageKey, OutageRecord]]]) -> Callable:
+        """Feed each fresh snapshot `fetch` returns into the history once, on every worker."""
+
+        @functools.wraps(fetch)
+        def wrapper() -> Optional[Dict[OutageKey, OutageRecord]]:
+            records = fetch()
+            if records is not None and records is not self._recorded and not settings.MOCK_MODE:
+                self._recorded = records
+                self.history.record(r for r in records.values() if r.feed == "current")
+            return records
+
+        return wrapper
+
+    def station_statuses(self) -> Dict[str, str]:
+        """Station -> status for the current (or last-known-good) records; {} if there are none."""
+        if settings.MOCK_MODE:
+            return dict(self.mock_station_statuses)
+        try:
+            records = self.outage_records()
+        except Exception:
+            records = None
+        if not records:
+            return {}
+        seen, summary = self._summary
+        if seen is not records:
+            # Records may come from another worker via the shared cache: index them here too
+            self._index_stations(r.station for r in records.values())
+            summary = summarize_outages(records.values())
+            self._summary = (records, summary)
+        return dict(summary)
+
+    def station_unavailability(self) -> Dict[str, float]:
+        """
+        Station -> share of recent observations with its worst equipment out of
+        service (stations below 1% omitted). Precomputed per snapshot; do not mutate.
+        """
+        if settings.MOCK_MODE:
+            return {}
+        return self.history.unavailability
+
+    def _index_stations(self, names: Iterable[str]) -> None:
+        with self._index_lock:
+            for name in names:
+                self._index.setdefault(name.lower(), name)
+
+    def station_index(self) -> List[str]:
+        """Known station names: key stations plus every station seen in the feed."""
+        with self._index_lock:
+            return sorted(self._index.values())
+
+    def stations_on_route(self, route_texts: Iterable[str]) -> List[str]:
+        """Key stations plus indexed stations mentioned in any of the route texts."""
+        texts = [t.lower() for t in route_texts]
+        found = list(self.key_stations)
+        with self._index_lock:
+            index = list(self._index.items())
+        for lowered, name in index:
+            if name not in found and any(lowered in t for t in texts):
+                found.append(name)
+        return found
+
+    def station_for_stop(self, stop: str) -> Optional[str]:
+        """Indexed station for a stop name from Directions ("86 St" -> "86 St (Q)"), if any."""
+        lowered = stop.strip().lower()
+        with self._index_lock:
+            exact = self._index.get(lowered)
+            if exact:
+                return exact
+            for key, name in self._index.items():
+                # Feeds disambiguate same-named stations with a line suffix
+                if key.startswith(lowered + " (") or key.startswith(lowered + "-"):
+                    return name
+        return None
+
+    def stats(self) -> Dict[str, object]:
+        with self._index_lock:
+            indexed = len(self._index)
+        return {
+            "name": self.name,
+            "refresh_seconds": self.refresh_seconds,
+            "stations_indexed": indexed,
+            "reliability": self.history.stats(),
+        }
@@ -0,0 +1,88 @@
+from __future__ import annotations
+from typing import Dict, Optional
+
+from app.services.cities.base import CityProvider, OutageKey, OutageRecord, summarize_outages
+from app.utils.http import upstream_request
+
+MTA_OUTAGE_FEEDS = {
+    "current": "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fnyct_ene.json",
+    "upcoming": "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fnyct_ene_upcoming.json",
+}
+
+
+def _parse_mta_outage_records(arr: list, feed: str) -> Dict[OutageKey, OutageRecord]:
+    """
+    Parse an MTA JSON array (current or upcoming) into per-equipment records.
+    Items without an equipment id are keyed by type and position so they are
+    still counted, but such keys are not stable across refreshes.
+    """
+    records: Dict[OutageKey, OutageRecord] = {}
+    for i, item in enumerate(arr or []):
+        try:
+            station = (item.get("station") or "").strip()
+            if not station:
+                continue
+            equipment_type = (item.get("equipmenttype") or "").strip().upper()
+            equipment = (item.get("equipment") or "").strip() or f"{equipment_type or '?'}#{i}"
+            record = OutageRecord(
+                station=station,
+                equipment=equipment,
+                equipment_type=equipment_type,
+                feed=feed,
+                serving=(item.get("serving") or "").strip() or None,
+                reason=(item.get("reason") or "").strip() or None,
+                outage_date=(item.get("outagedate") or "").strip() or None,
+                estimated_return=(item.get("estimatedreturntoservice") or "").strip() or None,
+            )
+            records[record.key] = record
+        except Exception:
+            continue
+    return records
+
+
+def _parse_mta_outages_json(arr: list) -> Dict[str, str]:
+    """
+    Parse MTA JSON arrays (current or upcoming). Each element includes:
+      station, equipmenttype (EL/ES), etc.
+    Aggregate to station -> status string.
+    """
+    return summarize_outages(_parse_mta_outage_records(arr, "current").values())
+
+
+class NycProvider(CityProvider):
+    """New York City: MTA NYCT elevator/escalator (ENE) feeds."""
+
+    code = "nyc"
+    name = "New York City"
+    outage_citation = MTA_OUTAGE_FEEDS["current"]
+    key_stations = ("86 St (Q)", "Times Sq-42 St", "57 St", "96 St")
+    mock_outages = (
+        OutageRecord(station="86 St (Q)", equipment="EL801", equipment_type="EL", feed="current", reason="Repair"),
+        OutageRecord(station="59 St-Columbus Circle", equipment="ES112", equipment_type="ES", feed="current", reason="Repair"),
+    )
+    mock_station_statuses = {
+        "86 St (Q)": "Elevator outage",
+        "59 St-Columbus Circle": "Accessibility equipment outage",
+    }
+    mock_routes = (
+        ("Q line via 57 St (57 min, 1 transfer)", 57, 1, "transit"),
+        ("M1 → M4 accessible bus (65 min, 1 transfer)", 65, 1, "bus"),
+        ("Taxi/ride (28 min, no transfers)", 28, 0, "drive"),
+    )
+
+    def fetch_outage_records(self) -> Optional[Dict[OutageKey, OutageRecord]]:
+        combined: Dict[OutageKey, OutageRecord] = {}
+        fetched = False
+        for feed, url in MTA_OUTAGE_FEEDS.items():
+            try:
+                r = upstream_request("mta", "GET", url)
+                if r.status_code != 200:
+                    continue
+                records = _parse_mta_outage_records(r.json(), feed)
+            except Exception:
+                continue
+            fetched = True
+            for key, rec in records.items():
+                # A unit out now and also scheduled later is reported as current
+                combined.setdefault(key, rec)
+        return combined if fetched else None
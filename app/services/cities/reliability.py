@@ -0,0 +1,181 @@
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    from app.services.cities.base import OutageRecord
+
+# (station, equipment id), as in app.services.cities.base
+OutageKey = Tuple[str, str]
+
+# An escalator outage matters less for step-free access than an elevator outage
+_WEIGHTS = {"EL": 1.0, "ES": 0.5}
+# Stations below this expected unavailability are left out of the lookup table
+_FLOOR = 0.01
+
+
+class EquipmentHistory:
+    """
+    Rolling outage history of one city's elevators and escalators.
+
+    Time is cut into RELIABILITY_BUCKET_SECONDS buckets and each piece of
+    equipment has a ring buffer of one byte per bucket over the last
+    RELIABILITY_WINDOW_DAYS (1 = seen out of service in that bucket); a
+    shared ring marks the buckets in which the feed was read at all.
+    Running per-equipment sums are updated as buckets are set and as old
+    ones are overwritten, and the per-station table is rebuilt from them
+    on every new snapshot, so scoring only does a dict lookup.
+
+    Availability is measured over observed buckets only, shrunk towards
+    "reliable" by RELIABILITY_PRIOR_BUCKETS so a few readings cannot brand
+    a station unreliable. With RELIABILITY_PATH set the rings are saved
+    there whenever a bucket closes and reloaded on start-up.
+    """
+
+    def __init__(self, city: str) -> None:
+        self.city = city
+        self.bucket_seconds = float(settings.RELIABILITY_BUCKET_SECONDS)
+        self.slots = max(1, int(settings.RELIABILITY_WINDOW_DAYS * 86400 // self.bucket_seconds))
+        self._lock = threading.Lock()
+        self._rows: Dict[OutageKey, int] = {}
+        self._row_station: List[str] = []
+        self._row_weight = np.zeros(0, dtype=np.float32)
+        self._out = np.zeros((0, self.slots), dtype=np.uint8)
+        self._out_sum = np.zeros(0, dtype=np.int32)
+        self._observed = np.zeros(self.slots, dtype=np.uint8)
+        self._observed_sum = 0
+        self._bucket: Optional[int] = None  # absolute index of the newest bucket
+        self._loaded = False
+        self.unavailability: Dict[str, float] = {}
+
+    @property
+    def path(self) -> Optional[str]:
+        if not settings.RELIABILITY_PATH:
+            return None
+        return os.path.join(settings.RELIABILITY_PATH, f"{self.city}.npz")
+
+    def _row(self, key: OutageKey, equipment_type: str) -> int:
+        row = self._rows.get(key)
+        if row is not None:
+            return row
+        row = self._rows[key] = len(self._row_station)
+        self._row_station.append(key[0])
+        if row >= len(self._out_sum):
+            grow = max(64, len(self._out_sum))
+            self._out = np.vstack([self._out, np.zeros((grow, self.slots), dtype=np.uint8)])
+            self._out_sum = np.concatenate([self._out_sum, np.zeros(grow, dtype=np.int32)])
+            self._row_weight = np.concatenate([self._row_weight, np.zeros(grow, dtype=np.float32)])
+        self._row_weight[row] = _WEIGHTS.get(equipment_type, 1.0)
+        return row
+
+    def _advance(self, bucket: int) -> bool:
+        """Move the ring to `bucket`, clearing the buckets it wraps over. True if a bucket closed."""
+        if self._bucket is None:
+            self._bucket = bucket
+            return False
+        if bucket <= self._bucket:
+            return False
+        steps = min(bucket - self._bucket, self.slots)
+        cols = [(self._bucket + i) % self.slots for i in range(1, steps + 1)]
+        self._out_sum -= self._out[:, cols].sum(axis=1, dtype=np.int32)
+        self._out[:, cols] = 0
+        self._observed_sum -= int(self._observed[cols].sum())
+        self._observed[cols] = 0
+        self._bucket = bucket
+        return True
+
+    def _rebuild_table(self) -> None:
+        n = len(self._row_station)
+        if not n or not self._observed_sum:
+            self.unavailability = {}
+            return
+        rate = self._out_sum[:n] * self._row_weight[:n] / float(self._observed_sum + settings.RELIABILITY_PRIOR_BUCKETS)
+        table: Dict[str, float] = {}
+        for row in np.flatnonzero(rate >= _FLOOR):
+            station = self._row_station[row]
+            # A station is as unreliable as its worst piece of equipment
+            table[station] = max(table.get(station, 0.0), round(float(rate[row]), 3))
+        self.unavailability = table
+
+    def record(self, records: Iterable["OutageRecord"], now: Optional[float] = None) -> None:
+        """Mark the current bucket as observed with these records out of service (idempotent per bucket)."""
+        with self._lock:
+            self._load()
+            bucket = int((now if now is not None else time.time()) // self.bucket_seconds)
+            if self._bucket is not None and bucket < self._bucket:
+                return  # clock went backwards; keep the newer state
+            closed = self._advance(bucket)
+            col = bucket % self.slots
+            if not self._observed[col]:
+                self._observed[col] = 1
+                self._observed_sum += 1
+            rows = np.fromiter((self._row(r.key, r.equipment_type) for r in records), dtype=np.int64)
+            if rows.size:
+                rows = rows[self._out[rows, col] == 0]
+                self._out[rows, col] = 1
+                self._out_sum[rows] += 1
+            self._rebuild_table()
+            if closed:
+                self._save()
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        path = self.path
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with np.load(path) as data:
+                if int(data["slots"]) != self.slots or float(data["bucket_seconds"]) != self.bucket_seconds:
+                    return  # window or bucket size changed: start over
+                keys = json.loads(str(data["keys"]))
+                for (station, equipment), equipment_type in keys:
+                    self._row((station, equipment), equipment_type)
+                n = len(keys)
+                self._out[:n] = data["out"]
+                self._out_sum[:n] = self._out[:n].sum(axis=1, dtype=np.int32)
+                self._observed[:] = data["observed"]
+                self._observed_sum = int(self._observed.sum())
+                self._bucket = int(data["bucket"])
+        except Exception:
+            return
+
+    def _save(self) -> None:
+        path = self.path
+        if not path:
+            return
+        n = len(self._row_station)
+        weights = {w: t for t, w in _WEIGHTS.items()}
+        keys = [[list(key), weights.get(float(self._row_weight[row]), "EL")] for key, row in self._rows.items()]
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f,
+                    out=self._out[:n],
+                    observed=self._observed,
+                    bucket=self._bucket,
+                    slots=self.slots,
+                    bucket_seconds=self.bucket_seconds,
+                    keys=json.dumps(keys),
+                )
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "equipment_tracked": len(self._row_station),
+                "buckets_observed": self._observed_sum,
+                "unreliable_stations": len(self.unavailability),
+            }
@@ -1,112 +1,334 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Optional
+import contextvars
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from datetime import datetime
 from urllib.parse import urlencode, quote_plus
 
+import numpy as np
+
 from app.config import settings
-from app.utils.http import get_http_client
+from app.services.cities import get_provider
+from app.utils import codec
+from app.utils.cache import ttl_cache
+from app.utils.http import upstream_request
+from app.utils.lastgood import last_good
+from app.utils.resilience import get_upstream
+from app.utils.polyline import decode_polylines
+from app.utils.singleflight import singleflight
+
+
+class RouteStep:
+    """One leg of a route: a walk, a ride on one transit line, or a drive."""
+
+    __slots__ = ("travel_mode", "duration_s", "distance_m", "line", "vehicle", "departure_stop", "arrival_stop",
+                 "num_stops", "polyline")
+
+    def __init__(
+        self,
+        travel_mode: str,
+        duration_s: int = 0,
+        distance_m: int = 0,
+        line: Optional[str] = None,
+        vehicle: Optional[str] = None,
+        departure_stop: Optional[str] = None,
+        arrival_stop: Optional[str] = None,
+        num_stops: int = 0,
+        polyline: Optional[str] = None,
+    ):
+        self.travel_mode = travel_mode  # WALKING, TRANSIT, DRIVING
+        self.duration_s = duration_s
+        self.distance_m = distance_m
+        self.line = line
+        self.vehicle = vehicle  # SUBWAY, BUS, RAIL, ...
+        self.departure_stop = departure_stop
+        self.arrival_stop = arrival_stop
+        self.num_stops = num_stops
+        self.polyline = polyline  # encoded; see RouteCandidate.coords
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
 
 
 class RouteCandidate:
-    def __init__(self, summary: str, duration_min: int, transfers: int, mode: str, maps_url: str):
+    """
+    A route option. Steps are kept as a tuple of slotted RouteStep objects;
+    the geometry stays encoded until `coords` is first read, then all of the
+    route's polylines are decoded together into one NumPy array.
+    """
+
+    __slots__ = ("summary", "duration_min", "transfers", "mode", "maps_url", "steps", "polyline", "_coords")
+
+    def __init__(
+        self,
+        summary: str,
+        duration_min: int,
+        transfers: int,
+        mode: str,
+        maps_url: str,
+        steps: Sequence[RouteStep] = (),
+        polyline: Optional[str] = None,
+    ):
         self.summary = summary
         self.duration_min = duration_min
         self.transfers = transfers
         self.mode = mode
         self.maps_url = maps_url
+        self.steps: Tuple[RouteStep, ...] = tuple(steps)
+        self.polyline = polyline  # encoded overview polyline
+        self._coords: Optional[np.ndarray] = None
+
+    @property
+    def coords(self) -> np.ndarray:
+        """(N, 2) lat/lng array: the step polylines joined, or the overview polyline."""
+        if self._coords is None:
+            encoded = [s.polyline for s in self.steps if s.polyline]
+            if not encoded and self.polyline:
+                encoded = [self.polyline]
+            parts = decode_polylines(encoded)
+            self._coords = np.concatenate(parts) if parts else np.empty((0, 2))
+        return self._coords
+
+    @property
+    def stops(self) -> List[str]:
+        """Every boarding and alighting stop, in travel order."""
+        out: List[str] = []
+        for s in self.steps:
+            for name in (s.departure_stop, s.arrival_stop):
+                if name and (not out or out[-1] != name):
+                    out.append(name)
+        return out
+
+    @property
+    def walking_m(self) -> int:
+        return sum(s.distance_m for s in self.steps if s.travel_mode == "WALKING")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "summary": self.summary,
+            "duration_min": self.duration_min,
+            "transfers": self.transfers,
+            "mode": self.mode,
+            "maps_url": self.maps_url,
+            "steps": [s.as_dict() for s in self.steps],
+            "polyline": self.polyline,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RouteCandidate":
+        """Inverse of `as_dict`."""
+        return cls(
+            data["summary"],
+            data["duration_min"],
+            data["transfers"],
+            data["mode"],
+            data["maps_url"],
+            steps=[RouteStep(**s) for s in data.get("steps") or ()],
+            polyline=data.get("polyline"),
+        )
 
 
-def google_maps_link(origin: str, destination: str, arrival_time_iso: Optional[str]) -> str:
+# Cached route lists are shared between workers and kept as last-known-good answers
+codec.register("route", RouteCandidate, RouteCandidate.as_dict, RouteCandidate.from_dict)
+
+
+def google_maps_link(origin: str, destination: str, arrival_time_iso: Optional[str], mode: Optional[str] = None) -> str:
     params = {
         "saddr": origin,
         "daddr": destination,
     }
+    if mode in _MAPS_DIRFLG:
+        params["dirflg"] = _MAPS_DIRFLG[mode]
     if arrival_time_iso:
         # Google maps supports arrival_time as seconds in some APIs; for link we pass as query note
         params["arrival"] = arrival_time_iso
     return "https://www.google.com/maps/dir/?" + urlencode(params, quote_via=quote_plus)
 
 
-def get_candidate_routes(origin: str, destination: str, arrival_time_iso: Optional[str]) -> List[RouteCandidate]:
-    """
-    Returns a small set of candidates. Uses Google Directions if key available;
-    otherwise returns mocked deterministic candidates.
-    """
-    if not origin or not destination:
-        return []
+# Google Directions request parameters per configured mode
+_MODE_PARAMS: Dict[str, Dict[str, Any]] = {
+    # less_walking is the closest Google offers to a wheelchair preference
+    "transit": {"mode": "transit", "transit_routing_preference": "less_walking", "alternatives": "true"},
+    "walking": {"mode": "walking"},
+    "driving": {"mode": "driving"},
+}
+_MAPS_DIRFLG = {"transit": "r", "walking": "w", "driving": "d"}
+
+_directions_pool = ThreadPoolExecutor(max_workers=6, thread_name_prefix="directions")
+
+
+def _reset_pool_after_fork() -> None:
+    # Worker threads do not survive fork; give the child a fresh pool
+    global _directions_pool
+    _directions_pool = ThreadPoolExecutor(max_workers=6, thread_name_prefix="directions")
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+
+def _configured_modes() -> List[str]:
+    return [m.strip() for m in settings.DIRECTIONS_MODES.split(",") if m.strip() in _MODE_PARAMS]
 
-    maps_url = google_maps_link(origin, destination, arrival_time_iso)
 
-    if settings.GOOGLE_MAPS_API_KEY and not settings.MOCK_MODE:
+def _candidate_mode(mode: str, steps: List[dict]) -> str:
+    if mode == "walking":
+        return "walk"
+    if mode == "driving":
+        return "drive"
+    vehicles = [
+        ((s.get("transit_details") or {}).get("line") or {}).get("vehicle", {}).get("type")
+        for s in steps
+        if s.get("travel_mode") == "TRANSIT"
+    ]
+    return "bus" if vehicles and all(v == "BUS" for v in vehicles) else "transit"
+
+
+def _parse_step(step: dict) -> RouteStep:
+    details = step.get("transit_details") or {}
+    line = details.get("line") or {}
+    return RouteStep(
+        travel_mode=step.get("travel_mode") or "",
+        duration_s=int((step.get("duration") or {}).get("value") or 0),
+        distance_m=int((step.get("distance") or {}).get("value") or 0),
+        line=line.get("short_name") or line.get("name"),
+        vehicle=(line.get("vehicle") or {}).get("type"),
+        departure_stop=(details.get("departure_stop") or {}).get("name"),
+        arrival_stop=(details.get("arrival_stop") or {}).get("name"),
+        num_stops=int(details.get("num_stops") or 0),
+        polyline=(step.get("polyline") or {}).get("points"),
+    )
+
+
+def _parse_routes(data: dict, mode: str, maps_url: str) -> List[RouteCandidate]:
+    candidates: List[RouteCandidate] = []
+    for route in (data.get("routes") or [])[:3]:
+        legs = route.get("legs") or []
+        if not legs:
+            continue
+        leg = legs[0]
+        duration_sec = leg.get("duration", {}).get("value", 0)
+        duration_min = max(1, duration_sec // 60)
+        # Estimate transfers: count transit steps minus 1
+        steps = leg.get("steps") or []
+        transit_legs = [s for s in steps if s.get("travel_mode") == "TRANSIT"]
+        transfers = max(0, len(transit_legs) - 1)
+        cand_mode = _candidate_mode(mode, steps)
+        if cand_mode == "drive":
+            via = f"Taxi/ride via {route.get('summary')}" if route.get("summary") else "Taxi/ride"
+            summary = f"{via} ({duration_min} min, no transfers)"
+        elif cand_mode == "walk":
+            via = f"Walk/roll via {route.get('summary')}" if route.get("summary") else "Walk/roll"
+            summary = f"{via} ({duration_min} min, no transfers)"
+        else:
+            base = route.get("summary") or f"Transit route ({duration_min} min)"
+            summary = f"{base} ({duration_min} min, {transfers} transfer{'s' if transfers!=1 else ''})"
+        candidates.append(
+            RouteCandidate(
+                summary=summary,
+                duration_min=duration_min,
+                transfers=transfers,
+                mode=cand_mode,
+                maps_url=maps_url,
+                steps=[_parse_step(s) for s in steps],
+                polyline=(route.get("overview_polyline") or {}).get("points"),
+            )
+        )
+    return candidates
+
+
+def _fetch_mode(mode: str, origin: str, destination: str, arrival_time_iso: Optional[str]) -> List[RouteCandidate]:
+    params: Dict[str, Any] = {
+        "origin": origin,
+        "destination": destination,
+        "key": settings.GOOGLE_MAPS_API_KEY,
+        **_MODE_PARAMS[mode],
+    }
+    if arrival_time_iso:
         try:
-            with get_http_client() as client:
-                params: Dict[str, Any] = {
-                    "origin": origin,
-                    "destination": destination,
-                    "mode": "transit",
-                    "alternatives": "true",
-                    "key": settings.GOOGLE_MAPS_API_KEY,
-                }
-                if arrival_time_iso:
-                    try:
-                        ts = int(datetime.fromisoformat(arrival_time_iso).timestamp())
-                        params["arrival_time"] = ts
-                    except Exception:
-                        pass
-                r = client.get("https://maps.googleapis.com/maps/api/directions/json", params=params)
-                if r.status_code == 200:
-                    data = r.json()
-                    routes = data.get("routes") or []
-                    candidates: List[RouteCandidate] = []
-                    for route in routes[:3]:
-                        legs = route.get("legs") or []
-                        if not legs:
-                            continue
-                        leg = legs[0]
-                        duration_sec = leg.get("duration", {}).get("value", 0)
-                        duration_min = max(1, duration_sec // 60)
-                        # Estimate transfers: count transit steps minus 1
-                        steps = leg.get("steps") or []
-                        transit_legs = [s for s in steps if s.get("travel_mode") == "TRANSIT"]
-                        transfers = max(0, len(transit_legs) - 1)
-                        summary = route.get("summary") or f"Transit route ({duration_min} min)"
-                        candidates.append(
-                            RouteCandidate(
-                                summary=f"{summary} ({duration_min} min, {transfers} transfer{'s' if transfers!=1 else ''})",
-                                duration_min=duration_min,
-                                transfers=transfers,
-                                mode="transit",
-                                maps_url=maps_url,
-                            )
-                        )
-                    if candidates:
-                        return candidates
+            ts = int(datetime.fromisoformat(arrival_time_iso).timestamp())
+            params["arrival_time"] = ts
         except Exception:
             pass
+    # One upstream per mode: separate breaker, latency history and adaptive timeout
+    r = upstream_request(
+        f"google_directions_{mode}", "GET", "https://maps.googleapis.com/maps/api/directions/json", params=params
+    )
+    if r.status_code != 200:
+        return []
+    return _parse_routes(r.json(), mode, google_maps_link(origin, destination, arrival_time_iso, mode))
+
+
+def _merge(candidates: List[RouteCandidate]) -> List[RouteCandidate]:
+    """Drop duplicates (same mode and summary), keeping the first seen."""
+    seen = set()
+    merged: List[RouteCandidate] = []
+    for c in candidates:
+        key = (c.mode, c.summary.lower())
+        if key not in seen:
+            seen.add(key)
+            merged.append(c)
+    return merged
 
-    # Mock deterministic candidates (NYC flavored)
+
+def _fetch_all_modes(origin: str, destination: str, arrival_time_iso: Optional[str]) -> List[RouteCandidate]:
+    """
+    Query every configured mode concurrently. Each mode waits at most its own
+    deadline (its upstream's adaptive timeout, capped by
+    DIRECTIONS_DEADLINE_SECONDS) measured from the common start, so the total
+    wait is the slowest mode rather than the sum. Late or failed modes are
+    left out.
+    """
+    start = time.monotonic()
+    # Each mode runs in the caller's context, so a batch caller's rate-limit priority carries over
+    futures: Dict[str, Future] = {
+        mode: _directions_pool.submit(contextvars.copy_context().run, _fetch_mode, mode, origin, destination, arrival_time_iso)
+        for mode in _configured_modes()
+    }
+    results: List[RouteCandidate] = []
+    for mode, fut in futures.items():
+        deadline = min(get_upstream(f"google_directions_{mode}").timeout(), settings.DIRECTIONS_DEADLINE_SECONDS)
+        try:
+            results.extend(fut.result(timeout=max(0.0, start + deadline - time.monotonic())))
+        except Exception:
+            fut.cancel()
+    return _merge(results)
+
+
+@last_good("directions", "directions")
+@ttl_cache("directions", settings.DIRECTIONS_CACHE_TTL_SECONDS)
+@singleflight("directions")
+def _live_candidate_routes(origin: str, destination: str, arrival_time_iso: Optional[str]) -> Optional[List[RouteCandidate]]:
+    return _fetch_all_modes(origin, destination, arrival_time_iso) or None
+
+
+def get_candidate_routes(
+    origin: str,
+    destination: str,
+    arrival_time_iso: Optional[str],
+    city: Optional[str] = None,
+) -> List[RouteCandidate]:
+    """
+    Returns a small set of candidates across transit, walking and driving
+    (DIRECTIONS_MODES), fetched concurrently from Google Directions; the
+    last-known-good candidates for the same trip if that fails. The city
+    provider's mocked deterministic candidates in MOCK_MODE.
+    """
+    if not origin or not destination:
+        return []
+
+    if not settings.MOCK_MODE:
+        if not settings.GOOGLE_MAPS_API_KEY:
+            return []
+        return _live_candidate_routes(origin, destination, arrival_time_iso) or []
+
+    maps_url = google_maps_link(origin, destination, arrival_time_iso)
+    # Mock deterministic candidates (flavored by the city provider)
     mocked: List[RouteCandidate] = [
-        RouteCandidate(
-            summary="Q line via 57 St (57 min, 1 transfer)",
-            duration_min=57,
-            transfers=1,
-            mode="transit",
-            maps_url=maps_url,
-        ),
-        RouteCandidate(
-            summary="M1 → M4 accessible bus (65 min, 1 transfer)",
-            duration_min=65,
-            transfers=1,
-            mode="bus",
-            maps_url=maps_url,
-        ),
-        RouteCandidate(
-            summary="Taxi/ride (28 min, no transfers)",
-            duration_min=28,
-            transfers=0,
-            mode="drive",
-            maps_url=maps_url,
-        ),
+        RouteCandidate(summary=summary, duration_min=duration, transfers=transfers, mode=mode, maps_url=maps_url)
+        for summary, duration, transfers, mode in get_provider(city).mock_routes
     ]
     return mocked
 
@@ -1,12 +1,61 @@
 from __future__ import annotations
-from typing import List, Optional
+import re
+from typing import Any, Dict, List, Optional
+
+import orjson
+
 from app.models.schemas import AlternativeRoute, ContextBullet, ContextPackage, EventRef, OriginRef
 
 
+# Splits text the way BPE pre-tokenizers do: letter runs, digit runs, single symbols.
+_TOKEN_PIECE_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+# Short codes used by the compact prompt encoding
+_BULLET_CODES = {
+    "route_summary": "route",
+    "accessibility_alert": "alert",
+    "venue_access": "venue",
+    "weather_risk": "weather",
+    "buffer_recommendation": "leave",
+    "slope_warning": "slope",
+}
+
+# Lower value = more important; dropped last when over the token budget
+_BULLET_PRIORITY = {
+    "accessibility_alert": 0,
+    "route_summary": 1,
+    "buffer_recommendation": 2,
+    "slope_warning": 3,
+    "venue_access": 4,
+    "weather_risk": 5,
+}
+
+# One of each bullet kind fuse_context can emit, so the leave-by line is never cut
+MAX_HIGHLIGHTS = len(_BULLET_CODES)
+
+COMPACT_LEGEND = (
+    "Compact keys: ev=event (t=title, s=start, l=location), o=origin (l=label, a=address), "
+    "h=highlights as [kind, text, citation indexes], alt=alternatives as [summary, citation indexes], "
+    "c=citations list, src=sources."
+)
+COMPACT_PREAMBLE = f"Context package (compact JSON). {COMPACT_LEGEND}"
+
+
 def estimate_tokens(texts: List[str]) -> int:
-    # Rudimentary token estimate (~4 chars per token)
-    chars = sum(len(t) for t in texts)
-    return max(1, chars // 4)
+    """
+    Approximate BPE token count: common short words are one token, long words
+    split roughly every 6 letters, digit runs every 3 digits, symbols are one each.
+    """
+    tokens = 0
+    for t in texts:
+        for piece in _TOKEN_PIECE_RE.findall(t or ""):
+            if piece.isalpha():
+                tokens += 1 + (len(piece) - 1) // 6
+            elif piece.isdigit():
+                tokens += 1 + (len(piece) - 1) // 3
+            else:
+                tokens += 1
+    return max(1, tokens)
 
 
 def build_context_package(
@@ -32,7 +81,7 @@ def build_context_package(
         sources_used=sources,
         event=EventRef(title=event_title, start_time_iso=event_start_iso, location_text=event_location),
         origin=OriginRef(label=origin_label, address=origin_address),
-        highlights=bullets[:5],
+        highlights=bullets[:MAX_HIGHLIGHTS],
         alternatives=alts,
         raw_citations=list(dict.fromkeys(raw_links))[:6],
         token_estimate=token_est,
@@ -40,3 +89,114 @@ def build_context_package(
     )
     return pkg
 
+
+
+def _compact_dict(d: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in d.items() if v not in (None, "", [], {})}
+
+
+def _encode_compact(
+    pkg: ContextPackage,
+    bullets: List[ContextBullet],
+    include_alternatives: bool,
+) -> Dict[str, Any]:
+    citations: List[str] = []
+    index: Dict[str, int] = {}
+
+    def refs(urls: List[str]) -> List[int]:
+        out: List[int] = []
+        for u in urls:
+            if u not in index:
+                index[u] = len(citations)
+                citations.append(u)
+            out.append(index[u])
+        return out
+
+    highlights = []
+    for b in bullets:
+        item: List[Any] = [_BULLET_CODES.get(b.type, b.type), b.text]
+        r = refs(b.citations)
+        if r:
+            item.append(r)
+        highlights.append(item)
+
+    alts = []
+    if include_alternatives:
+        for a in pkg.alternatives:
+            item = [a.summary]
+            r = refs(a.citations)
+            if r:
+                item.append(r)
+            alts.append(item)
+
+    return _compact_dict(
+        {
+            "ev": _compact_dict({"t": pkg.event.title, "s": pkg.event.start_time_iso, "l": pkg.event.location_text}),
+            "o": _compact_dict({"l": pkg.origin.label, "a": pkg.origin.address}),
+            "h": highlights,
+            "alt": alts,
+            "c": citations,
+            "src": pkg.sources_used,
+        }
+    )
+
+
+def _truncate_words(text: str, max_tokens: int) -> str:
+    words = text.split()
+    truncated = False
+    while words and estimate_tokens([" ".join(words)]) > max_tokens:
+        words.pop()
+        truncated = True
+    if not words:
+        return ""
+    return " ".join(words) + ("…" if truncated else "")
+
+
+def compact_context_text(enc: Dict[str, Any]) -> str:
+    """The compact context exactly as it is put in the prompt: preamble, legend, then the JSON."""
+    return f"{COMPACT_PREAMBLE}\n{orjson.dumps(enc).decode()}"
+
+
+def encode_context_compact(pkg: ContextPackage, token_budget: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Compact prompt encoding of a package: short keys, citations deduplicated into
+    one list referenced by index, empty fields dropped. When a token budget is
+    given it covers the whole `compact_context_text`, legend included. Bullets
+    are dropped lowest priority first, then the alternatives, and finally the
+    text of the most important bullet is truncated (or the bullet dropped if no
+    prefix of it fits). Bullets that stay keep their original order.
+    """
+    def size(enc: Dict[str, Any]) -> int:
+        return estimate_tokens([compact_context_text(enc)])
+
+    bullets = list(pkg.highlights)
+    enc = _encode_compact(pkg, bullets, include_alternatives=True)
+    if not token_budget or size(enc) <= token_budget:
+        return enc
+
+    # Least important first; of equally important bullets the later one goes first
+    drop_order = sorted(
+        range(len(bullets)), key=lambda i: (_BULLET_PRIORITY.get(bullets[i].type, len(_BULLET_PRIORITY)), i), reverse=True
+    )
+    kept = list(bullets)
+    for i in drop_order[:-1]:
+        kept.remove(bullets[i])
+        enc = _encode_compact(pkg, kept, include_alternatives=True)
+        if size(enc) <= token_budget:
+            return enc
+
+    enc = _encode_compact(pkg, kept, include_alternatives=False)
+    if size(enc) <= token_budget or not kept:
+        return enc
+    last = kept[0]
+    # The ellipsis and JSON escaping can cost a token more than estimated; shrink until it fits
+    keep = estimate_tokens([last.text]) - (size(enc) - token_budget)
+    while keep > 0:
+        text = _truncate_words(last.text, keep)
+        if not text:
+            break
+        trial = _encode_compact(pkg, [last.model_copy(update={"text": text})], include_alternatives=False)
+        if size(trial) <= token_budget:
+            return trial
+        keep -= 1
+    return _encode_compact(pkg, [], include_alternatives=False)
@@ -1,10 +1,12 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Collection, Dict, List, Mapping, Optional, Tuple
 
+from app.config import settings
 from app.models.schemas import ContextBullet, AlternativeRoute
 from app.services.directions import RouteCandidate
+from app.services.terrain import SlopeProfile, describe_slope
 
 
 @dataclass
@@ -16,12 +18,21 @@ class FusedDecision:
     leave_by_iso: Optional[str]
 
 
-def score_route(candidate: RouteCandidate, outage_hits: int, weather_penalty: int) -> float:
+def score_route(
+    candidate: RouteCandidate,
+    outage_hits: int,
+    weather_penalty: int,
+    slope_penalty: int = 0,
+    expected_outages: float = 0.0,
+) -> float:
     score = 100.0
     score -= candidate.duration_min * 0.5
     score -= candidate.transfers * 5.0
     score -= outage_hits * 30.0
+    # Stations with no current outage but a history of them, weighted by how often
+    score -= expected_outages * 30.0
     score -= weather_penalty * 5.0
+    score -= slope_penalty * 12.0
     if candidate.mode == "drive":
         score += 5.0  # faster, but maybe lower accessibility
     if candidate.mode == "bus":
@@ -40,82 +51,171 @@ def compute_leave_by(arrival_iso: Optional[str], duration_min: int, buffer_min:
         return None
 
 
-def fuse_context(
+# Fusion inputs a bullet can depend on (recorded in ContextBullet.depends_on)
+ROUTES = "routes"
+OUTAGES = "outages"
+VENUE = "venue"
+WEATHER = "weather"
+ARRIVAL = "arrival"
+BUFFER = "buffer"
+SLOPE = "slope"
+RELIABILITY = "reliability"
+FUSION_INPUTS = (ROUTES, OUTAGES, VENUE, WEATHER, ARRIVAL, BUFFER, SLOPE, RELIABILITY)
+RANKING_INPUTS = (ROUTES, OUTAGES, WEATHER, SLOPE, RELIABILITY)
+
+MTA_FEED_URL = "https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fnyct_ene.json"
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+OPENWEATHER_URL = "https://openweathermap.org/"
+
+
+def rank_routes(
     candidates: List[RouteCandidate],
-    arrivals_iso: Optional[str],
-    buffer_min: int,
     outages_texts: List[str],
-    venue_wc: Optional[Tuple[str, str]],
     weather_risk: str,
-) -> FusedDecision:
-    weather_penalty = 1 if weather_risk else 0
+    weather_penalty: Optional[int] = None,
+    outage_stops: Collection[str] = (),
+    slopes: Optional[Mapping[RouteCandidate, SlopeProfile]] = None,
+    stop_unavailability: Optional[Mapping[str, float]] = None,
+) -> Tuple[Optional[RouteCandidate], Optional[RouteCandidate]]:
+    """
+    Best and runner-up candidate. `weather_penalty` is the trip's exposure
+    severity (default: 1 if any risk); `outage_stops` are lower-cased stop
+    names with an accessibility outage, matched against each route's stops;
+    `slopes` holds the walking-leg slope profile of the candidates that have one;
+    `stop_unavailability` maps lower-cased stop names without a current outage
+    to their station's historical outage rate.
+    """
+    slopes = slopes or {}
+    stop_unavailability = stop_unavailability or {}
+    if weather_penalty is None:
+        weather_penalty = 1 if weather_risk else 0
     scored: List[Tuple[float, RouteCandidate]] = []
     for c in candidates:
         # naive: if any known problematic station is embedded in summary text, count one outage hit
         outage_hits = sum(1 for t in outages_texts if t.lower() in c.summary.lower())
-        scored.append((score_route(c, outage_hits, weather_penalty), c))
+        outage_hits += sum(1 for s in c.stops if s.lower() in outage_stops)
+        # Door-to-door driving is exposed to the weather far less than walking and waiting
+        exposure = max(0, weather_penalty - 1) if c.mode == "drive" else weather_penalty
+        profile = slopes.get(c)
+        expected = sum(stop_unavailability.get(s.lower(), 0.0) for s in c.stops)
+        scored.append((score_route(c, outage_hits, exposure, profile.penalty if profile else 0, expected), c))
     scored.sort(key=lambda x: x[0], reverse=True)
     best = scored[0][1] if scored else None
     alt = scored[1][1] if len(scored) > 1 else None
+    return best, alt
 
-    bullets: List[ContextBullet] = []
-    raw_links: List[str] = []
-
-    if best:
-        bullets.append(
-            ContextBullet(
-                type="route_summary",
-                text=f"{best.summary}.",
-                citations=[best.maps_url] if best.maps_url else [],
-            )
-        )
-        if best.maps_url:
-            raw_links.append(best.maps_url)
-
-    # Accessibility alert
-    if outages_texts:
-        bullets.append(
-            ContextBullet(
-                type="accessibility_alert",
-                text="; ".join(outages_texts) + ". Consider alternate stations if applicable.",
-                citations=["https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fnyct_ene.json"],
-            )
-        )
-        raw_links.append("https://api-endpoint.mta.info/Dataservice/mtagtfsfeeds/nyct%2Fnyct_ene.json")
-
-    # Venue wheelchair
-    if venue_wc:
-        wc, note = venue_wc
-        note_part = f" — {note}" if note else ""
-        bullets.append(
-            ContextBullet(
-                type="venue_access",
-                text=f"Destination wheelchair access: {wc}{note_part}",
-                citations=["https://overpass-api.de/api/interpreter"],
-            )
-        )
-        raw_links.append("https://overpass-api.de/api/interpreter")
-
-    # Weather
-    if weather_risk:
-        bullets.append(
-            ContextBullet(
-                type="weather_risk",
-                text=weather_risk,
-                citations=["https://openweathermap.org/"],
-            )
-        )
-        raw_links.append("https://openweathermap.org/")
 
-    leave_by_iso = compute_leave_by(arrivals_iso, best.duration_min if best else 0, buffer_min)
-    if leave_by_iso:
-        bullets.append(
-            ContextBullet(
-                type="buffer_recommendation",
-                text=f"Leave by {leave_by_iso} to keep a {buffer_min} minute buffer.",
-                citations=[],
-            )
-        )
+def route_bullet(best: Optional[RouteCandidate]) -> Optional[ContextBullet]:
+    if not best:
+        return None
+    return ContextBullet(
+        type="route_summary",
+        text=f"{best.summary}.",
+        citations=[best.maps_url] if best.maps_url else [],
+        depends_on=list(RANKING_INPUTS),
+    )
+
+
+def outage_bullet(outages_texts: List[str], citation: Optional[str] = MTA_FEED_URL) -> Optional[ContextBullet]:
+    if not outages_texts:
+        return None
+    return ContextBullet(
+        type="accessibility_alert",
+        text="; ".join(outages_texts) + ". Consider alternate stations if applicable.",
+        citations=[citation] if citation else [],
+        depends_on=[OUTAGES],
+    )
+
+
+def slope_bullet(
+    best: Optional[RouteCandidate],
+    slopes: Optional[Mapping[RouteCandidate, SlopeProfile]],
+) -> Optional[ContextBullet]:
+    profile = (slopes or {}).get(best) if best else None
+    if not best or not profile or not profile.penalty:
+        return None
+    return ContextBullet(
+        type="slope_warning",
+        text=describe_slope(best, profile),
+        citations=[settings.DEM_CITATION] if settings.DEM_CITATION else [],
+        depends_on=list(RANKING_INPUTS),
+    )
 
-    return FusedDecision(best=best, alternative=alt, bullets=bullets, raw_links=raw_links, leave_by_iso=leave_by_iso)
 
+def venue_bullet(venue_wc: Optional[Tuple[str, str]]) -> Optional[ContextBullet]:
+    if not venue_wc:
+        return None
+    wc, note = venue_wc
+    note_part = f" — {note}" if note else ""
+    return ContextBullet(
+        type="venue_access",
+        text=f"Destination wheelchair access: {wc}{note_part}",
+        citations=[OVERPASS_URL],
+        depends_on=[VENUE],
+    )
+
+
+def weather_bullet(weather_risk: str) -> Optional[ContextBullet]:
+    if not weather_risk:
+        return None
+    return ContextBullet(
+        type="weather_risk",
+        text=weather_risk,
+        citations=[OPENWEATHER_URL],
+        depends_on=[WEATHER],
+    )
+
+
+def buffer_bullet(leave_by_iso: Optional[str], buffer_min: int) -> Optional[ContextBullet]:
+    if not leave_by_iso:
+        return None
+    return ContextBullet(
+        type="buffer_recommendation",
+        text=f"Leave by {leave_by_iso} to keep a {buffer_min} minute buffer.",
+        citations=[],
+        depends_on=[*RANKING_INPUTS, ARRIVAL, BUFFER],
+    )
+
+
+def assemble(
+    best: Optional[RouteCandidate],
+    alternative: Optional[RouteCandidate],
+    bullets: List[Optional[ContextBullet]],
+    leave_by_iso: Optional[str],
+) -> FusedDecision:
+    """Bullets in display order (missing ones skipped); raw links follow their citations."""
+    kept = [b for b in bullets if b is not None]
+    raw_links = [url for b in kept for url in b.citations]
+    return FusedDecision(best=best, alternative=alternative, bullets=kept, raw_links=raw_links, leave_by_iso=leave_by_iso)
+
+
+def fuse_context(
+    candidates: List[RouteCandidate],
+    arrivals_iso: Optional[str],
+    buffer_min: int,
+    outages_texts: List[str],
+    venue_wc: Optional[Tuple[str, str]],
+    weather_risk: str,
+    outage_citation: Optional[str] = MTA_FEED_URL,
+    weather_penalty: Optional[int] = None,
+    outage_stops: Collection[str] = (),
+    slopes: Optional[Mapping[RouteCandidate, SlopeProfile]] = None,
+    stop_unavailability: Optional[Mapping[str, float]] = None,
+) -> FusedDecision:
+    best, alt = rank_routes(
+        candidates, outages_texts, weather_risk, weather_penalty, outage_stops, slopes, stop_unavailability
+    )
+    leave_by_iso = compute_leave_by(arrivals_iso, best.duration_min if best else 0, buffer_min)
+    return assemble(
+        best,
+        alt,
+        [
+            route_bullet(best),
+            outage_bullet(outages_texts, outage_citation),
+            slope_bullet(best, slopes),
+            venue_bullet(venue_wc),
+            weather_bullet(weather_risk),
+            buffer_bullet(leave_by_iso, buffer_min),
+        ],
+        leave_by_iso,
+    )
@@ -0,0 +1,389 @@
+from __future__ import annotations
+import argparse
+import bisect
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+import xml.etree.ElementTree as ET
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+GeoResult = Tuple[float, float, str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+    osm_id TEXT PRIMARY KEY,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    name TEXT,
+    housenumber TEXT,
+    street TEXT,
+    city TEXT
+);
+"""
+
+# Spelling variants folded onto one form, so "Fifth Avenue" and "5th Ave" share a key
+_FOLD = {
+    "street": "st", "avenue": "ave", "av": "ave", "boulevard": "blvd", "road": "rd", "place": "pl",
+    "drive": "dr", "lane": "ln", "parkway": "pkwy", "square": "sq", "terrace": "ter", "court": "ct",
+    "highway": "hwy", "expressway": "expy", "plaza": "plz", "north": "n", "south": "s", "east": "e",
+    "west": "w", "saint": "st", "mount": "mt", "fort": "ft",
+    "first": "1st", "second": "2nd", "third": "3rd", "fourth": "4th", "fifth": "5th", "sixth": "6th",
+    "seventh": "7th", "eighth": "8th", "ninth": "9th", "tenth": "10th",
+}
+_STOPWORDS = {"the", "of", "and", "at"}
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_DIGIT_RE = re.compile(r"\d")
+# A later comma-separated part is only tried when it reads as "<house number> <street>"
+_STREET_PART_RE = re.compile(r"^\d+[a-z]*(?: \d+[a-z]*)? [a-z]")
+
+# Entries sharing a key but further apart than this are different places ("Starbucks")
+_AMBIGUOUS_M = 250.0
+_AMBIGUOUS = -1
+_PREFIX_COVERAGE = 0.6
+
+# Overpass query for the importer: street addresses and named points of interest
+_IMPORT_QUERY = """[out:json][timeout:900];
+(
+  nwr["addr:housenumber"]["addr:street"]({bbox});
+  nwr["name"]["amenity"]({bbox});
+  nwr["name"]["tourism"]({bbox});
+  nwr["name"]["leisure"]({bbox});
+  nwr["name"]["shop"]({bbox});
+  nwr["name"]["office"]({bbox});
+  nwr["name"]["healthcare"]({bbox});
+  nwr["name"]["building"]["building"!="yes"]({bbox});
+  nwr["name"]["railway"="station"]({bbox});
+);
+out tags center;
+"""
+
+
+def normalize(text: str) -> str:
+    """Lower-case ASCII tokens with street words and ordinals folded and filler words dropped."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+    return " ".join(_FOLD.get(t, t) for t in _TOKEN_RE.findall(text) if t not in _STOPWORDS)
+
+
+def _trigrams(key: str) -> List[str]:
+    padded = f"  {key} "
+    return list({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def _numbers(key: str) -> frozenset:
+    # House numbers and numbered streets must agree exactly; trigrams alone would
+    # happily match 1000 5th Ave to 1002 5th Ave
+    return frozenset(t for t in key.split() if _DIGIT_RE.search(t))
+
+
+def _distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    dy = (lat2 - lat1) * 111_320.0
+    dx = (lon2 - lon1) * 111_320.0 * math.cos(math.radians((lat1 + lat2) / 2))
+    return math.hypot(dx, dy)
+
+
+class Gazetteer:
+    """
+    In-memory index over the imported places: exact normalized keys in a
+    dict, the same keys sorted for unique-prefix completion, and a trigram
+    posting list per key for typo-tolerant matching. Every place is indexed
+    by its name and by "housenumber street". A key shared by places far
+    apart is marked ambiguous and never answered locally.
+    """
+
+    def __init__(self, places: Sequence[Tuple[float, float, str, List[str]]]) -> None:
+        self.lat = array("d")
+        self.lon = array("d")
+        self.display: List[str] = []
+        exact: Dict[str, int] = {}
+        for lat, lon, display, keys in places:
+            pid = len(self.display)
+            self.lat.append(lat)
+            self.lon.append(lon)
+            self.display.append(display)
+            for key in keys:
+                prev = exact.get(key)
+                if prev is None:
+                    exact[key] = pid
+                elif prev != _AMBIGUOUS and _distance_m(self.lat[prev], self.lon[prev], lat, lon) > _AMBIGUOUS_M:
+                    exact[key] = _AMBIGUOUS
+        self.exact = exact
+        self.keys = sorted(exact)
+        self.key_numbers = [_numbers(k) for k in self.keys]
+        self.key_grams = array("H", (min(len(_trigrams(k)), 65535) for k in self.keys))
+        postings: Dict[str, array] = {}
+        for i, key in enumerate(self.keys):
+            for gram in _trigrams(key):
+                postings.setdefault(gram, array("I")).append(i)
+        self.postings = postings
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.display)
+
+    def _result(self, pid: int) -> GeoResult:
+        return self.lat[pid], self.lon[pid], self.display[pid]
+
+    def _prefix(self, key: str) -> Optional[int]:
+        """
+        The single place whose keys start with `key`, if exactly one does and
+        `key` covers most of it: "metropolitan museum" completes, "new york"
+        does not become the New York Public Library.
+        """
+        i = bisect.bisect_left(self.keys, key)
+        found: Optional[int] = None
+        while i < len(self.keys) and self.keys[i].startswith(key):
+            pid = self.exact[self.keys[i]]
+            if pid == _AMBIGUOUS or (found is not None and pid != found) or len(key) < _PREFIX_COVERAGE * len(self.keys[i]):
+                return None
+            found = pid
+            i += 1
+        return found
+
+    def _fuzzy(self, key: str, min_similarity: float) -> Optional[Tuple[float, int]]:
+        """Best (dice similarity, place) over the trigram postings, if above `min_similarity`."""
+        grams = _trigrams(key)
+        counts: Counter = Counter()
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is not None:
+                counts.update(posting)
+        if not counts:
+            return None
+        numbers = _numbers(key)
+        best: Optional[Tuple[float, int]] = None
+        for ki, shared in counts.most_common(32):
+            score = 2.0 * shared / (len(grams) + self.key_grams[ki])
+            if score < min_similarity or self.key_numbers[ki] != numbers:
+                continue
+            pid = self.exact[self.keys[ki]]
+            if pid == _AMBIGUOUS:
+                continue
+            if best is None or score > best[0]:
+                best = (score, pid)
+        return best
+
+    def lookup(self, query: str, min_similarity: Optional[float] = None) -> Optional[GeoResult]:
+        """
+        Resolve a free-form address or venue. Tries the whole query, its
+        leading (venue) part and any later part carrying a house number
+        ("The Met, 1000 5th Ave, New York"): exact key, then unique prefix,
+        then the best trigram match. Trailing locality parts ("Brooklyn",
+        "NY") are never matched on their own.
+        """
+        if min_similarity is None:
+            min_similarity = settings.GAZETTEER_MIN_SIMILARITY
+        whole = normalize(query)
+        parts = [normalize(p) for p in query.split(",")]
+        kept = parts[:1] + [k for k in parts[1:] if _STREET_PART_RE.match(k)]
+        candidates = [whole] + [k for k in dict.fromkeys(kept) if k and k != whole]
+        for key in candidates:
+            pid = self.exact.get(key)
+            if pid is not None and pid != _AMBIGUOUS:
+                self.hits += 1
+                return self._result(pid)
+        for key in candidates:
+            if len(key) >= 4:
+                pid = self._prefix(key)
+                if pid is not None:
+                    self.hits += 1
+                    return self._result(pid)
+        best: Optional[Tuple[float, int]] = None
+        for key in candidates:
+            if len(key) >= 4:
+                found = self._fuzzy(key, min_similarity)
+                if found is not None and (best is None or found[0] > best[0]):
+                    best = found
+        if best is not None:
+            self.hits += 1
+            return self._result(best[1])
+        self.misses += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"places": len(self), "keys": len(self.keys), "hits": self.hits, "misses": self.misses}
+
+
+def _display(name: Optional[str], housenumber: Optional[str], street: Optional[str], city: Optional[str]) -> str:
+    address = f"{housenumber} {street}" if housenumber and street else None
+    parts = [p for p in (name, address, city) if p]
+    return ", ".join(parts)
+
+
+def load_gazetteer(path: str) -> Gazetteer:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT lat, lon, name, housenumber, street, city FROM places").fetchall()
+    finally:
+        conn.close()
+    places = []
+    for lat, lon, name, housenumber, street, city in rows:
+        keys = []
+        if name:
+            keys.append(normalize(name))
+        if housenumber and street:
+            keys.append(normalize(f"{housenumber} {street}"))
+        keys = [k for k in keys if k]
+        if keys:
+            places.append((lat, lon, _display(name, housenumber, street, city), keys))
+    return Gazetteer(places)
+
+
+_gazetteer_lock = threading.Lock()
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_error: Optional[str] = None
+
+
+def get_gazetteer() -> Optional[Gazetteer]:
+    """The GAZETTEER_PATH index, loaded once; None if unset or unreadable."""
+    global _gazetteer, _gazetteer_error
+    if not settings.GAZETTEER_PATH:
+        return None
+    if _gazetteer is not None or _gazetteer_error is not None:
+        return _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None and _gazetteer_error is None:
+            try:
+                _gazetteer = load_gazetteer(settings.GAZETTEER_PATH)
+            except Exception as e:
+                _gazetteer_error = f"{type(e).__name__}: {e}"
+    return _gazetteer
+
+
+def lookup_place(query: str) -> Optional[GeoResult]:
+    """(lat, lng, canonical name) from the local gazetteer, or None on a miss or when none is configured."""
+    gazetteer = get_gazetteer()
+    return gazetteer.lookup(query) if gazetteer is not None else None
+
+
+def gazetteer_stats() -> Dict[str, Any]:
+    if not settings.GAZETTEER_PATH:
+        return {"enabled": False}
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return {"enabled": True, "error": _gazetteer_error}
+    return {"enabled": True, **gazetteer.stats()}
+
+
+# --- importer -----------------------------------------------------------------
+
+Place = Tuple[str, float, float, Optional[str], Optional[str], Optional[str], Optional[str]]
+
+
+def _place(osm_id: str, lat: float, lon: float, tags: Dict[str, str]) -> Optional[Place]:
+    name = tags.get("name")
+    housenumber, street = tags.get("addr:housenumber"), tags.get("addr:street")
+    if not name and not (housenumber and street):
+        return None
+    return osm_id, lat, lon, name, housenumber, street, tags.get("addr:city")
+
+
+def _from_overpass_json(data: Dict[str, Any]) -> Iterator[Place]:
+    for el in data.get("elements", ()):
+        if "lat" in el and "lon" in el:
+            lat, lon = el["lat"], el["lon"]
+        elif "center" in el:
+            lat, lon = el["center"]["lat"], el["center"]["lon"]
+        else:
+            continue
+        place = _place(f"{el.get('type', 'node')}/{el.get('id')}", lat, lon, el.get("tags") or {})
+        if place is not None:
+            yield place
+
+
+def _from_osm_xml(path: str) -> Iterator[Place]:
+    """
+    Streams an .osm XML extract. Ways are placed at the mean of their nodes
+    (or at an Overpass <center>), so node coordinates are kept while parsing.
+    """
+    nodes: Dict[int, Tuple[float, float]] = {}
+    for _, el in ET.iterparse(path, events=("end",)):
+        if el.tag not in ("node", "way"):
+            continue
+        tags = {t.get("k"): t.get("v") for t in el.iter("tag")}
+        if el.tag == "node":
+            lat, lon = float(el.get("lat")), float(el.get("lon"))
+            nodes[int(el.get("id"))] = (lat, lon)
+        else:
+            center = el.find("center")
+            if center is not None:
+                lat, lon = float(center.get("lat")), float(center.get("lon"))
+            else:
+                pts = [nodes[int(nd.get("ref"))] for nd in el.iter("nd") if int(nd.get("ref")) in nodes]
+                if not pts:
+                    el.clear()
+                    continue
+                lat, lon = sum(p[0] for p in pts) / len(pts), sum(p[1] for p in pts) / len(pts)
+        if tags:
+            place = _place(f"{el.tag}/{el.get('id')}", lat, lon, tags)
+            if place is not None:
+                yield place
+        el.clear()
+
+
+def _from_overpass(bbox: str) -> Iterator[Place]:
+    import httpx
+
+    r = httpx.post(settings.OSM_OVERPASS_URL, data={"data": _IMPORT_QUERY.format(bbox=bbox)}, timeout=960.0)
+    r.raise_for_status()
+    return _from_overpass_json(r.json())
+
+
+def import_places(path: str, places: Iterable[Place]) -> int:
+    """Upsert places into the gazetteer database at `path`; returns how many were written."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(_SCHEMA)
+        count = 0
+        with conn:
+            for place in places:
+                conn.execute("INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?, ?, ?, ?)", place)
+                count += 1
+    finally:
+        conn.close()
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.services.gazetteer",
+        description="Import OSM addresses and points of interest into the local gazetteer (GAZETTEER_PATH).",
+    )
+    parser.add_argument("sources", nargs="*", help="Overpass JSON (.json) or OSM XML (.osm) files")
+    parser.add_argument("--bbox", help="fetch from Overpass instead: south,west,north,east")
+    parser.add_argument("--db", default=settings.GAZETTEER_PATH, help="gazetteer database (default: GAZETTEER_PATH)")
+    args = parser.parse_args(argv)
+    if not args.db:
+        parser.error("set GAZETTEER_PATH or pass --db")
+    if not args.sources and not args.bbox:
+        parser.error("give source files or --bbox")
+    start = time.perf_counter()
+    total = 0
+    if args.bbox:
+        total += import_places(args.db, _from_overpass(args.bbox))
+    for source in args.sources:
+        if source.endswith(".json"):
+            with open(source, "rb") as f:
+                total += import_places(args.db, _from_overpass_json(json.load(f)))
+        else:
+            total += import_places(args.db, _from_osm_xml(source))
+    gazetteer = load_gazetteer(args.db)
+    sys.stdout.write(
+        f"Imported {total} places in {time.perf_counter() - start:.1f}s; "
+        f"{args.db} now indexes {len(gazetteer)} places under {len(gazetteer.keys)} keys\n"
+    )
+
+
+if __name__ == "__main__":
+    main()
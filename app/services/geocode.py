@@ -1,38 +1,118 @@
-from typing import Optional, Tuple
+import contextvars
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Tuple
 from app.config import settings
-from app.utils.http import get_http_client
+from app.services.gazetteer import lookup_place
+from app.utils.cache import ttl_cache
+from app.utils.http import upstream_request
+from app.utils.resilience import get_upstream
+from app.utils.singleflight import singleflight
+
+GeoResult = Tuple[float, float, str]
+
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="geocode-hedge")
+
+
+def _reset_pool_after_fork() -> None:
+    # Worker threads do not survive fork; give the child a fresh pool
+    global _hedge_pool
+    _hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="geocode-hedge")
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
+
+
+def _geocode_google(address: str) -> Optional[GeoResult]:
+    url = "https://maps.googleapis.com/maps/api/geocode/json"
+    r = upstream_request("google_geocode", "GET", url, params={"address": address, "key": settings.GOOGLE_MAPS_API_KEY})
+    if r.status_code == 200:
+        data = r.json()
+        results = data.get("results") or []
+        if results:
+            loc = results[0]["geometry"]["location"]
+            formatted = results[0].get("formatted_address", address)
+            return loc["lat"], loc["lng"], formatted
+    return None
+
+
+def _geocode_nominatim(address: str) -> Optional[GeoResult]:
+    url = "https://nominatim.openstreetmap.org/search"
+    r = upstream_request("nominatim", "GET", url, params={"q": address, "format": "json", "limit": 1})
+    if r.status_code == 200:
+        arr = r.json()
+        if arr:
+            lat = float(arr[0]["lat"])
+            lon = float(arr[0]["lon"])
+            disp = arr[0].get("display_name", address)
+            return lat, lon, disp
+    return None
+
+
+def _safe(fn: Callable[[str], Optional[GeoResult]], address: str) -> Optional[GeoResult]:
+    try:
+        return fn(address)
+    except Exception:
+        return None
+
+
+def _hedge_delay() -> float:
+    if settings.GEOCODE_HEDGE_DELAY_SECONDS is not None:
+        return settings.GEOCODE_HEDGE_DELAY_SECONDS
+    p90 = get_upstream("google_geocode").latency.percentile(0.9)
+    return p90 if p90 is not None else 0.5
+
+
+def _first_result(providers: List[Callable[[str], Optional[GeoResult]]], address: str, delay: float) -> Optional[GeoResult]:
+    """
+    Start providers in order, launching the next one after `delay` seconds
+    (or as soon as an earlier one comes back empty). Returns the first
+    non-empty result; slower calls are left to finish in the background.
+    """
+    pending: List[Future] = []
+    queue = list(providers)
+    while queue or pending:
+        if queue:
+            # Run in the caller's context so batch_priority() reaches the Nominatim bucket
+            pending.append(_hedge_pool.submit(contextvars.copy_context().run, _safe, queue.pop(0), address))
+        done, not_done = wait(pending, timeout=delay if queue else None, return_when=FIRST_COMPLETED)
+        pending = list(not_done)
+        for fut in done:
+            result = fut.result()
+            if result:
+                return result
+    return None
 
 
 def geocode_address(address: str) -> Optional[Tuple[float, float, str]]:
     """
-    Returns (lat, lng, resolved_address) or None.
+    Returns (lat, lng, resolved_address) or None. The local gazetteer
+    (GAZETTEER_PATH) answers first; remote geocoders only see its misses.
+    """
+    return lookup_place(address) or _geocode_remote(address)
+
+
+@ttl_cache("geocode", settings.GEOCODE_CACHE_TTL_SECONDS)
+@singleflight("geocode")
+def _geocode_remote(address: str) -> Optional[Tuple[float, float, str]]:
+    """
     Uses Google Geocoding if key present; otherwise Nominatim fallback.
+    With a Google key, GEOCODE_STRATEGY picks how the two are combined:
+    "sequential" tries Google then Nominatim, "hedged" starts Nominatim only
+    if Google has not answered within the hedge delay, "race" starts both.
     """
     address = address.strip()
-    try:
-        if settings.GOOGLE_MAPS_API_KEY:
-            url = "https://maps.googleapis.com/maps/api/geocode/json"
-            with get_http_client() as client:
-                r = client.get(url, params={"address": address, "key": settings.GOOGLE_MAPS_API_KEY})
-                if r.status_code == 200:
-                    data = r.json()
-                    results = data.get("results") or []
-                    if results:
-                        loc = results[0]["geometry"]["location"]
-                        formatted = results[0].get("formatted_address", address)
-                        return loc["lat"], loc["lng"], formatted
-        # Fallback to Nominatim
-        url = "https://nominatim.openstreetmap.org/search"
-        with get_http_client() as client:
-            r = client.get(url, params={"q": address, "format": "json", "limit": 1})
-            if r.status_code == 200:
-                arr = r.json()
-                if arr:
-                    lat = float(arr[0]["lat"])
-                    lon = float(arr[0]["lon"])
-                    disp = arr[0].get("display_name", address)
-                    return lat, lon, disp
-    except Exception:
-        return None
+    if not settings.GOOGLE_MAPS_API_KEY:
+        return _safe(_geocode_nominatim, address)
+    providers = [_geocode_google, _geocode_nominatim]
+    strategy = settings.GEOCODE_STRATEGY
+    if strategy == "race":
+        return _first_result(providers, address, delay=0.0)
+    if strategy == "hedged":
+        return _first_result(providers, address, delay=_hedge_delay())
+    for provider in providers:
+        result = _safe(provider, address)
+        if result:
+            return result
     return None
-
@@ -0,0 +1,239 @@
+from __future__ import annotations
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+
+from app.config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS package_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    session_id TEXT NOT NULL,
+    event_key TEXT,
+    event_title TEXT,
+    event_start TEXT,
+    origin TEXT,
+    destination TEXT,
+    inputs BLOB,
+    timings BLOB,
+    source_versions BLOB,
+    package BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_event ON package_history (event_key, id);
+CREATE INDEX IF NOT EXISTS idx_history_session ON package_history (session_id, id);
+CREATE INDEX IF NOT EXISTS idx_history_created ON package_history (created_at);
+"""
+
+_INSERT = """
+INSERT INTO package_history (
+    created_at, session_id, event_key, event_title, event_start, origin, destination,
+    inputs, timings, source_versions, package
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_STOP = object()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class HistoryStore:
+    """
+    Append-only context package history in SQLite (WAL mode). `record()` only
+    enqueues; a background writer inserts rows in batches so the request path
+    never waits on disk. Reads page newest-first by row id (keyset cursor).
+    """
+
+    def __init__(self, path: str, batch_size: int = 50, flush_seconds: float = 0.5, max_pending: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.dropped = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_pending)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = _connect(path)
+        conn.executescript(_SCHEMA)
+        conn.close()
+        self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = _connect(self.path)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def record(
+        self,
+        session_id: Optional[str],
+        package: dict,
+        inputs: Dict[str, Any],
+        timings_ms: Dict[str, float],
+        source_versions: Dict[str, str],
+    ) -> None:
+        event = package.get("event") or {}
+        row = (
+            time.time(),
+            session_id or "default",
+            (package.get("meta") or {}).get("event_key"),
+            event.get("title"),
+            event.get("start_time_iso"),
+            inputs.get("origin"),
+            inputs.get("destination"),
+            orjson.dumps(inputs),
+            orjson.dumps(timings_ms),
+            orjson.dumps(source_versions),
+            orjson.dumps(package),
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        conn = _connect(self.path)
+        stopping = False
+        while not stopping:
+            batch: List[tuple] = []
+            try:
+                item = self._queue.get()
+            except Exception:
+                continue
+            deadline = time.monotonic() + self.flush_seconds
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(_INSERT, batch)
+                except sqlite3.Error:
+                    self.dropped += len(batch)
+        conn.close()
+
+    def close(self) -> None:
+        """Flush pending rows and stop the writer."""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(timeout=5.0)
+
+    def query(
+        self,
+        event_key: Optional[str] = None,
+        session_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        cursor: Optional[int] = None,
+        limit: int = 20,
+        include_package: bool = True,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Returns (rows, next_cursor), newest first. Pass next_cursor back as
+        `cursor` to fetch the following page; it is None on the last page.
+        """
+        limit = max(1, min(limit, 200))
+        clauses: List[str] = []
+        params: List[Any] = []
+        if event_key:
+            clauses.append("event_key = ?")
+            params.append(event_key)
+        if session_id:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        if cursor is not None:
+            clauses.append("id < ?")
+            params.append(cursor)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        columns = "id, created_at, session_id, event_key, event_title, event_start, origin, destination, inputs, timings, source_versions"
+        if include_package:
+            columns += ", package"
+        sql = f"SELECT {columns} FROM package_history {where} ORDER BY id DESC LIMIT ?"
+        rows = self._reader().execute(sql, (*params, limit + 1)).fetchall()
+        out: List[Dict[str, Any]] = []
+        for row in rows[:limit]:
+            item = dict(row)
+            for k in ("inputs", "timings", "source_versions", "package"):
+                if item.get(k) is not None:
+                    item[k] = orjson.loads(item[k])
+            out.append(item)
+        next_cursor = out[-1]["id"] if len(rows) > limit else None
+        return out, next_cursor
+
+
+_store: Optional[HistoryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_history_store() -> Optional[HistoryStore]:
+    """The process-wide store, or None when HISTORY_DB_PATH is not configured."""
+    global _store
+    if not settings.HISTORY_DB_PATH:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = HistoryStore(
+                    settings.HISTORY_DB_PATH,
+                    batch_size=settings.HISTORY_BATCH_SIZE,
+                    flush_seconds=settings.HISTORY_FLUSH_SECONDS,
+                )
+                atexit.register(_store.close)
+    return _store
+
+
+def record_history(session_id: Optional[str], result) -> None:
+    """Record a PipelineResult if history is enabled; never raises."""
+    try:
+        store = get_history_store()
+        if store is not None:
+            store.record(
+                session_id,
+                result.package.model_dump(),
+                result.inputs,
+                result.timings_ms,
+                result.source_versions,
+            )
+    except Exception:
+        pass
+
+
+def parse_time_bound(value: Optional[str]) -> Optional[float]:
+    """Accepts epoch seconds or an ISO-8601 timestamp."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        dt = datetime.fromisoformat(value)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
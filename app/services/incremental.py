@@ -0,0 +1,134 @@
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Collection, Dict, List, Mapping, Optional, Tuple
+
+from app.models.schemas import ContextBullet
+from app.services.directions import RouteCandidate
+from app.services.fusion import (
+    ARRIVAL,
+    BUFFER,
+    FUSION_INPUTS,
+    MTA_FEED_URL,
+    OUTAGES,
+    RANKING_INPUTS,
+    VENUE,
+    WEATHER,
+    FusedDecision,
+    assemble,
+    buffer_bullet,
+    compute_leave_by,
+    outage_bullet,
+    rank_routes,
+    route_bullet,
+    slope_bullet,
+    venue_bullet,
+    weather_bullet,
+)
+from app.services.terrain import SlopeProfile
+
+
+@dataclass
+class FusionState:
+    """A fused decision plus the version of every fusion input it was built from."""
+
+    fused: FusedDecision
+    versions: Dict[str, str]
+
+
+def refuse(
+    previous: Optional[FusionState],
+    versions: Dict[str, str],
+    candidates: List[RouteCandidate],
+    arrivals_iso: Optional[str],
+    buffer_min: int,
+    outages_texts: List[str],
+    venue_wc: Optional[Tuple[str, str]],
+    weather_risk: str,
+    outage_citation: Optional[str] = MTA_FEED_URL,
+    weather_penalty: Optional[int] = None,
+    outage_stops: Collection[str] = (),
+    slopes: Optional[Mapping[RouteCandidate, SlopeProfile]] = None,
+    stop_unavailability: Optional[Mapping[str, float]] = None,
+) -> Tuple[FusionState, List[str]]:
+    """
+    Same result as fuse_context, but only recomputes what depends on inputs
+    whose version changed since `previous`: the route ranking and leave-by
+    time when routes, outages, weather, slopes or reliability changed, and each bullet whose
+    `depends_on` intersects the changed inputs. Everything else is reused.
+    Returns the new state and the names of the parts that were recomputed.
+    """
+    if previous is None:
+        changed = set(FUSION_INPUTS)
+    else:
+        changed = {k for k in FUSION_INPUTS if versions.get(k) != previous.versions.get(k)}
+    recomputed: List[str] = []
+
+    if previous is not None and not changed:
+        return FusionState(fused=previous.fused, versions=dict(versions)), recomputed
+
+    if previous is None or changed & set(RANKING_INPUTS):
+        best, alt = rank_routes(
+            candidates, outages_texts, weather_risk, weather_penalty, outage_stops, slopes, stop_unavailability
+        )
+        recomputed.append("ranking")
+    else:
+        best, alt = previous.fused.best, previous.fused.alternative
+
+    if previous is None or changed & {*RANKING_INPUTS, ARRIVAL, BUFFER}:
+        leave_by_iso = compute_leave_by(arrivals_iso, best.duration_min if best else 0, buffer_min)
+        recomputed.append("leave_by")
+    else:
+        leave_by_iso = previous.fused.leave_by_iso
+
+    prev_bullets: Dict[str, ContextBullet] = {b.type: b for b in previous.fused.bullets} if previous else {}
+    builders = [
+        ("route_summary", set(RANKING_INPUTS), lambda: route_bullet(best)),
+        ("accessibility_alert", {OUTAGES}, lambda: outage_bullet(outages_texts, outage_citation)),
+        ("slope_warning", set(RANKING_INPUTS), lambda: slope_bullet(best, slopes)),
+        ("venue_access", {VENUE}, lambda: venue_bullet(venue_wc)),
+        ("weather_risk", {WEATHER}, lambda: weather_bullet(weather_risk)),
+        ("buffer_recommendation", {*RANKING_INPUTS, ARRIVAL, BUFFER}, lambda: buffer_bullet(leave_by_iso, buffer_min)),
+    ]
+    bullets: List[Optional[ContextBullet]] = []
+    for kind, deps, build in builders:
+        prev = prev_bullets.get(kind)
+        # A bullet absent last time has no depends_on; fall back to the builder's inputs
+        if previous is not None and not (set(prev.depends_on) if prev else deps) & changed:
+            bullets.append(prev)
+            continue
+        bullets.append(build())
+        recomputed.append(kind)
+
+    fused = assemble(best, alt, bullets, leave_by_iso)
+    return FusionState(fused=fused, versions=dict(versions)), recomputed
+
+
+class RecentResults:
+    """
+    Last pipeline result per (event, origin, city), bounded LRU. Lets a rebuild of
+    the same trip reuse the previous geocode and fusion state.
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self._lock = threading.Lock()
+        self._max = max_entries
+        self._items: "OrderedDict[Tuple[str, ...], Any]" = OrderedDict()
+
+    def get(self, key: Tuple[str, ...]) -> Any:
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+            return item
+
+    def put(self, key: Tuple[str, ...], result: Any) -> None:
+        with self._lock:
+            self._items[key] = result
+            self._items.move_to_end(key)
+            while len(self._items) > self._max:
+                self._items.popitem(last=False)
+
+
+recent_results = RecentResults()
@@ -5,6 +5,17 @@ import httpx
 
 from app.config import settings
 from app.models.schemas import ContextPackage
+from app.services.formatter import MAX_HIGHLIGHTS, compact_context_text, encode_context_compact
+
+
+def _context_parts(context_pkg: ContextPackage) -> List[Dict[str, str]]:
+    if settings.LLM_PROMPT_FORMAT == "json":
+        return [
+            {"text": "Context package JSON:"},
+            {"text": json.dumps(context_pkg.model_dump(), ensure_ascii=False)},
+        ]
+    enc = encode_context_compact(context_pkg, settings.LLM_PROMPT_TOKEN_BUDGET or None)
+    return [{"text": compact_context_text(enc)}]
 
 
 def _format_prompt(question: str, context_pkg: ContextPackage) -> Dict[str, Any]:
@@ -18,8 +29,7 @@ def _format_prompt(question: str, context_pkg: ContextPackage) -> Dict[str, Any]
             )
         },
         {"text": f"Question: {question}"},
-        {"text": "Context package JSON:"},
-        {"text": json.dumps(context_pkg.model_dump(), ensure_ascii=False)},
+        *_context_parts(context_pkg),
     ]
     return {"contents": [{"role": "user", "parts": parts}]}
 
@@ -27,7 +37,7 @@ def _format_prompt(question: str, context_pkg: ContextPackage) -> Dict[str, Any]
 def _answer_from_context_only(context_pkg: ContextPackage) -> str:
     # Fallback if no Gemini key: synthesize a compact answer from bullets
     lines: List[str] = []
-    for b in context_pkg.highlights[:5]:
+    for b in context_pkg.highlights[:MAX_HIGHLIGHTS]:
         lines.append(f"- {b.text}")
     if context_pkg.alternatives:
         lines.append(f"- Alternative: {context_pkg.alternatives[0].summary}")
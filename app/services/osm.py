@@ -1,6 +1,196 @@
-from typing import Optional, Tuple
+from __future__ import annotations
+import math
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from app.config import settings
-from app.utils.http import get_http_client
+from app.utils import codec
+from app.utils.cache import ttl_cache
+from app.utils.http import upstream_request
+from app.utils.lastgood import recall, remember
+from app.utils.singleflight import singleflight
+
+# Half-size of the search box around a venue, in degrees (~90 m)
+_BBOX_DEG = 0.0008
+
+
+@dataclass(frozen=True)
+class VenueAccess:
+    """Accessibility tags of the OSM features nearest to a venue point."""
+
+    wheelchair: str  # "yes", "limited", "no" or "unknown"
+    note: str = ""
+    entrance: Optional[str] = None  # wheelchair value of the nearest tagged entrance
+    toilets: Optional[str] = None  # toilets:wheelchair of the nearest feature that has it
+    name: Optional[str] = None
+    osm_id: Optional[str] = None  # e.g. "way/12345"
+    distance_m: Optional[float] = None
+
+    def as_tag(self) -> Tuple[str, str]:
+        return self.wheelchair, self.note
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "VenueAccess":
+        return cls(**data)
+
+
+codec.register("venue_access", VenueAccess, VenueAccess.as_dict, VenueAccess.from_dict)
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    r = 6371000.0
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * r * math.asin(math.sqrt(a))
+
+
+def _bbox(lat: float, lon: float) -> Tuple[float, float, float, float]:
+    return (lat - _BBOX_DEG, lon - _BBOX_DEG, lat + _BBOX_DEG, lon + _BBOX_DEG)
+
+
+def _union_query(points: Sequence[Tuple[float, float]]) -> str:
+    """One Overpass query covering every venue's bbox; results are split back by position."""
+    clauses = []
+    for lat, lon in points:
+        s, w, n, e = _bbox(lat, lon)
+        bbox = f"{s:.6f},{w:.6f},{n:.6f},{e:.6f}"
+        clauses.append(f'  nwr["wheelchair"]({bbox});')
+        clauses.append(f'  nwr["toilets:wheelchair"]({bbox});')
+    body = "\n".join(clauses)
+    return f"[out:json][timeout:{10 + 2 * len(points)}];\n(\n{body}\n);\nout tags center;\n"
+
+
+def _element_point(el: dict) -> Optional[Tuple[float, float]]:
+    if "lat" in el and "lon" in el:
+        return el["lat"], el["lon"]
+    center = el.get("center") or {}
+    if "lat" in center and "lon" in center:
+        return center["lat"], center["lon"]
+    return None
+
+
+def _normalize(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    return value if value in {"yes", "limited", "no"} else "unknown"
+
+
+def _pick(lat: float, lon: float, elements: List[dict]) -> Optional[VenueAccess]:
+    """Rank the features inside this venue's bbox by distance and take the nearest of each kind."""
+    s, w, n, e = _bbox(lat, lon)
+    ranked: List[Tuple[float, dict]] = []
+    for el in elements:
+        pt = _element_point(el)
+        if pt is None or not (s <= pt[0] <= n and w <= pt[1] <= e):
+            continue
+        ranked.append((haversine_m(lat, lon, pt[0], pt[1]), el))
+    ranked.sort(key=lambda x: x[0])
+
+    venue: Optional[Tuple[float, dict]] = None
+    entrance: Optional[str] = None
+    toilets: Optional[str] = None
+    for dist, el in ranked:
+        tags = el.get("tags") or {}
+        if "entrance" in tags:
+            if entrance is None and tags.get("wheelchair"):
+                entrance = _normalize(tags.get("wheelchair"))
+        elif venue is None and tags.get("wheelchair"):
+            venue = (dist, el)
+        if toilets is None and tags.get("toilets:wheelchair"):
+            toilets = _normalize(tags.get("toilets:wheelchair"))
+    if venue is None:
+        if entrance is None:
+            return None
+        # Only an entrance is tagged: it is the best evidence for the venue too
+        return VenueAccess(wheelchair=entrance, entrance=entrance, toilets=toilets)
+    dist, el = venue
+    tags = el.get("tags") or {}
+    return VenueAccess(
+        wheelchair=_normalize(tags.get("wheelchair")) or "unknown",
+        note=tags.get("wheelchair:description", "") or tags.get("description", ""),
+        entrance=entrance,
+        toilets=toilets,
+        name=tags.get("name"),
+        osm_id=f"{el.get('type')}/{el.get('id')}",
+        distance_m=round(dist, 1),
+    )
+
+
+def _fetch_batch(points: Sequence[Tuple[float, float]]) -> Optional[List[Optional[VenueAccess]]]:
+    """One Overpass round trip for `points`; None if the request failed."""
+    try:
+        r = upstream_request("overpass", "POST", settings.OSM_OVERPASS_URL, data={"data": _union_query(points)})
+        if r.status_code != 200:
+            return None
+        elements = r.json().get("elements") or []
+    except Exception:
+        return None
+    return [_pick(lat, lon, elements) for lat, lon in points]
+
+
+def get_venue_accessibility_batch(points: Sequence[Tuple[float, float]]) -> List[Optional[VenueAccess]]:
+    """
+    Accessibility for many venues with as few Overpass requests as possible:
+    cached points are answered locally and the rest are merged into one union
+    query per OVERPASS_BATCH_SIZE venues. Results are in input order; the
+    last-known-good tags where a lookup failed; None where nothing is tagged
+    or nothing is known.
+    """
+    results: List[Optional[VenueAccess]] = [None] * len(points)
+    missing: Dict[Tuple[float, float], List[int]] = {}
+    for i, (lat, lon) in enumerate(points):
+        hit = _venue_lookup.cache_get(lat, lon)  # type: ignore[attr-defined]
+        if hit is not None:
+            results[i] = hit[0]
+        else:
+            missing.setdefault((lat, lon), []).append(i)
+
+    pending = list(missing)
+    size = max(1, settings.OVERPASS_BATCH_SIZE)
+    for start in range(0, len(pending), size):
+        chunk = pending[start:start + size]
+        fetched = _fetch_batch(chunk)
+        if fetched is None:
+            fetched = [_recall_venue(*point) for point in chunk]
+        else:
+            for point, access in zip(chunk, fetched):
+                _venue_lookup.cache_set((access,), *point)  # type: ignore[attr-defined]
+                remember("osm_venue", (access,), *point)
+        for point, access in zip(chunk, fetched):
+            for i in missing[point]:
+                results[i] = access
+    return results
+
+
+@ttl_cache("osm_venue", settings.VENUE_CACHE_TTL_SECONDS)
+@singleflight("osm_venue")
+def _venue_lookup(lat: float, lon: float) -> Optional[Tuple[Optional[VenueAccess]]]:
+    """(access,) from Overpass, access None when nothing is tagged; None if the lookup failed."""
+    fetched = _fetch_batch([(lat, lon)])
+    if fetched is None:
+        return None
+    remember("osm_venue", (fetched[0],), lat, lon)
+    return (fetched[0],)
+
+
+def _recall_venue(lat: float, lon: float) -> Optional[VenueAccess]:
+    # Stored as (access,) like the cache, so "nothing tagged" is remembered too
+    hit = recall("osm_venue", "osm_overpass", lat, lon)
+    return hit[0] if hit else None
+
+
+def get_venue_accessibility(lat: float, lon: float) -> Optional[VenueAccess]:
+    """
+    Wheelchair, entrance and toilets tags of the features nearest to (lat, lon);
+    the last-known-good tags if Overpass cannot be reached.
+    """
+    hit = _venue_lookup(lat, lon)
+    if hit is None:
+        return _recall_venue(lat, lon)
+    return hit[0]
 
 
 def get_venue_wheelchair_tag(lat: float, lon: float) -> Optional[Tuple[str, str]]:
@@ -8,34 +198,5 @@ def get_venue_wheelchair_tag(lat: float, lon: float) -> Optional[Tuple[str, str]
     Query a small bbox around the destination for wheelchair tags.
     Returns (tag_value, note) where tag_value in {"yes","limited","no","unknown"}.
     """
-    overpass = settings.OSM_OVERPASS_URL
-    # small bbox around lat,lon
-    d = 0.0008
-    bbox = f"{lat-d},{lon-d},{lat+d},{lon+d}"
-    query = f"""
-    [out:json][timeout:10];
-    (
-      node[\"wheelchair\"]({bbox});
-      way[\"wheelchair\"]({bbox});
-      relation[\"wheelchair\"]({bbox});
-    );
-    out tags center 10;
-    """
-    try:
-        with get_http_client() as client:
-            r = client.post(overpass, data={"data": query})
-            if r.status_code == 200:
-                data = r.json()
-                elements = data.get("elements") or []
-                for el in elements:
-                    tags = el.get("tags") or {}
-                    wc = tags.get("wheelchair")
-                    if wc:
-                        note = tags.get("wheelchair:description", "") or tags.get("description", "")
-                        if wc not in {"yes", "limited", "no"}:
-                            wc = "unknown"
-                        return wc, note
-    except Exception:
-        pass
-    return None
-
+    access = get_venue_accessibility(lat, lon)
+    return access.as_tag() if access else None
@@ -0,0 +1,242 @@
+from __future__ import annotations
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+import orjson
+
+from app.config import settings
+from app.services.cities import get_provider
+from app.services.cities.base import OutageKey, OutageRecord, summarize_outages
+from app.utils.ratelimit import batch_priority
+
+OUTAGES_URI = "outages/current"
+
+# Callbacks receive each delta dict as it is published
+Listener = Callable[[Dict[str, Any]], None]
+
+_RESYNC = object()
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def diff_outages(
+    before: Dict[OutageKey, OutageRecord],
+    after: Dict[OutageKey, OutageRecord],
+) -> Dict[str, Any]:
+    """
+    Compare two per-equipment snapshots. Returns added/resolved/changed
+    records plus the new status of every station that was touched (None once
+    a station has no outages left).
+    """
+    added = [after[k] for k in after.keys() - before.keys()]
+    resolved = [before[k] for k in before.keys() - after.keys()]
+    changed = []
+    for k in after.keys() & before.keys():
+        old, new = before[k], after[k]
+        if old != new:
+            old_d, new_d = old.to_dict(), new.to_dict()
+            fields = sorted(f for f in new_d if new_d[f] != old_d[f])
+            changed.append({"before": old_d, "after": new_d, "fields": fields})
+    touched = {r.station for r in added} | {r.station for r in resolved} | {c["after"]["station"] for c in changed}
+    statuses = summarize_outages(r for r in after.values() if r.station in touched)
+    return {
+        "added": [r.to_dict() for r in sorted(added, key=lambda r: r.key)],
+        "resolved": [r.to_dict() for r in sorted(resolved, key=lambda r: r.key)],
+        "changed": sorted(changed, key=lambda c: (c["after"]["station"], c["after"]["equipment"])),
+        "stations": {st: statuses.get(st) for st in sorted(touched)},
+    }
+
+
+class OutageWatcher:
+    """
+    Polls one city's outage feed on that city's refresh schedule and publishes
+    what changed between refreshes. Each non-empty delta gets an increasing
+    `seq`; recent deltas are kept so reconnecting consumers can resume from
+    the last one they saw.
+    """
+
+    def __init__(self, city: str) -> None:
+        self.city = city
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Dict[OutageKey, OutageRecord]] = None
+        self._snapshot_at: Optional[str] = None
+        self._seq = 0
+        self._backlog: Deque[Dict[str, Any]] = deque(maxlen=max(1, settings.OUTAGE_STREAM_BACKLOG))
+        self._listeners: List[Listener] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def add_listener(self, listener: Listener) -> None:
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def remove_listener(self, listener: Listener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current outages with the seq they reflect; consumers diff from here."""
+        with self._lock:
+            records = sorted((self._snapshot or {}).values(), key=lambda r: r.key)
+            return {
+                "city": self.city,
+                "seq": self._seq,
+                "at": self._snapshot_at,
+                "outages": [r.to_dict() for r in records],
+                "stations": summarize_outages(records),
+            }
+
+    def since(self, seq: int) -> Optional[List[Dict[str, Any]]]:
+        """Deltas after `seq`, or None if the backlog no longer reaches back that far."""
+        with self._lock:
+            if seq > self._seq:
+                return None
+            if seq == self._seq:
+                return []
+            if not self._backlog or self._backlog[0]["seq"] > seq + 1:
+                return None
+            return [d for d in self._backlog if d["seq"] > seq]
+
+    def tick(self) -> Optional[Dict[str, Any]]:
+        """One refresh; returns the published delta, or None if nothing changed."""
+        provider = get_provider(self.city)
+        with batch_priority():
+            current = provider.outage_records()
+        if current is None:
+            # Feed unreachable: keep the last snapshot rather than reporting everything resolved
+            return None
+        with self._lock:
+            previous = self._snapshot
+            self._snapshot = current
+            self._snapshot_at = _now_iso()
+            if previous is None:
+                return None
+            delta = diff_outages(previous, current)
+            if not (delta["added"] or delta["resolved"] or delta["changed"]):
+                return None
+            self._seq += 1
+            delta = {"city": self.city, "seq": self._seq, "at": self._snapshot_at, **delta}
+            self._backlog.append(delta)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(delta)
+            except Exception:
+                pass
+        return delta
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception:
+                pass
+            self._stop.wait(settings.OUTAGE_POLL_SECONDS or get_provider(self.city).refresh_seconds)
+
+    def start(self) -> None:
+        """Start polling (idempotent). Called when the first consumer subscribes."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=f"outage-watcher-{self.city}", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+_watchers: Dict[str, OutageWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def get_watcher(city: Optional[str] = None) -> OutageWatcher:
+    """Watcher for `city` (default: DEFAULT_CITY); unknown cities raise UnknownCityError."""
+    code = get_provider(city).code
+    with _watchers_lock:
+        watcher = _watchers.get(code)
+        if watcher is None:
+            watcher = _watchers[code] = OutageWatcher(code)
+        return watcher
+
+
+def stop_watchers() -> None:
+    with _watchers_lock:
+        for watcher in _watchers.values():
+            watcher.stop()
+
+
+def _sse(event: str, data: Any, id_: Optional[int] = None) -> bytes:
+    head = f"id: {id_}\n" if id_ is not None else ""
+    return f"{head}event: {event}\n".encode() + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+async def sse_events(
+    watcher: OutageWatcher,
+    last_event_id: Optional[str],
+    is_disconnected: Callable[[], Awaitable[bool]],
+) -> AsyncIterator[bytes]:
+    """
+    Server-Sent Events for outage changes. New clients get a `snapshot`
+    event, then one `delta` event per change. A client reconnecting with
+    Last-Event-ID is replayed the deltas it missed, or sent a fresh snapshot
+    if they are no longer in the backlog (or it fell too far behind).
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.OUTAGE_STREAM_BACKLOG))
+
+    def offer(item: Any) -> None:
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(_RESYNC)
+
+    def listener(delta: Dict[str, Any]) -> None:
+        loop.call_soon_threadsafe(offer, delta)
+
+    watcher.add_listener(listener)
+    watcher.start()
+    try:
+        if watcher.snapshot()["at"] is None:
+            # First consumer: take the baseline now instead of waiting a poll interval
+            await asyncio.to_thread(watcher.tick)
+        replay = None
+        if last_event_id:
+            try:
+                replay = watcher.since(int(last_event_id))
+            except ValueError:
+                replay = None
+        if replay is None:
+            snap = watcher.snapshot()
+            last_seq = snap["seq"]
+            yield _sse("snapshot", snap, snap["seq"])
+        else:
+            last_seq = int(last_event_id)  # type: ignore[arg-type]
+            for delta in replay:
+                last_seq = delta["seq"]
+                yield _sse("delta", delta, delta["seq"])
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=settings.OUTAGE_STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                yield b": keep-alive\n\n"
+                continue
+            if item is _RESYNC:
+                snap = watcher.snapshot()
+                last_seq = snap["seq"]
+                yield _sse("snapshot", snap, snap["seq"])
+            elif item["seq"] > last_seq:
+                last_seq = item["seq"]
+                yield _sse("delta", item, item["seq"])
+    finally:
+        watcher.remove_listener(listener)
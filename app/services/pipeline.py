@@ -0,0 +1,292 @@
+from __future__ import annotations
+import hashlib
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import orjson
+
+from app.models.schemas import ContextPackage
+from app.services.cities import UnknownCityError, get_provider
+from app.services.directions import get_candidate_routes
+from app.services.formatter import build_context_package
+from app.services.fusion import ARRIVAL, compute_leave_by, BUFFER, OUTAGES, RELIABILITY, ROUTES, SLOPE, VENUE, WEATHER, FusedDecision
+from app.services.geocode import geocode_address
+from app.services.incremental import FusionState, recent_results, refuse
+from app.services.osm import get_venue_wheelchair_tag
+from app.services.terrain import analyze_routes
+from app.services.transit import outages_affecting_route_text
+from app.services.weather import corridor_points, get_corridor_weather, points_along, weather_is_live
+from app.utils.lastgood import track_staleness
+
+SOURCES = ["directions", "gtfs_rt_elevators", "osm_overpass", "openweather"]
+
+LogFn = Callable[..., None]
+
+
+class PipelineError(ValueError):
+    """A pipeline stage could not produce its input; carries the REST status code."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class PipelineResult:
+    package: ContextPackage
+    fused: FusedDecision
+    inputs: Dict[str, Any]
+    timings_ms: Dict[str, float]
+    source_versions: Dict[str, str] = field(default_factory=dict)
+    fusion: Optional[FusionState] = None
+    recomputed: List[str] = field(default_factory=list)  # fusion parts rebuilt (all on a cold run)
+
+
+def _no_log(level: str, message: str, **kwargs) -> None:
+    pass
+
+
+def event_key(title: Optional[str], start_iso: Optional[str], location: Optional[str]) -> str:
+    """Stable short id for an event occurrence, used to group history and caches."""
+    raw = f"{title or ''}|{start_iso or ''}|{location or ''}".encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def _plain(o: Any) -> Any:
+    if hasattr(o, "as_dict"):
+        return o.as_dict()
+    return getattr(o, "__dict__", str(o))
+
+
+def input_version(value: Any) -> str:
+    """Content hash of a pipeline input, so unchanged upstream data is recognisable."""
+    return hashlib.sha1(orjson.dumps(value, default=_plain)).hexdigest()[:12]
+
+
+@contextmanager
+def _timed(timings: Dict[str, float], stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+
+
+def run_pipeline(
+    event_title: Optional[str],
+    event_start_iso: Optional[str],
+    event_location_text: str,
+    origin_address: str,
+    buffer_minutes: int,
+    log: LogFn = _no_log,
+    previous: Optional[PipelineResult] = None,
+    city: Optional[str] = None,
+) -> PipelineResult:
+    """
+    Geocode, fetch routes/outages/venue/weather, fuse and package. Shared by the
+    REST endpoints and the MCP server; `log` receives the per-stage progress
+    messages (same signature as the MCP server's logger). `city` selects the
+    city provider (outage feed, station index); default DEFAULT_CITY.
+
+    Rebuilding a trip is incremental: the last result for the same event and
+    origin (or `previous`) supplies the destination geocode and the fusion
+    state, and only the bullets whose inputs changed are recomputed.
+
+    Sources answered from the last-known-good store because their upstream
+    failed are listed in `meta["stale_sources"]` with the data's age in seconds.
+    """
+    with track_staleness() as stale:
+        result = _run_pipeline(
+            event_title, event_start_iso, event_location_text, origin_address, buffer_minutes, log, previous, city
+        )
+    if stale:
+        result.package.meta["stale_sources"] = {source: round(age, 1) for source, age in sorted(stale.items())}
+        log("WARN", "Served last-known-good data", **result.package.meta["stale_sources"])
+    return result
+
+
+def _run_pipeline(
+    event_title: Optional[str],
+    event_start_iso: Optional[str],
+    event_location_text: str,
+    origin_address: str,
+    buffer_minutes: int,
+    log: LogFn,
+    previous: Optional[PipelineResult],
+    city: Optional[str],
+) -> PipelineResult:
+    timings: Dict[str, float] = {}
+    try:
+        provider = get_provider(city)
+    except UnknownCityError as e:
+        raise PipelineError(str(e), 400)
+    ev_key = event_key(event_title, event_start_iso, event_location_text)
+    if previous is None:
+        previous = recent_results.get((ev_key, origin_address, provider.code))
+
+    log("DEBUG", "Geocoding destination", location=event_location_text)
+    with _timed(timings, "geocode"):
+        if previous is not None and previous.inputs.get("destination") == event_location_text:
+            prev_in = previous.inputs
+            dest_geo = (prev_in["lat"], prev_in["lng"], prev_in["resolved_destination"])
+        else:
+            dest_geo = geocode_address(event_location_text)
+    if not dest_geo:
+        log("ERROR", "Geocoding failed", location=event_location_text)
+        raise PipelineError("Failed to geocode destination", 400)
+    dest_lat, dest_lng, resolved_dest = dest_geo
+    log("INFO", "Destination geocoded", lat=dest_lat, lng=dest_lng, resolved=resolved_dest)
+
+    log("DEBUG", "Fetching candidate routes", origin=origin_address, destination=resolved_dest, arrival=event_start_iso)
+    with _timed(timings, "directions"):
+        candidates = get_candidate_routes(origin_address, resolved_dest, event_start_iso, provider.code)
+    if not candidates:
+        log("ERROR", "No routes found", origin=origin_address, dest=resolved_dest)
+        raise PipelineError("No routes available", 502)
+    log("INFO", "Routes retrieved", count=len(candidates))
+
+    # Transit/elevator outages: the city's key stations, indexed stations named in route
+    # summaries, and the stations behind every boarding/alighting stop of every candidate
+    station_tokens = provider.stations_on_route(c.summary for c in candidates)
+    stop_stations: Dict[str, str] = {}
+    for c in candidates:
+        for stop in c.stops:
+            station = provider.station_for_stop(stop)
+            if station:
+                stop_stations[stop.lower()] = station
+    for station in stop_stations.values():
+        if station not in station_tokens:
+            station_tokens.append(station)
+    log("DEBUG", "Checking transit outages", city=provider.code, stations=len(station_tokens))
+    with _timed(timings, "outages"):
+        outage_msgs = outages_affecting_route_text(station_tokens, provider.code)
+        outage_stops = sorted(
+            stop for stop, station in stop_stations.items() if outages_affecting_route_text([station], provider.code)
+        )
+        # Stops that are up now but whose station has a record of outages (O(1) per stop)
+        unavailability = provider.station_unavailability()
+        stop_unavailability = {
+            stop: unavailability[station]
+            for stop, station in stop_stations.items()
+            if stop not in outage_stops and station in unavailability
+        }
+    log("INFO", "Outage check complete", outage_count=len(outage_msgs), unreliable_stops=len(stop_unavailability))
+
+    log("DEBUG", "Checking venue wheelchair accessibility", lat=dest_lat, lng=dest_lng)
+    with _timed(timings, "venue"):
+        venue_wc = get_venue_wheelchair_tag(dest_lat, dest_lng)
+    log("INFO", "Venue accessibility checked", wheelchair_accessible=venue_wc)
+
+    # Weather over the whole trip: along the longest candidate's geometry (or the straight
+    # corridor from origin to destination), from the earliest departure until arrival
+    depart_iso = compute_leave_by(event_start_iso, max(c.duration_min for c in candidates), 0)
+    log("DEBUG", "Fetching corridor weather", lat=dest_lat, lng=dest_lng, depart=depart_iso, arrive=event_start_iso)
+    with _timed(timings, "weather"):
+        shaped = sorted((c for c in candidates if len(c.coords) > 1), key=lambda c: c.duration_min, reverse=True)
+        origin_geo = None
+        if previous is not None and previous.inputs.get("origin_lat") is not None:
+            origin_geo = (previous.inputs["origin_lat"], previous.inputs["origin_lng"])
+        elif weather_is_live() and not shaped:
+            geo = geocode_address(origin_address)
+            origin_geo = (geo[0], geo[1]) if geo else None
+        if shaped:
+            points = points_along(shaped[0].coords)
+        elif origin_geo:
+            points = corridor_points(origin_geo, (dest_lat, dest_lng))
+        else:
+            points = [(dest_lat, dest_lng)]
+        exposure = get_corridor_weather(points, depart_iso, event_start_iso)
+        weather_risk = exposure.risk_text
+    log("INFO", "Weather check complete", risk=weather_risk, penalty=exposure.penalty,
+        tiles=exposure.tiles, hours=exposure.hours)
+
+    # Slope of the walking legs, from the local elevation raster (DEM_PATH); offline
+    with _timed(timings, "slope"):
+        slopes = analyze_routes(candidates)
+    if slopes:
+        log("INFO", "Slope analysis complete", routes=len(slopes),
+            max_grade=max(p.max_grade_pct for p in slopes.values()))
+
+    log("DEBUG", "Fusing context data", candidates=len(candidates), outages=len(outage_msgs), buffer_min=buffer_minutes)
+    with _timed(timings, "fusion"):
+        versions = {
+            ROUTES: input_version(candidates),
+            OUTAGES: input_version([outage_msgs, outage_stops, provider.outage_citation]),
+            VENUE: input_version(venue_wc),
+            WEATHER: input_version([weather_risk, exposure.penalty]),
+            ARRIVAL: input_version(event_start_iso),
+            BUFFER: input_version(buffer_minutes),
+            SLOPE: input_version([slopes.get(c) for c in candidates]),
+            # Rates are rounded in the table, so the version only moves when one really changes
+            RELIABILITY: input_version(sorted(stop_unavailability.items())),
+        }
+        fusion, recomputed = refuse(
+            previous.fusion if previous is not None else None,
+            versions,
+            candidates=candidates,
+            arrivals_iso=event_start_iso,
+            buffer_min=buffer_minutes,
+            outages_texts=outage_msgs,
+            venue_wc=venue_wc,
+            weather_risk=weather_risk,
+            outage_citation=provider.outage_citation,
+            weather_penalty=exposure.penalty,
+            outage_stops=outage_stops,
+            slopes=slopes,
+            stop_unavailability=stop_unavailability,
+        )
+        fused = fusion.fused
+    log("INFO", "Context fusion complete", bullets=len(fused.bullets), has_alternative=fused.alternative is not None,
+        recomputed=",".join(recomputed) or "none")
+
+    log("DEBUG", "Building context package")
+    with _timed(timings, "package"):
+        if previous is not None and not recomputed:
+            pkg = previous.package.model_copy(deep=True)
+            pkg.meta = {}
+        else:
+            pkg = build_context_package(
+                event_title=event_title,
+                event_start_iso=event_start_iso,
+                event_location=resolved_dest,
+                origin_label="Home",
+                origin_address=origin_address,
+                bullets=fused.bullets,
+                alternative=fused.alternative.summary if fused.alternative else None,
+                raw_links=fused.raw_links,
+                sources=list(SOURCES) + (["dem"] if slopes else []),
+            )
+    pkg.meta["event_key"] = ev_key
+
+    route_summaries: List[str] = [c.summary for c in candidates]
+    inputs = {
+        "origin": origin_address,
+        "destination": event_location_text,
+        "resolved_destination": resolved_dest,
+        "lat": dest_lat,
+        "lng": dest_lng,
+        "origin_lat": origin_geo[0] if origin_geo else None,
+        "origin_lng": origin_geo[1] if origin_geo else None,
+        "arrival_iso": event_start_iso,
+        "buffer_minutes": buffer_minutes,
+        "city": provider.code,
+    }
+    source_versions = {
+        "directions": input_version(route_summaries),
+        "gtfs_rt_elevators": input_version(outage_msgs),
+        "osm_overpass": input_version(venue_wc),
+        "openweather": input_version(weather_risk),
+    }
+    result = PipelineResult(
+        package=pkg,
+        fused=fused,
+        inputs=inputs,
+        timings_ms=timings,
+        source_versions=source_versions,
+        fusion=fusion,
+        recomputed=recomputed,
+    )
+    recent_results.put((ev_key, origin_address, provider.code), result)
+    return result
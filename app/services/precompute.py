@@ -0,0 +1,196 @@
+from __future__ import annotations
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.models.schemas import ContextPackage
+from app.services.calendar import calendar_feed_urls, get_upcoming_events_from_ics
+from app.services.history import record_history
+from app.services.pipeline import event_key, run_pipeline
+from app.utils.ratelimit import batch_priority
+
+EVENT_URI_PREFIX = "context/event/"
+
+# Callbacks receive ("updated", uri) or ("list_changed", None)
+Listener = Callable[[str, Optional[str]], None]
+
+
+@dataclass
+class PrecomputedEntry:
+    key: str
+    uri: str
+    title: Optional[str]
+    start_iso: str
+    location: str
+    origin: str
+    buffer_minutes: int
+    package: ContextPackage
+    computed_at: float
+    stage: int
+    leave_by_iso: Optional[str]
+
+
+def event_uri(key: str) -> str:
+    return f"{EVENT_URI_PREFIX}{key}"
+
+
+def _lead_minutes() -> List[int]:
+    """Configured lead times, largest first (e.g. [240, 90, 30, 10])."""
+    leads = []
+    for part in (settings.PRECOMPUTE_LEAD_MINUTES or "").split(","):
+        part = part.strip()
+        if part:
+            leads.append(int(part))
+    return sorted(set(leads), reverse=True)
+
+
+def _stage(minutes_to_departure: float, leads: List[int]) -> int:
+    """Number of lead-time thresholds already crossed; -1 if outside the horizon."""
+    crossed = [i for i, lead in enumerate(leads) if minutes_to_departure <= lead]
+    return crossed[-1] if crossed else -1
+
+
+class Precomputer:
+    """
+    Watches upcoming calendar events and builds their context packages ahead
+    of time. A package is computed when the event enters the largest lead time
+    and rebuilt each time departure crosses the next, smaller lead time, so it
+    is freshest right before the user leaves. Listeners are told when a
+    package changes or the set of events changes.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[str, PrecomputedEntry] = {}
+        self._listeners: List[Listener] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def add_listener(self, listener: Listener) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _notify(self, kind: str, uri: Optional[str]) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(kind, uri)
+            except Exception:
+                pass
+
+    def entries(self) -> List[PrecomputedEntry]:
+        with self._lock:
+            return sorted(self._entries.values(), key=lambda e: e.start_iso)
+
+    def get(self, key: str) -> Optional[PrecomputedEntry]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def lookup(
+        self,
+        title: Optional[str],
+        start_iso: Optional[str],
+        location: Optional[str],
+        origin: Optional[str],
+        buffer_minutes: int,
+    ) -> Optional[ContextPackage]:
+        """Precomputed package for this event/origin/buffer if still fresh."""
+        entry = self.get(event_key(title, start_iso, location))
+        if entry is None or entry.origin != origin or entry.buffer_minutes != buffer_minutes:
+            return None
+        if time.time() - entry.computed_at > settings.PRECOMPUTE_MAX_AGE_SECONDS:
+            return None
+        return entry.package
+
+    def _compute(self, key: str, event: Tuple[str, str, str], origin: str, stage: int) -> Optional[PrecomputedEntry]:
+        title, start_iso, location = event
+        try:
+            with batch_priority():
+                result = run_pipeline(title, start_iso, location, origin, settings.PRECOMPUTE_BUFFER_MINUTES)
+        except Exception:
+            return None
+        result.package.meta["precomputed_at"] = datetime.now(timezone.utc).isoformat()
+        record_history("precompute", result)
+        return PrecomputedEntry(
+            key=key,
+            uri=event_uri(key),
+            title=title,
+            start_iso=start_iso,
+            location=location,
+            origin=origin,
+            buffer_minutes=settings.PRECOMPUTE_BUFFER_MINUTES,
+            package=result.package,
+            computed_at=time.time(),
+            stage=stage,
+            leave_by_iso=result.fused.leave_by_iso,
+        )
+
+    def tick(self) -> None:
+        """One scheduling pass; safe to call directly (e.g. from tests or a cron)."""
+        origin = settings.HOME_ADDRESS
+        leads = _lead_minutes()
+        if not origin or not leads:
+            return
+        now = datetime.now(timezone.utc)
+        events = get_upcoming_events_from_ics(settings.PRECOMPUTE_MAX_EVENTS)
+        live_keys = set()
+        list_changed = False
+        for ev in events:
+            key = event_key(*ev)
+            live_keys.add(key)
+            existing = self.get(key)
+            # Until a route is known, measure lead time against the event start
+            departure_iso = (existing.leave_by_iso if existing else None) or ev[1]
+            try:
+                minutes = (datetime.fromisoformat(departure_iso) - now).total_seconds() / 60
+            except ValueError:
+                continue
+            stage = _stage(minutes, leads)
+            if stage < 0 or (existing is not None and existing.stage >= stage):
+                continue
+            entry = self._compute(key, ev, origin, stage)
+            if entry is None:
+                continue
+            with self._lock:
+                self._entries[key] = entry
+            if existing is None:
+                list_changed = True
+            self._notify("updated", entry.uri)
+        with self._lock:
+            # Drop events that started; if the feed answered, also drop ones no longer in it
+            stale = [
+                k
+                for k, e in self._entries.items()
+                if datetime.fromisoformat(e.start_iso) <= now or (events and k not in live_keys)
+            ]
+            for k in stale:
+                del self._entries[k]
+        if stale:
+            list_changed = True
+        if list_changed:
+            self._notify("list_changed", None)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception:
+                pass
+            self._stop.wait(settings.PRECOMPUTE_POLL_SECONDS)
+
+    def start(self) -> None:
+        if not settings.PRECOMPUTE_ENABLED or not calendar_feed_urls():
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="precompute", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+precomputer = Precomputer()
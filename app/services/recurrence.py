@@ -0,0 +1,121 @@
+from __future__ import annotations
+import bisect
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from datetime import datetime, timezone, tzinfo
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+from dateutil import tz as dateutil_tz
+from dateutil.relativedelta import relativedelta
+from dateutil.rrule import rrulestr
+
+# (start timestamp, title, start_iso, location), as in app.services.calendar
+FeedEvent = Tuple[float, str, str, str]
+
+_UNITS = {"YEARLY": "years", "MONTHLY": "months", "WEEKLY": "weeks", "DAILY": "days",
+          "HOURLY": "hours", "MINUTELY": "minutes", "SECONDLY": "seconds"}
+_UNIT_SECONDS = {"hours": 3600, "minutes": 60, "seconds": 1}
+_DAY_PARTS = ("BYWEEKNO", "BYYEARDAY", "BYMONTHDAY", "BYDAY")
+
+
+def parse_ics_datetimes(value: str, params: Dict[str, List[str]], default_tz: Optional[tzinfo]) -> List[datetime]:
+    """Values of an EXDATE/RDATE/RECURRENCE-ID line (date, local, UTC, or PERIOD start)."""
+    tzid = (params.get("TZID") or [None])[0]
+    zone = (dateutil_tz.gettz(tzid) if tzid else None) or default_tz or timezone.utc
+    out: List[datetime] = []
+    for raw in value.split(","):
+        raw = raw.strip().split("/", 1)[0]
+        try:
+            if raw.endswith("Z"):
+                out.append(datetime.strptime(raw, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc))
+            elif "T" in raw:
+                out.append(datetime.strptime(raw, "%Y%m%dT%H%M%S").replace(tzinfo=zone))
+            else:
+                out.append(datetime.strptime(raw, "%Y%m%d").replace(tzinfo=zone))
+        except ValueError:
+            continue
+    return out
+
+
+def _rule_parts(rule: str) -> Dict[str, str]:
+    parts = {}
+    for item in rule.split(";"):
+        name, _, value = item.partition("=")
+        parts[name.strip().upper()] = value.strip()
+    return parts
+
+
+def _jump_ahead(rule: str, start: datetime, after: datetime) -> Tuple[str, datetime]:
+    """
+    Restart `rule` at a whole number of intervals past `start`, just before
+    `after`, so expanding it never walks the series' history. The day/month
+    parts RRULE otherwise takes from DTSTART are pinned first so moving
+    DTSTART does not move the occurrences. COUNT rules keep their start:
+    occurrences already used up are part of the count.
+    """
+    parts = _rule_parts(rule)
+    unit = _UNITS.get(parts.get("FREQ", ""))
+    if unit is None or "COUNT" in parts or after <= start:
+        return rule, start
+    interval = max(int(parts.get("INTERVAL") or 1), 1)
+    if unit == "years":
+        periods = after.year - start.year
+    elif unit == "months":
+        periods = (after.year - start.year) * 12 + after.month - start.month
+    elif unit == "weeks":
+        periods = (after - start).days // 7
+    elif unit == "days":
+        periods = (after - start).days
+    else:
+        periods = int((after - start).total_seconds()) // _UNIT_SECONDS[unit]
+    # One interval of slack for DST and for by-rules reaching back into the period
+    steps = periods // interval - 1
+    if steps <= 0:
+        return rule, start
+    if unit in ("years", "months") and not any(p in parts for p in _DAY_PARTS):
+        rule += f";BYMONTHDAY={start.day}"
+        if unit == "years" and "BYMONTH" not in parts:
+            rule += f";BYMONTH={start.month}"
+    return rule, start + relativedelta(**{unit: steps * interval})
+
+
+@dataclass
+class RecurringSeries:
+    """
+    A located VEVENT with RRULE and/or RDATE. Occurrences are expanded lazily
+    and only from the requested instant on, so the cost of the next occurrence
+    does not depend on how old the series is. `skip` holds the timestamps of
+    EXDATEs and of instances replaced or cancelled by a RECURRENCE-ID override.
+    """
+
+    title: str
+    location: str
+    start: datetime
+    rule: Optional[str] = None
+    rdates: List[datetime] = field(default_factory=list)  # sorted, includes DTSTART
+    skip: FrozenSet[float] = frozenset()
+    # (restart instant, parsed rule); the restart only moves once per interval
+    _parsed: Optional[Tuple[datetime, Any]] = field(default=None, repr=False, compare=False)
+
+    def occurrences(self, after: float) -> Iterator[FeedEvent]:
+        """Occurrences strictly after the `after` timestamp, soonest first."""
+        after_dt = datetime.fromtimestamp(after, tz=self.start.tzinfo)
+        streams: List[Iterator[datetime]] = [itertools.islice(self.rdates, bisect.bisect_right(self.rdates, after_dt), None)]
+        if self.rule:
+            rule, start = _jump_ahead(self.rule, self.start, after_dt)
+            parsed = self._parsed
+            if parsed is None or parsed[0] != start:
+                try:
+                    parsed = self._parsed = (start, rrulestr(rule, dtstart=start))
+                except (ValueError, TypeError):
+                    parsed = self._parsed = (start, None)
+            if parsed[1] is not None:
+                streams.append(parsed[1].xafter(after_dt))
+        previous = None
+        for dt in heapq.merge(*streams):
+            ts = dt.timestamp()
+            if ts == previous or ts in self.skip:
+                continue
+            previous = ts
+            yield ts, self.title, dt.isoformat(), self.location
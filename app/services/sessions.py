@@ -0,0 +1,124 @@
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import orjson
+
+from app.config import settings
+
+DEFAULT_SESSION = "default"
+
+# Rough fixed cost of a session entry (key, slots object, OrderedDict node)
+_ENTRY_OVERHEAD_BYTES = 256
+
+
+class SessionState:
+    """
+    Per-session runtime state. The last context package is kept as orjson
+    bytes rather than a dict tree, which is several times smaller in memory.
+    """
+
+    __slots__ = ("home_address", "last_package_bytes", "touched_at")
+
+    def __init__(self, home_address: Optional[str] = None):
+        self.home_address = home_address
+        self.last_package_bytes: Optional[bytes] = None
+        self.touched_at = time.monotonic()
+
+    @property
+    def last_context_package(self) -> Optional[dict]:
+        if self.last_package_bytes is None:
+            return None
+        return orjson.loads(self.last_package_bytes)
+
+    def size(self) -> int:
+        return _ENTRY_OVERHEAD_BYTES + len(self.home_address or "") + len(self.last_package_bytes or b"")
+
+
+class SessionStore:
+    """
+    Memory-bounded LRU of SessionState keyed by session/user id. Entries expire
+    after `ttl_seconds` without use; the least recently used sessions are
+    evicted once either `max_sessions` or `max_bytes` is exceeded.
+    """
+
+    def __init__(self, max_sessions: int, ttl_seconds: float, max_bytes: int):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        self._bytes = 0
+
+    def _default_home(self, session_id: str) -> Optional[str]:
+        return settings.HOME_ADDRESS if session_id == DEFAULT_SESSION else None
+
+    def _expire(self, now: float) -> None:
+        while self._sessions:
+            sid, sess = next(iter(self._sessions.items()))
+            if now - sess.touched_at < self.ttl_seconds:
+                break
+            self._drop(sid)
+
+    def _drop(self, session_id: str) -> None:
+        sess = self._sessions.pop(session_id, None)
+        if sess is not None:
+            self._bytes -= sess.size()
+
+    def _evict(self) -> None:
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._sessions)))
+
+    def get(self, session_id: Optional[str]) -> SessionState:
+        sid = session_id or DEFAULT_SESSION
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            sess = self._sessions.get(sid)
+            if sess is None:
+                sess = SessionState(home_address=self._default_home(sid))
+                self._sessions[sid] = sess
+                self._bytes += sess.size()
+                self._evict()
+            else:
+                self._sessions.move_to_end(sid)
+            sess.touched_at = now
+            return sess
+
+    def peek(self, session_id: Optional[str]) -> Optional[SessionState]:
+        """Lookup without creating or refreshing the session; an expired session counts as missing."""
+        with self._lock:
+            sess = self._sessions.get(session_id or DEFAULT_SESSION)
+            if sess is None or time.monotonic() - sess.touched_at >= self.ttl_seconds:
+                return None
+            return sess
+
+    def _update(self, session_id: Optional[str], **fields) -> SessionState:
+        sess = self.get(session_id)
+        with self._lock:
+            before = sess.size()
+            for k, v in fields.items():
+                setattr(sess, k, v)
+            if (session_id or DEFAULT_SESSION) in self._sessions:
+                self._bytes += sess.size() - before
+                self._evict()
+        return sess
+
+    def set_home(self, session_id: Optional[str], address: str) -> SessionState:
+        return self._update(session_id, home_address=address)
+
+    def set_last_package(self, session_id: Optional[str], pkg: dict) -> SessionState:
+        return self._update(session_id, last_package_bytes=orjson.dumps(pkg))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._sessions), "bytes": self._bytes}
+
+
+sessions = SessionStore(
+    max_sessions=settings.SESSION_MAX_SESSIONS,
+    ttl_seconds=settings.SESSION_TTL_SECONDS,
+    max_bytes=settings.SESSION_MAX_BYTES,
+)
@@ -0,0 +1,327 @@
+from __future__ import annotations
+import math
+import os
+import struct
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.directions import RouteCandidate
+from app.utils.polyline import decode_polylines
+
+# TIFF field type -> (struct code, size)
+_TIFF_TYPES = {1: ("B", 1), 2: ("s", 1), 3: ("H", 2), 4: ("I", 4), 5: ("II", 8), 11: ("f", 4), 12: ("d", 8), 16: ("Q", 8)}
+_TIFF_DTYPES = {(1, 8): "u1", (1, 16): "u2", (1, 32): "u4", (2, 8): "i1", (2, 16): "i2", (2, 32): "i4", (3, 32): "f4", (3, 64): "f8"}
+
+
+class ElevationRaster:
+    """
+    A memory-mapped elevation grid in geographic coordinates. Only the pages
+    under sampled points are ever read, so a city-scale raster costs nothing
+    until it is used. (x0, y0) is the outer corner of pixel (0, 0); dy < 0
+    for north-up rasters.
+    """
+
+    def __init__(self, data: np.ndarray, x0: float, y0: float, dx: float, dy: float,
+                 nodata: Optional[float], path: str) -> None:
+        self.data = data
+        self.x0, self.y0, self.dx, self.dy = x0, y0, dx, dy
+        self.nodata = nodata
+        self.path = path
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.data.shape  # type: ignore[return-value]
+
+    def sample(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Bilinear elevation (metres) at each point; NaN outside the raster or on nodata."""
+        rows, cols = self.data.shape
+        # Pixel-centre coordinates, so integer positions sit exactly on samples
+        c = (lon - self.x0) / self.dx - 0.5
+        r = (lat - self.y0) / self.dy - 0.5
+        inside = (c >= 0) & (c <= cols - 1) & (r >= 0) & (r <= rows - 1)
+        c = np.clip(c, 0, cols - 1)
+        r = np.clip(r, 0, rows - 1)
+        c0 = np.minimum(np.floor(c).astype(np.int64), max(cols - 2, 0))
+        r0 = np.minimum(np.floor(r).astype(np.int64), max(rows - 2, 0))
+        c1 = np.minimum(c0 + 1, cols - 1)
+        r1 = np.minimum(r0 + 1, rows - 1)
+        fc, fr = c - c0, r - r0
+        z00 = self.data[r0, c0].astype(np.float64)
+        z01 = self.data[r0, c1].astype(np.float64)
+        z10 = self.data[r1, c0].astype(np.float64)
+        z11 = self.data[r1, c1].astype(np.float64)
+        if self.nodata is not None:
+            for z in (z00, z01, z10, z11):
+                z[z == self.nodata] = np.nan
+        top = z00 * (1 - fc) + z01 * fc
+        bottom = z10 * (1 - fc) + z11 * fc
+        out = top * (1 - fr) + bottom * fr
+        out[~inside] = np.nan
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        rows, cols = self.data.shape
+        return {
+            "path": self.path,
+            "shape": [rows, cols],
+            "bounds": [self.y0 + rows * self.dy, self.x0, self.y0, self.x0 + cols * self.dx],
+            "cell_deg": [abs(self.dy), self.dx],
+        }
+
+
+def _read_tiff_tags(f: Any) -> Tuple[str, Dict[int, Tuple[Any, ...]]]:
+    head = f.read(8)
+    if head[:2] == b"II":
+        endian = "<"
+    elif head[:2] == b"MM":
+        endian = ">"
+    else:
+        raise ValueError("not a TIFF file")
+    magic, ifd = struct.unpack(endian + "HI", head[2:8])
+    if magic != 42:
+        raise ValueError("BigTIFF is not supported; write a classic TIFF (BIGTIFF=NO)")
+    f.seek(ifd)
+    (count,) = struct.unpack(endian + "H", f.read(2))
+    entries = f.read(12 * count)
+    tags: Dict[int, Tuple[Any, ...]] = {}
+    for i in range(count):
+        tag, typ, n, raw = struct.unpack(endian + "HHI4s", entries[12 * i:12 * i + 12])
+        if typ not in _TIFF_TYPES:
+            continue
+        code, size = _TIFF_TYPES[typ]
+        nbytes = size * n
+        if nbytes <= 4:
+            data = raw[:nbytes]
+        else:
+            pos = f.tell()
+            f.seek(struct.unpack(endian + "I", raw)[0])
+            data = f.read(nbytes)
+            f.seek(pos)
+        if typ == 2:
+            tags[tag] = (data.rstrip(b"\0").decode("ascii", "replace"),)
+        else:
+            tags[tag] = struct.unpack(endian + code * n, data)
+    return endian, tags
+
+
+def _open_geotiff(path: str) -> ElevationRaster:
+    """Uncompressed, single-band, strip-organised GeoTIFF in geographic (lat/lng) coordinates."""
+    with open(path, "rb") as f:
+        endian, tags = _read_tiff_tags(f)
+    width, height = tags[256][0], tags[257][0]
+    if tags.get(259, (1,))[0] != 1:
+        raise ValueError("compressed GeoTIFF; rewrite with COMPRESS=NONE")
+    if tags.get(277, (1,))[0] != 1:
+        raise ValueError("expected a single-band elevation raster")
+    if 322 in tags:
+        raise ValueError("tiled GeoTIFF; rewrite with TILED=NO")
+    offsets, counts = tags[273], tags[279]
+    if any(offsets[i] + counts[i] != offsets[i + 1] for i in range(len(offsets) - 1)):
+        raise ValueError("GeoTIFF strips are not contiguous")
+    dtype = _TIFF_DTYPES.get((tags.get(339, (1,))[0], tags[258][0]))
+    if dtype is None:
+        raise ValueError("unsupported sample format")
+    geokeys = tags.get(34735, ())
+    keys = {geokeys[i]: geokeys[i + 3] for i in range(4, len(geokeys) - 3, 4)}
+    if keys.get(1024) == 1:
+        raise ValueError("projected CRS; reproject to EPSG:4326 (gdalwarp -t_srs EPSG:4326)")
+    sx, sy = tags[33550][0], tags[33550][1]
+    _, _, _, tx, ty, _ = tags[33922][:6]
+    if keys.get(1025) == 2:  # RasterPixelIsPoint: the tie point is a pixel centre
+        tx, ty = tx - sx / 2, ty + sy / 2
+    nodata = float(tags[42113][0]) if 42113 in tags and tags[42113][0].strip() else None
+    data = np.memmap(path, dtype=np.dtype(dtype).newbyteorder(endian), mode="r", offset=offsets[0],
+                     shape=(height, width))
+    return ElevationRaster(data, tx, ty, sx, -sy, nodata, path)
+
+
+def _open_raw(path: str) -> ElevationRaster:
+    """
+    Raw grid with an ESRI-style .hdr sidecar: GridFloat (.flt: ncols, nrows,
+    xllcorner/yllcorner or xllcenter/yllcenter, cellsize, nodata_value,
+    byteorder) or BIL (nrows, ncols, nbits, pixeltype, ulxmap/ulymap,
+    xdim/ydim, nodata).
+    """
+    hdr: Dict[str, str] = {}
+    with open(os.path.splitext(path)[0] + ".hdr", "r", encoding="ascii") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2:
+                hdr[parts[0].lower()] = parts[1]
+    cols, rows = int(hdr["ncols"]), int(hdr["nrows"])
+    dx = float(hdr.get("cellsize") or hdr["xdim"])
+    dy = float(hdr.get("cellsize") or hdr["ydim"])
+    if "ulxmap" in hdr:  # BIL: centre of the upper-left pixel
+        x0, y0 = float(hdr["ulxmap"]) - dx / 2, float(hdr["ulymap"]) + dy / 2
+    elif "xllcenter" in hdr:
+        x0, y0 = float(hdr["xllcenter"]) - dx / 2, float(hdr["yllcenter"]) - dy / 2 + rows * dy
+    else:
+        x0, y0 = float(hdr["xllcorner"]), float(hdr["yllcorner"]) + rows * dy
+    order = hdr.get("byteorder", "lsbfirst").lower()
+    endian = ">" if order in ("msbfirst", "m") else "<"
+    if path.lower().endswith(".flt"):
+        dtype = "f4"
+    else:
+        nbits = int(hdr.get("nbits", 16))
+        kind = {"float": "f", "signedint": "i"}.get(hdr.get("pixeltype", "signedint").lower(), "u")
+        dtype = f"{kind}{nbits // 8}"
+    nodata_text = hdr.get("nodata_value") or hdr.get("nodata")
+    nodata = float(nodata_text) if nodata_text is not None else None
+    data = np.memmap(path, dtype=np.dtype(dtype).newbyteorder(endian), mode="r", shape=(rows, cols))
+    return ElevationRaster(data, x0, y0, dx, -dy, nodata, path)
+
+
+def open_raster(path: str) -> ElevationRaster:
+    if path.lower().endswith((".tif", ".tiff")):
+        return _open_geotiff(path)
+    return _open_raw(path)
+
+
+_raster_lock = threading.Lock()
+_raster: Optional[ElevationRaster] = None
+_raster_error: Optional[str] = None
+
+
+def get_raster() -> Optional[ElevationRaster]:
+    """The DEM_PATH raster, opened once; None if unset or unreadable."""
+    global _raster, _raster_error
+    if not settings.DEM_PATH:
+        return None
+    if _raster is not None or _raster_error is not None:
+        return _raster
+    with _raster_lock:
+        if _raster is None and _raster_error is None:
+            try:
+                _raster = open_raster(settings.DEM_PATH)
+            except Exception as e:
+                _raster_error = f"{type(e).__name__}: {e}"
+    return _raster
+
+
+def raster_stats() -> Dict[str, Any]:
+    if not settings.DEM_PATH:
+        return {"enabled": False}
+    raster = get_raster()
+    if raster is None:
+        return {"enabled": True, "error": _raster_error}
+    return {"enabled": True, **raster.stats()}
+
+
+@dataclass(frozen=True)
+class SlopeProfile:
+    """Grades along a route's walking legs, from the elevation raster."""
+
+    max_grade_pct: float  # steepest single sample interval
+    sustained_grade_pct: float  # steepest average over SLOPE_SUSTAINED_METERS
+    steep_m: float  # walking distance steeper than SLOPE_MAX_GRADE_PCT
+    walking_m: float
+    worst_leg: int  # index into the route's steps
+
+    @property
+    def penalty(self) -> int:
+        """0 = within limits; 1 = short steep stretches; 2 = sustained steep climb or descent."""
+        limit = settings.SLOPE_MAX_GRADE_PCT
+        if self.sustained_grade_pct > limit:
+            return 2
+        return 1 if self.max_grade_pct > limit else 0
+
+
+def _leg_grades(raster: ElevationRaster, coords: np.ndarray, step_m: float,
+                window_m: float) -> Optional[Tuple[float, float, float, float]]:
+    """(max grade, sustained grade, steep metres, length) for one walking leg, or None if off-raster."""
+    lat = np.radians(coords[:, 0])
+    dy = np.diff(lat)
+    dx = np.diff(np.radians(coords[:, 1])) * np.cos((lat[1:] + lat[:-1]) / 2)
+    dist = np.concatenate(([0.0], np.cumsum(6371000.0 * np.hypot(dx, dy))))
+    length = float(dist[-1])
+    if length < step_m:
+        return None
+    at = np.linspace(0.0, length, int(math.ceil(length / step_m)) + 1)
+    elev = raster.sample(np.interp(at, dist, coords[:, 0]), np.interp(at, dist, coords[:, 1]))
+    ok = ~np.isnan(elev)
+    if ok.sum() < 2:
+        return None
+    at, elev = at[ok], elev[ok]
+    run = np.diff(at)
+    grade = np.abs(np.diff(elev)) / run * 100.0
+    limit = settings.SLOPE_MAX_GRADE_PCT
+    # Sustained: net rise over a sliding window of ~window_m (whole leg if shorter)
+    k = max(1, min(len(at) - 1, int(round(window_m / step_m))))
+    sustained = np.abs(elev[k:] - elev[:-k]) / (at[k:] - at[:-k]) * 100.0
+    return float(grade.max()), float(sustained.max()), float(run[grade > limit].sum()), length
+
+
+def analyze_route(candidate: RouteCandidate, raster: Optional[ElevationRaster] = None) -> Optional[SlopeProfile]:
+    """
+    Slope profile of a candidate's walking legs: each leg is resampled every
+    SLOPE_SAMPLE_METERS and looked up in the raster in one vectorized pass.
+    None without a raster, without walking geometry, or off the raster.
+    """
+    raster = raster or get_raster()
+    if raster is None:
+        return None
+    legs = [i for i, s in enumerate(candidate.steps) if s.travel_mode == "WALKING" and s.polyline]
+    if not legs:
+        return None
+    step_m = settings.SLOPE_SAMPLE_METERS
+    decoded = decode_polylines([candidate.steps[i].polyline for i in legs])  # type: ignore[misc]
+    max_grade = sustained = steep = walked = 0.0
+    worst = -1
+    for i, coords in zip(legs, decoded):
+        if len(coords) < 2:
+            continue
+        res = _leg_grades(raster, coords, step_m, settings.SLOPE_SUSTAINED_METERS)
+        if res is None:
+            continue
+        g, s, m, length = res
+        if worst < 0 or s > sustained or (s == sustained and g > max_grade):
+            worst = i
+        max_grade, sustained = max(max_grade, g), max(sustained, s)
+        steep += m
+        walked += length
+    if worst < 0:
+        return None
+    return SlopeProfile(
+        max_grade_pct=round(max_grade, 1),
+        sustained_grade_pct=round(sustained, 1),
+        steep_m=round(steep),
+        walking_m=round(walked),
+        worst_leg=worst,
+    )
+
+
+def analyze_routes(candidates: Sequence[RouteCandidate]) -> Dict[RouteCandidate, SlopeProfile]:
+    """Slope profiles of every candidate that has analysable walking legs."""
+    raster = get_raster()
+    if raster is None:
+        return {}
+    out: Dict[RouteCandidate, SlopeProfile] = {}
+    for c in candidates:
+        profile = analyze_route(c, raster)
+        if profile is not None:
+            out[c] = profile
+    return out
+
+
+def describe_slope(candidate: RouteCandidate, profile: SlopeProfile) -> str:
+    """One sentence on the steepest walking leg, e.g. "Steep walking on the walk to 86 St: up to 11% grade."."""
+    step = candidate.steps[profile.worst_leg]
+    facts = [f"up to {profile.max_grade_pct:g}% grade"]
+    if profile.sustained_grade_pct > settings.SLOPE_MAX_GRADE_PCT:
+        facts.append(f"{profile.sustained_grade_pct:g}% sustained over {settings.SLOPE_SUSTAINED_METERS:g} m")
+    if profile.steep_m:
+        facts.append(f"about {profile.steep_m:g} m steeper than {settings.SLOPE_MAX_GRADE_PCT:g}%")
+    where = ""
+    nxt = candidate.steps[profile.worst_leg + 1] if profile.worst_leg + 1 < len(candidate.steps) else None
+    prev = candidate.steps[profile.worst_leg - 1] if profile.worst_leg > 0 else None
+    if nxt is not None and nxt.departure_stop:
+        where = f" on the walk to {nxt.departure_stop}"
+    elif prev is not None and prev.arrival_stop:
+        where = f" on the walk from {prev.arrival_stop}"
+    elif step.distance_m:
+        where = f" on a {step.distance_m} m walk"
+    return f"Steep walking{where}: {', '.join(facts)}."
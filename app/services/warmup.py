@@ -0,0 +1,116 @@
+from __future__ import annotations
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+from app.services.calendar import get_next_event_from_ics
+from app.services.gazetteer import get_gazetteer
+from app.services.geocode import geocode_address
+from app.services.terrain import get_raster
+from app.services.transit import get_elevator_outages
+from app.services.weather import get_weather_window
+from app.utils.ratelimit import batch_priority
+
+
+class WarmupStatus:
+    """Progress of the start-up warm-up, reported by /health."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.state = "idle"  # idle -> running -> ready
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.done = threading.Event()
+
+    def record(self, name: str, ok: bool, elapsed_ms: float, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.tasks[name] = {"ok": ok, "ms": round(elapsed_ms, 1), **({"error": error} if error else {})}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "elapsed_ms": round(((self.finished_at or time.time()) - self.started_at) * 1000, 1) if self.started_at else None,
+                "tasks": dict(self.tasks),
+            }
+
+
+status = WarmupStatus()
+
+
+def _warm_home() -> None:
+    # Geocode the home address, then fetch the weather tile around it
+    if not settings.HOME_ADDRESS:
+        return
+    geo = geocode_address(settings.HOME_ADDRESS)
+    if geo:
+        get_weather_window(geo[0], geo[1], None)
+
+
+def _warm_calendar() -> None:
+    # Fetch the ICS feed and pre-geocode the next event's location
+    ev = get_next_event_from_ics()
+    if ev and ev[2]:
+        geocode_address(ev[2])
+
+
+_TASKS: Dict[str, Callable[[], Any]] = {
+    "home": _warm_home,
+    "outages": get_elevator_outages,
+    "calendar": _warm_calendar,
+    "elevation": get_raster,
+    "gazetteer": get_gazetteer,
+}
+
+
+def _run_task(name: str, fn: Callable[[], Any]) -> None:
+    start = time.perf_counter()
+    try:
+        with batch_priority():
+            fn()
+        status.record(name, True, (time.perf_counter() - start) * 1000)
+    except Exception as e:
+        status.record(name, False, (time.perf_counter() - start) * 1000, error=str(e))
+
+
+def run_warmup(timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Fill the service caches in parallel (home geocode + weather, both MTA feeds,
+    ICS feed). Blocks until done or `timeout`; tasks still running after the
+    timeout keep going in the background, but readiness is reported anyway.
+    """
+    with status._lock:
+        if status.state != "idle":
+            already = True
+        else:
+            already = False
+            status.state = "running"
+            status.started_at = time.time()
+    if already:
+        status.done.wait(timeout)
+        return status.snapshot()
+
+    pool = ThreadPoolExecutor(max_workers=len(_TASKS), thread_name_prefix="warmup")
+    futures = [pool.submit(_run_task, name, fn) for name, fn in _TASKS.items()]
+    wait(futures, timeout=timeout if timeout is not None else settings.WARMUP_TIMEOUT_SECONDS)
+    pool.shutdown(wait=False)
+    with status._lock:
+        status.state = "ready"
+        status.finished_at = time.time()
+    status.done.set()
+    return status.snapshot()
+
+
+def start_warmup_background() -> Optional[threading.Thread]:
+    if not settings.WARMUP_ENABLED:
+        return None
+    t = threading.Thread(target=run_warmup, name="warmup", daemon=True)
+    t.start()
+    return t
+
+
+def is_ready() -> bool:
+    return not settings.WARMUP_ENABLED or status.state == "ready"
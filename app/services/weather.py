@@ -1,58 +1,270 @@
 from __future__ import annotations
-from typing import Optional, Tuple
-from datetime import datetime, timezone
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+from datetime import datetime, timezone, tzinfo
+
+import numpy as np
+
 from app.config import settings
-from app.utils.http import get_http_client
+from app.utils.cache import ttl_cache
+from app.utils.http import upstream_request
+from app.utils.lastgood import last_good
+from app.utils.singleflight import singleflight
 
+WEATHER_CITATION = "https://openweathermap.org/"
+_MOCK_RISK = "Light rain expected; carry rain cover."
 
-def get_weather_window(lat: float, lon: float, target_iso: Optional[str]) -> Tuple[str, Optional[str]]:
+# Hazards in report order, with their severity (feeds route scoring)
+_HAZARDS: Tuple[Tuple[str, int], ...] = (
+    ("heavy rain", 2),
+    ("light rain", 1),
+    ("snow", 2),
+    ("strong wind", 1),
+    ("freezing temperatures", 1),
+)
+
+
+@dataclass
+class WeatherExposure:
+    """Weather along a trip: every hour from departure to arrival, at every corridor tile."""
+
+    risk_text: str
+    penalty: int = 0  # 0 = nothing notable; higher = worse
+    hazards: List[str] = field(default_factory=list)
+    worst_hour_iso: Optional[str] = None
+    hours: int = 0
+    tiles: int = 0
+    points: int = 0
+
+
+def _to_ts(iso: Optional[str]) -> Optional[int]:
+    if not iso:
+        return None
+    try:
+        dt = datetime.fromisoformat(iso)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def _event_zone(*isos: Optional[str]) -> Optional[tzinfo]:
+    """Zone of the first of `isos` that carries an offset; times in the package are shown in it."""
+    for iso in isos:
+        try:
+            dt = datetime.fromisoformat(iso) if iso else None
+        except ValueError:
+            continue
+        if dt is not None and dt.tzinfo is not None:
+            return dt.tzinfo
+    return None
+
+
+def _tile(lat: float, lon: float) -> Tuple[float, float]:
+    """Snap a point to the centre of its forecast tile so nearby points share one fetch."""
+    size = settings.WEATHER_TILE_DEG
+    return (
+        round((math.floor(lat / size) + 0.5) * size, 4),
+        round((math.floor(lon / size) + 0.5) * size, 4),
+    )
+
+
+def corridor_points(
+    origin: Tuple[float, float],
+    destination: Tuple[float, float],
+    step_km: Optional[float] = None,
+) -> List[Tuple[float, float]]:
+    """Evenly spaced samples on the straight line origin -> destination (both ends included)."""
+    (lat1, lon1), (lat2, lon2) = origin, destination
+    # Equirectangular distance is plenty for spacing samples
+    dx = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    dy = math.radians(lat2 - lat1)
+    dist_km = 6371.0 * math.hypot(dx, dy)
+    n = max(1, math.ceil(dist_km / (step_km or settings.WEATHER_CORRIDOR_STEP_KM)))
+    f = np.linspace(0.0, 1.0, n + 1)
+    return list(zip((lat1 + (lat2 - lat1) * f).tolist(), (lon1 + (lon2 - lon1) * f).tolist()))
+
+
+def points_along(coords: np.ndarray, step_km: Optional[float] = None) -> List[Tuple[float, float]]:
+    """Samples every `step_km` along a route geometry ((N, 2) lat/lng), both ends included."""
+    if len(coords) < 2:
+        return [tuple(p) for p in coords.tolist()]
+    lat = np.radians(coords[:, 0])
+    dlat = np.diff(lat)
+    dlon = np.diff(np.radians(coords[:, 1])) * np.cos((lat[1:] + lat[:-1]) / 2)
+    dist = np.concatenate(([0.0], np.cumsum(6371.0 * np.hypot(dlat, dlon))))
+    n = max(1, math.ceil(dist[-1] / (step_km or settings.WEATHER_CORRIDOR_STEP_KM)))
+    at = np.linspace(0.0, dist[-1], n + 1)
+    return list(zip(np.interp(at, dist, coords[:, 0]).tolist(), np.interp(at, dist, coords[:, 1]).tolist()))
+
+
+@last_good("weather_hourly", "openweather")
+@ttl_cache("weather_hourly", settings.WEATHER_CACHE_TTL_SECONDS)
+@singleflight("weather_hourly")
+def _fetch_hourly(tile_lat: float, tile_lon: float) -> Optional[Dict[str, List[float]]]:
     """
-    Returns (risk_text, cite_url). If no risk, risk_text may be empty.
-    Uses OpenWeather if available, else deterministic mock.
+    Hourly forecast for one tile as parallel arrays (dt, rain, snow, wind, temp),
+    or None if unavailable.
+    """
+    r = upstream_request(
+        "openweather",
+        "GET",
+        "https://api.openweathermap.org/data/3.0/onecall",
+        params={
+            "lat": tile_lat,
+            "lon": tile_lon,
+            "appid": settings.OPENWEATHER_API_KEY,
+            "units": settings.WEATHER_UNITS,
+            "exclude": "minutely,daily,alerts",
+        },
+    )
+    if r.status_code != 200:
+        return None
+    hours = r.json().get("hourly") or []
+    if not hours:
+        return None
+
+    def amount(h: dict, key: str) -> float:
+        v = h.get(key)
+        return float(v.get("1h", 0.0) or 0.0) if isinstance(v, dict) else 0.0
+
+    return {
+        "dt": [float(h.get("dt") or 0) for h in hours],
+        "rain": [amount(h, "rain") for h in hours],
+        "snow": [amount(h, "snow") for h in hours],
+        "wind": [float(h.get("wind_speed") or 0.0) for h in hours],
+        "temp": [float(h.get("temp") if h.get("temp") is not None else math.nan) for h in hours],
+    }
+
+
+def classify_hazards(
+    rain: np.ndarray,
+    snow: np.ndarray,
+    wind: np.ndarray,
+    temp: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """Boolean hazard masks over (tiles x hours) arrays, in one vectorized pass."""
+    imperial = settings.WEATHER_UNITS == "imperial"
+    wind_limit = 18.6 if imperial else 8.3  # ~30 km/h
+    freezing = 32.0 if imperial else 0.0
+    with np.errstate(invalid="ignore"):
+        return {
+            "heavy rain": rain > 2.0,
+            "light rain": (rain > 0.2) & (rain <= 2.0),
+            "snow": snow > 0.0,
+            "strong wind": wind > wind_limit,
+            "freezing temperatures": temp <= freezing,
+        }
+
+
+def _format_risk(hazards: List[str], worst_iso: Optional[str], local: bool = True) -> str:
+    """One sentence for the bullet; `worst_iso` is shown as wall-clock time in its own offset."""
+    if not hazards:
+        return ""
+    # "light rain" is redundant next to "heavy rain"
+    shown = [h for h in hazards if not (h == "light rain" and "heavy rain" in hazards)]
+    when = ""
+    if worst_iso:
+        zone = "" if local else " UTC"
+        when = f" (worst around {datetime.fromisoformat(worst_iso).strftime('%H:%M')}{zone})"
+    return f"{', '.join(shown).capitalize()} expected along the route during the trip{when}."
+
+
+def weather_is_live() -> bool:
+    return bool(settings.OPENWEATHER_API_KEY) and not settings.MOCK_MODE
+
+
+def get_corridor_weather(
+    points: Sequence[Tuple[float, float]],
+    depart_iso: Optional[str],
+    arrive_iso: Optional[str],
+) -> WeatherExposure:
+    """
+    Aggregate weather exposure for a trip: points are deduplicated into forecast
+    tiles (one fetch per tile; last-known-good forecast if a fetch fails), then
+    every hour overlapping [depart, arrive] at every tile is classified
+    together. The deterministic mock in MOCK_MODE; no risk reported when there
+    is no API key or no forecast at all.
     """
-    if settings.OPENWEATHER_API_KEY and not settings.MOCK_MODE:
+    tiles = list(dict.fromkeys(_tile(lat, lon) for lat, lon in points))
+    if settings.MOCK_MODE:
+        return WeatherExposure(risk_text=_MOCK_RISK, penalty=1, hazards=["light rain"], tiles=len(tiles), points=len(points))
+    if not weather_is_live() or not tiles:
+        return WeatherExposure(risk_text="", tiles=len(tiles), points=len(points))
+
+    series = []
+    for tile in tiles:
         try:
-            # Fetch hourly and check +/- 1 hour of target
-            with get_http_client() as client:
-                r = client.get(
-                    "https://api.openweathermap.org/data/3.0/onecall",
-                    params={
-                        "lat": lat,
-                        "lon": lon,
-                        "appid": settings.OPENWEATHER_API_KEY,
-                        "units": settings.WEATHER_UNITS,
-                        "exclude": "minutely,daily,alerts",
-                    },
-                )
-                if r.status_code == 200:
-                    data = r.json()
-                    target_ts = None
-                    if target_iso:
-                        try:
-                            target_ts = int(datetime.fromisoformat(target_iso).replace(tzinfo=timezone.utc).timestamp())
-                        except Exception:
-                            target_ts = None
-                    # Select the hour closest to target
-                    cand = None
-                    if target_ts and (hours := data.get("hourly")):
-                        cand = sorted(hours, key=lambda h: abs((h.get("dt") or 0) - target_ts))[0]
-                    else:
-                        cand = (data.get("hourly") or [None])[0]
-                    if cand:
-                        rain = cand.get("rain", {}).get("1h", 0.0) if isinstance(cand.get("rain"), dict) else 0.0
-                        wind = cand.get("wind_speed", 0.0) or 0.0
-                        hazards = []
-                        if rain and rain > 2.0:
-                            hazards.append("heavy rain")
-                        elif rain and rain > 0.2:
-                            hazards.append("light rain")
-                        if wind and wind > 8.3:  # ~30 km/h
-                            hazards.append("strong wind")
-                        if hazards:
-                            return f"{', '.join(hazards).capitalize()} expected near travel time.", "https://openweathermap.org/"
-                        return "", "https://openweathermap.org/"
+            data = _fetch_hourly(*tile)
         except Exception:
-            pass
-    # Mock risk
-    return "Light rain expected; carry rain cover.", "https://openweathermap.org/"
+            data = None
+        if data:
+            series.append(data)
+    if not series:
+        return WeatherExposure(risk_text="", tiles=len(tiles), points=len(points))
+
+    # Tiles can return different hour counts; pad to a rectangle with NaN
+    width = max(len(s["dt"]) for s in series)
+
+    def matrix(key: str) -> np.ndarray:
+        m = np.full((len(series), width), np.nan)
+        for i, s in enumerate(series):
+            m[i, : len(s[key])] = s[key]
+        return m
+
+    dt = matrix("dt")
+    zone = _event_zone(arrive_iso, depart_iso)
+    now = datetime.now(timezone.utc).timestamp()
+    arrive = _to_ts(arrive_iso) or now
+    depart = _to_ts(depart_iso) or arrive
+    # Hourly slots cover [dt, dt + 1h); keep every slot the trip overlaps
+    with np.errstate(invalid="ignore"):
+        in_window = (dt + 3600 > min(depart, arrive)) & (dt <= max(depart, arrive))
+    if not in_window.any():
+        # Trip outside the forecast range: use the slot closest to arrival
+        nearest = np.nanargmin(np.abs(dt - arrive), axis=1)
+        in_window = np.zeros_like(in_window)
+        in_window[np.arange(len(series)), nearest] = True
+
+    masks = classify_hazards(
+        np.nan_to_num(matrix("rain")),
+        np.nan_to_num(matrix("snow")),
+        np.nan_to_num(matrix("wind")),
+        matrix("temp"),
+    )
+    severity = np.zeros(dt.shape)
+    hazards: List[str] = []
+    for name, weight in _HAZARDS:
+        hit = masks[name] & in_window
+        if hit.any():
+            hazards.append(name)
+            severity += hit * weight
+    worst_iso = None
+    if hazards:
+        row, col = np.unravel_index(np.argmax(np.where(in_window, severity, -1)), severity.shape)
+        # Same zone as the event's start and the leave-by time; UTC only if the event has none
+        worst_iso = datetime.fromtimestamp(float(dt[row, col]), tz=zone or timezone.utc).isoformat()
+    penalty = int(sum(w for name, w in _HAZARDS if name in hazards and not (name == "light rain" and "heavy rain" in hazards)))
+    return WeatherExposure(
+        risk_text=_format_risk(hazards, worst_iso, local=zone is not None),
+        penalty=penalty,
+        hazards=hazards,
+        worst_hour_iso=worst_iso,
+        hours=int(in_window.any(axis=0).sum()),
+        tiles=len(tiles),
+        points=len(points),
+    )
 
+
+@ttl_cache("weather", settings.WEATHER_CACHE_TTL_SECONDS)
+@singleflight("weather")
+def get_weather_window(lat: float, lon: float, target_iso: Optional[str]) -> Tuple[str, Optional[str]]:
+    """
+    Returns (risk_text, cite_url). If no risk, risk_text may be empty.
+    Uses OpenWeather if available (or its last-known-good forecast); mock in MOCK_MODE.
+    Single point and hour; trips use get_corridor_weather.
+    """
+    exposure = get_corridor_weather([(lat, lon)], target_iso, target_iso)
+    return exposure.risk_text, WEATHER_CITATION
@@ -0,0 +1,147 @@
+from __future__ import annotations
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import orjson
+from cachetools import TLRUCache  # type: ignore
+
+from app.config import settings
+from app.utils.shared_cache import get_shared_cache
+from app.utils.singleflight import _make_key
+
+_MISSING = object()
+
+# namespace -> cache, so warm-up and health checks can inspect them
+_caches: Dict[str, TLRUCache] = {}
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value in ("", {}, [])
+
+
+def _shared_key(args: tuple, kwargs: dict) -> str:
+    return orjson.dumps([args, kwargs], option=orjson.OPT_SORT_KEYS, default=str).decode()
+
+
+def ttl_cache(namespace: str, ttl_seconds: float, maxsize: int = 1024) -> Callable:
+    """
+    TTL cache keyed by call arguments. Empty results (None, "", {}, []) are
+    not cached so a failed lookup is retried on the next call. Put it above
+    @singleflight so concurrent misses still collapse into one call.
+
+    Two tiers: an in-process LRU, then (when SHARED_CACHE_PATH is set) the
+    host-wide SQLite tier shared by all workers. A value keeps the expiry it
+    was given by the worker that fetched it, and on a shared miss only the
+    worker holding the refresh lease calls the function; the others wait
+    for its result (up to SHARED_CACHE_WAIT_SECONDS).
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        # Entries are (value, expires_at); each expires at its own wall-clock time
+        cache: TLRUCache = TLRUCache(maxsize=maxsize, ttu=lambda _k, entry, _now: entry[1], timer=time.time)
+        lock = threading.Lock()
+        _caches[namespace] = cache
+
+        def lookup(key) -> Any:
+            with lock:
+                entry = cache.get(key, _MISSING)
+            return entry if entry is _MISSING else entry[0]
+
+        def store(key, value, expires_at: Optional[float] = None) -> None:
+            if _is_empty(value):
+                return
+            with lock:
+                cache[key] = (value, expires_at or time.time() + ttl_seconds)
+
+        def shared_lookup(key, args, kwargs) -> Tuple[Any, Optional[str]]:
+            shared = get_shared_cache()
+            if shared is None:
+                return _MISSING, None
+            skey = _shared_key(args, kwargs)
+            hit = shared.get(namespace, skey)
+            if hit is None:
+                return _MISSING, skey
+            store(key, *hit)
+            return hit[0], skey
+
+        def shared_store(skey: Optional[str], key, value) -> None:
+            shared = get_shared_cache()
+            if skey is None or shared is None or _is_empty(value):
+                store(key, value)
+                return
+            store(key, value, shared.set(namespace, skey, value, ttl_seconds))
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = _make_key(namespace, args, kwargs)
+            hit = lookup(key)
+            if hit is not _MISSING:
+                return hit
+            hit, skey = shared_lookup(key, args, kwargs)
+            if hit is not _MISSING:
+                return hit
+            shared = get_shared_cache()
+            if shared is None or skey is None:
+                value = fn(*args, **kwargs)
+                store(key, value)
+                return value
+            lease = min(ttl_seconds, settings.SHARED_CACHE_LEASE_SECONDS)
+            if not shared.acquire(namespace, skey, lease):
+                waited = shared.wait(namespace, skey, min(lease, settings.SHARED_CACHE_WAIT_SECONDS))
+                if waited is not None:
+                    store(key, *waited)
+                    return waited[0]
+                # The refreshing worker failed or is too slow: fetch it ourselves
+            try:
+                value = fn(*args, **kwargs)
+                shared_store(skey, key, value)
+            finally:
+                shared.release(namespace, skey)
+            return value
+
+        inner_aio = getattr(fn, "aio", None)
+        if inner_aio is not None:
+
+            async def aio(*args, **kwargs):
+                # No lease waits here: polling would block the event loop
+                key = _make_key(namespace, args, kwargs)
+                hit = lookup(key)
+                if hit is not _MISSING:
+                    return hit
+                hit, skey = shared_lookup(key, args, kwargs)
+                if hit is not _MISSING:
+                    return hit
+                value = await inner_aio(*args, **kwargs)
+                shared_store(skey, key, value)
+                return value
+
+            wrapper.aio = aio  # type: ignore[attr-defined]
+
+        def cache_clear() -> None:
+            with lock:
+                cache.clear()
+
+        def cache_get(*args, **kwargs) -> Any:
+            """Cached value for these arguments, or None; never calls the function."""
+            key = _make_key(namespace, args, kwargs)
+            hit = lookup(key)
+            if hit is _MISSING:
+                hit, _ = shared_lookup(key, args, kwargs)
+            return None if hit is _MISSING else hit
+
+        def cache_set(value: Any, *args, **kwargs) -> None:
+            """Store a value computed elsewhere (e.g. by a batch call) for these arguments."""
+            shared_store(_shared_key(args, kwargs) if get_shared_cache() else None, _make_key(namespace, args, kwargs), value)
+
+        wrapper.cache_clear = cache_clear  # type: ignore[attr-defined]
+        wrapper.cache_get = cache_get  # type: ignore[attr-defined]
+        wrapper.cache_set = cache_set  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorator
+
+
+def cache_stats() -> Dict[str, int]:
+    return {name: len(cache) for name, cache in sorted(_caches.items())}
@@ -0,0 +1,77 @@
+from __future__ import annotations
+import math
+from typing import Any, Callable, Dict, Tuple
+
+import orjson
+
+# Wrapper objects carry this key; a plain dict that happens to use it is wrapped too
+_TAG = "__codec__"
+
+# class -> (tag, to_dict) for writing, tag -> from_dict for reading
+_decoders: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+_encoders: Dict[type, Tuple[str, Callable[[Any], Dict[str, Any]]]] = {}
+
+
+def register(tag: str, cls: type, to_dict: Callable[[Any], Dict[str, Any]], from_dict: Callable[[Dict[str, Any]], Any]) -> None:
+    """Let values of `cls` be stored: written as to_dict(value), read back with from_dict(data)."""
+    _encoders[cls] = (tag, to_dict)
+    _decoders[tag] = from_dict
+
+
+def _encode(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        # JSON has no NaN/inf; orjson would write them as null
+        return value if math.isfinite(value) else {_TAG: "float", "value": repr(value)}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, tuple):
+        return {_TAG: "tuple", "items": [_encode(v) for v in value]}
+    if isinstance(value, dict):
+        if _TAG not in value and all(type(k) is str for k in value):
+            return {k: _encode(v) for k, v in value.items()}
+        return {_TAG: "dict", "items": [[_encode(k), _encode(v)] for k, v in value.items()]}
+    entry = _encoders.get(type(value))
+    if entry is None:
+        raise TypeError(f"cannot encode {type(value).__name__}")
+    tag, to_dict = entry
+    return {_TAG: tag, "value": _encode(to_dict(value))}
+
+
+def _decode(data: Any) -> Any:
+    if isinstance(data, list):
+        return [_decode(v) for v in data]
+    if not isinstance(data, dict):
+        return data
+    tag = data.get(_TAG)
+    if tag is None:
+        return {k: _decode(v) for k, v in data.items()}
+    if tag == "float":
+        return float(data["value"])
+    if tag == "tuple":
+        return tuple(_decode(v) for v in data["items"])
+    if tag == "dict":
+        return {_decode(k): _decode(v) for k, v in data["items"]}
+    from_dict = _decoders.get(tag)
+    if from_dict is None:
+        raise ValueError(f"unknown codec tag {tag!r}")
+    return from_dict(_decode(data["value"]))
+
+
+def dumps(value: Any) -> bytes:
+    """
+    JSON bytes for a cached value. Tuples, dicts with non-string keys and
+    registered classes are tagged so `loads` gives back the same types;
+    anything else raises TypeError. Unlike pickle, reading a value never
+    runs code other than the registered from_dict constructors.
+    """
+    return orjson.dumps(_encode(value))
+
+
+def loads(blob: bytes) -> Any:
+    """Value written by `dumps`; raises ValueError on malformed or unknown data."""
+    try:
+        return _decode(orjson.loads(blob))
+    except (AttributeError, KeyError, TypeError) as e:
+        raise ValueError(f"malformed cached value: {e}") from e
@@ -1,11 +1,105 @@
+import json
+import os
+import ssl
+import threading
+import time
+from typing import Optional
+
 import httpx
 from app.config import settings
+from app.utils.ratelimit import RateLimitExceeded, get_limiter, parse_retry_after
+from app.utils.resilience import CircuitOpenError, get_upstream
+
+_USER_AGENT = "mobility-context-mvp/1.0"
+_shared_client: Optional[httpx.Client] = None
+_shared_lock = threading.Lock()
+_ssl_context: Optional[ssl.SSLContext] = None
+
+# What a failed upstream call can raise: transport errors and timeouts, an open
+# circuit, local throttling, or a body that is not the JSON it should be
+UPSTREAM_ERRORS = (httpx.HTTPError, CircuitOpenError, RateLimitExceeded, OSError, json.JSONDecodeError)
+
+
+def _get_ssl_context() -> ssl.SSLContext:
+    # Loading the CA bundle is the slowest part of creating a client; do it once
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = httpx.create_ssl_context()
+    return _ssl_context
 
 
 def get_http_client(timeout: float | None = None) -> httpx.Client:
-    return httpx.Client(timeout=timeout or settings.REQUEST_TIMEOUT_SECONDS, headers={"User-Agent": "mobility-context-mvp/1.0"})
+    return httpx.Client(
+        timeout=timeout or settings.REQUEST_TIMEOUT_SECONDS,
+        headers={"User-Agent": _USER_AGENT},
+        verify=_get_ssl_context(),
+    )
 
 
 def get_async_http_client(timeout: float | None = None) -> httpx.AsyncClient:
-    return httpx.AsyncClient(timeout=timeout or settings.REQUEST_TIMEOUT_SECONDS, headers={"User-Agent": "mobility-context-mvp/1.0"})
+    return httpx.AsyncClient(timeout=timeout or settings.REQUEST_TIMEOUT_SECONDS, headers={"User-Agent": _USER_AGENT})
+
+
+def get_shared_http_client() -> httpx.Client:
+    """Process-wide pooled client so upstream calls reuse keep-alive connections."""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = get_http_client()
+    return _shared_client
+
+
+def _reset_after_fork() -> None:
+    # Pooled sockets belong to the parent; a forked child opens its own
+    # connections but keeps the already-loaded SSL context.
+    global _shared_client, _shared_lock
+    _shared_client = None
+    _shared_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
 
+def upstream_request(upstream: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Issue a request through the named upstream's circuit breaker, using its
+    adaptive timeout. Raises CircuitOpenError without touching the network
+    while the circuit is open; 5xx/429 responses and transport errors count
+    as failures. Rate-limited upstreams (Nominatim, Overpass) first wait for
+    a token; a 429/503 with Retry-After pauses the bucket and is retried once
+    if the pause fits within RATE_LIMIT_MAX_WAIT_SECONDS.
+    """
+    up = get_upstream(upstream)
+    if not up.breaker.allow():
+        raise CircuitOpenError(upstream)
+    limiter = get_limiter(upstream)
+    attempts = 2 if limiter else 1
+    for attempt in range(attempts):
+        if limiter:
+            try:
+                limiter.acquire()
+            except Exception:
+                # Local throttling is not an upstream failure
+                up.breaker.release()
+                raise
+        start = time.perf_counter()
+        try:
+            r = get_shared_http_client().request(method, url, timeout=up.timeout(), **kwargs)
+        except Exception:
+            up.breaker.record_failure()
+            raise
+        if limiter and r.status_code in (429, 503):
+            retry_after = parse_retry_after(r.headers.get("Retry-After"))
+            if retry_after is not None:
+                limiter.defer(retry_after)
+                if attempt + 1 < attempts and retry_after <= settings.RATE_LIMIT_MAX_WAIT_SECONDS:
+                    continue
+        break
+    if r.status_code >= 500 or r.status_code == 429:
+        up.breaker.record_failure()
+    else:
+        up.breaker.record_success()
+        up.latency.record(time.perf_counter() - start)
+    return r
@@ -0,0 +1,216 @@
+from __future__ import annotations
+import contextvars
+import functools
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import orjson
+from cachetools import LRUCache  # type: ignore
+
+from app.config import settings
+from app.utils import codec
+from app.utils.http import UPSTREAM_ERRORS
+from app.utils.shared_cache import create_owner_only
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS last_good (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+"""
+
+# source name -> age (seconds) of the oldest last-known-good value served in this context
+_stale: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("stale_sources", default=None)
+
+
+@contextmanager
+def track_staleness() -> Iterator[Dict[str, float]]:
+    """Collect the sources answered from the last-known-good store while the block runs."""
+    stale: Dict[str, float] = {}
+    token = _stale.set(stale)
+    try:
+        yield stale
+    finally:
+        _stale.reset(token)
+
+
+def _note(source: str, age: float) -> None:
+    stale = _stale.get()
+    if stale is not None:
+        stale[source] = max(stale.get(source, 0.0), age)
+
+
+class LastGoodStore:
+    """
+    Last successful upstream answer per (namespace, call arguments), with the
+    time it was fetched. Kept in an in-process LRU and, when LAST_GOOD_DB_PATH
+    is set, in SQLite (WAL) so it survives restarts. Writes only happen when a
+    fresh value arrives, i.e. at most once per cache TTL per key.
+    """
+
+    def __init__(self, path: Optional[str], max_entries: int = 4096) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._memory: LRUCache = LRUCache(maxsize=max_entries)
+        self._local = threading.local()
+        self.hits = 0
+        if path:
+            create_owner_only(path)
+            conn = self._conn()
+            conn.executescript(_SCHEMA)
+            with conn:
+                conn.execute("DELETE FROM last_good WHERE fetched_at < ?", (time.time() - settings.LAST_GOOD_MAX_AGE_SECONDS,))
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)  # type: ignore[arg-type]
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, namespace: str, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            prev = self._memory.get((namespace, key))
+            if prev is not None and prev[0] is value:
+                return  # same cached object handed out again; nothing new to persist
+            self._memory[(namespace, key)] = (value, now)
+        if self.path:
+            try:
+                with self._conn() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO last_good (namespace, key, fetched_at, value) VALUES (?, ?, ?, ?)",
+                        (namespace, key, now, codec.dumps(value)),
+                    )
+            except (sqlite3.Error, TypeError):
+                pass
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, fetched_at) if a value younger than LAST_GOOD_MAX_AGE_SECONDS exists."""
+        oldest = time.time() - settings.LAST_GOOD_MAX_AGE_SECONDS
+        with self._lock:
+            hit = self._memory.get((namespace, key))
+        if hit is None and self.path:
+            try:
+                row = self._conn().execute(
+                    "SELECT value, fetched_at FROM last_good WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is not None:
+                try:
+                    hit = (codec.loads(row[0]), row[1])
+                except ValueError:
+                    hit = None
+                if hit is not None:
+                    with self._lock:
+                        self._memory[(namespace, key)] = hit
+        if hit is None or hit[1] < oldest:
+            return None
+        return hit
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"persistent": bool(self.path), "entries_in_memory": len(self._memory), "served": self.hits}
+
+
+_store: Optional[LastGoodStore] = None
+_store_lock = threading.Lock()
+
+
+def get_last_good_store() -> LastGoodStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = LastGoodStore(settings.LAST_GOOD_DB_PATH)
+                except (OSError, sqlite3.Error):
+                    _store = LastGoodStore(None)
+    return _store
+
+
+def _key(args: tuple, kwargs: dict) -> str:
+    return orjson.dumps([args, kwargs], option=orjson.OPT_SORT_KEYS, default=str).decode()
+
+
+def remember(namespace: str, value: Any, *args, **kwargs) -> None:
+    """Record a successful upstream answer for these call arguments."""
+    if value is not None and not settings.MOCK_MODE:
+        get_last_good_store().put(namespace, _key(args, kwargs), value)
+
+
+def recall(namespace: str, source: str, *args, **kwargs) -> Any:
+    """
+    Last-known-good value for these call arguments, or None. Serving one
+    records its age under `source` for the current request (see track_staleness).
+    """
+    if settings.MOCK_MODE:
+        return None
+    store = get_last_good_store()
+    hit = store.get(namespace, _key(args, kwargs))
+    if hit is None:
+        return None
+    value, fetched_at = hit
+    store.hits += 1
+    _note(source, time.time() - fetched_at)
+    return value
+
+
+def last_good(namespace: str, source: str) -> Callable:
+    """
+    Serve the last-known-good answer when the wrapped call fails (raises one
+    of UPSTREAM_ERRORS or returns None); any other exception is a bug and
+    propagates. After a failure the upstream is not retried for
+    LAST_GOOD_RETRY_SECONDS: callers get the stored answer straight away
+    instead of waiting on another timeout. Put it above @ttl_cache so only
+    fresh answers are cached in memory. Inactive in MOCK_MODE.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        retry_at: Dict[str, float] = {}
+        lock = threading.Lock()
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if settings.MOCK_MODE:
+                return fn(*args, **kwargs)
+            key = _key(args, kwargs)
+            with lock:
+                backing_off = retry_at.get(key, 0.0) > time.monotonic()
+            if backing_off:
+                stored = recall(namespace, source, *args, **kwargs)
+                if stored is not None:
+                    return stored
+            try:
+                value = fn(*args, **kwargs)
+            except UPSTREAM_ERRORS:
+                value = None
+            if value is not None:
+                with lock:
+                    retry_at.pop(key, None)
+                get_last_good_store().put(namespace, key, value)
+                return value
+            with lock:
+                retry_at[key] = time.monotonic() + settings.LAST_GOOD_RETRY_SECONDS
+                if len(retry_at) > 4096:
+                    now = time.monotonic()
+                    for k in [k for k, t in retry_at.items() if t <= now]:
+                        del retry_at[k]
+            return recall(namespace, source, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def last_good_stats() -> Dict[str, Any]:
+    return get_last_good_store().stats()
@@ -0,0 +1,51 @@
+from __future__ import annotations
+from typing import List, Sequence
+
+import numpy as np
+
+
+def decode_polylines(encoded: Sequence[str], precision: int = 5) -> List[np.ndarray]:
+    """
+    Decode Google encoded polylines into (N, 2) float arrays of (lat, lng).
+
+    All strings are decoded together in one vectorized pass: every character
+    becomes a 5-bit group, groups are summed per value at their bit offsets
+    (np.add.reduceat), zigzag-decoded, and the per-point deltas are
+    cumulatively summed with each polyline's running total reset at its start.
+    """
+    if not encoded:
+        return []
+    lengths = np.fromiter((len(s) for s in encoded), dtype=np.int64, count=len(encoded))
+    raw = np.frombuffer("".join(encoded).encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    if raw.size == 0:
+        return [np.empty((0, 2)) for _ in encoded]
+
+    # A value ends at the first group without the continuation bit (0x20)
+    ends = (raw & 0x20) == 0
+    end_idx = np.flatnonzero(ends)
+    starts = np.concatenate(([0], end_idx[:-1] + 1))
+    # Bit offset of each group inside its value
+    value_of_group = np.repeat(np.arange(starts.size), np.diff(np.concatenate((starts, [raw.size]))))
+    shift = 5 * (np.arange(raw.size) - starts[value_of_group])
+    values = np.add.reduceat((raw & 0x1F) << shift, starts)
+    values = np.where(values & 1, ~(values >> 1), values >> 1)
+
+    # Values per polyline, then (lat, lng) delta pairs with the running sum reset per polyline
+    byte_offsets = np.concatenate(([0], np.cumsum(lengths)))
+    values_per_line = np.searchsorted(end_idx, byte_offsets[1:], side="left") - np.searchsorted(
+        end_idx, byte_offsets[:-1], side="left"
+    )
+    points_per_line = values_per_line // 2
+    deltas = values[: 2 * (values.size // 2)].reshape(-1, 2)
+    totals = np.cumsum(deltas, axis=0)
+    first_point = np.concatenate(([0], np.cumsum(points_per_line)[:-1]))
+    offsets = np.zeros((len(encoded), 2), dtype=np.int64)
+    has_prior = first_point > 0
+    offsets[has_prior] = totals[first_point[has_prior] - 1]
+    base = np.repeat(offsets, points_per_line, axis=0)
+    coords = (totals - base) / float(10 ** precision)
+    return np.split(coords, np.cumsum(points_per_line)[:-1])
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> np.ndarray:
+    return decode_polylines([encoded], precision)[0]
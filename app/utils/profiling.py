@@ -0,0 +1,209 @@
+from __future__ import annotations
+import contextlib
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+
+# Profile file names handed out to clients; anything else is refused by /profiles/{name}
+PROFILE_NAME_RE = re.compile(r"^[\w.-]+\.(speedscope\.json|collapsed\.txt)$")
+
+_seq = itertools.count(1)
+_CWD = os.getcwd() + os.sep
+
+# CPU-bound code only lets the sampler run at each GIL switch (5 ms by default);
+# shorten the switch interval while any profile is active
+_switch_lock = threading.Lock()
+_active = 0
+_default_switch = sys.getswitchinterval()
+
+
+def _label(code: Any) -> str:
+    path = code.co_filename
+    if path.startswith(_CWD):
+        path = path[len(_CWD):]
+    elif "site-packages" + os.sep in path:
+        path = path.split("site-packages" + os.sep, 1)[1]
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """
+    Samples one thread's Python stack every PROFILE_INTERVAL_MS from a helper
+    thread (sys._current_frames), so only the profiled request pays for it
+    and the code under test runs unmodified. Stacks are kept as tuples of
+    code objects and only turned into names when the profile is written.
+    """
+
+    def __init__(self, name: str, thread_id: Optional[int] = None, interval_ms: Optional[float] = None) -> None:
+        self.name = name
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = (interval_ms or settings.PROFILE_INTERVAL_MS) / 1000.0
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration_ms = 0.0
+        self.path: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        global _active
+        with _switch_lock:
+            _active += 1
+            sys.setswitchinterval(min(_default_switch, self.interval))
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        global _active
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        with _switch_lock:
+            _active -= 1
+            if not _active:
+                sys.setswitchinterval(_default_switch)
+
+    def _run(self) -> None:
+        frames = sys._current_frames
+        tid, stacks, wait = self.thread_id, self.stacks, self._stop.wait
+        while not wait(self.interval):
+            frame = frames().get(tid)
+            if frame is None:
+                continue
+            stack: List[Any] = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def _named_stacks(self) -> List[Tuple[List[str], int]]:
+        return [([_label(code) for code in stack], count) for stack, count in self.stacks.most_common()]
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format (flamegraph.pl, speedscope, inferno)."""
+        return "".join(f"{';'.join(names)} {count}\n" for names, count in self._named_stacks())
+
+    def speedscope(self) -> Dict[str, Any]:
+        """Sampled profile in speedscope's JSON format; weights are milliseconds."""
+        frames: List[Dict[str, Any]] = []
+        index: Dict[str, int] = {}
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        per_sample = self.duration_ms / self.samples if self.samples else 0.0
+        for names, count in self._named_stacks():
+            ids = []
+            for name in names:
+                if name not in index:
+                    index[name] = len(frames)
+                    func, _, where = name.partition(" (")
+                    file, _, line = where.rstrip(")").rpartition(":")
+                    frames.append({"name": func, "file": file, "line": int(line) if line.isdigit() else None})
+                ids.append(index[name])
+            samples.append(ids)
+            weights.append(round(count * per_sample, 3))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "mobility-context-router",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self.name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": round(self.duration_ms, 3),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+    def save(self, directory: Optional[str] = None, fmt: Optional[str] = None) -> str:
+        """Write the profile to PROFILE_DIR (PROFILE_FORMAT: "speedscope" or "collapsed"); returns the path."""
+        directory = directory or settings.PROFILE_DIR
+        fmt = fmt or settings.PROFILE_FORMAT
+        os.makedirs(directory, exist_ok=True)
+        safe_name = re.sub(r"[^\w-]", "_", self.name)
+        stem = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{safe_name}-{os.getpid()}-{next(_seq)}"
+        if fmt == "collapsed":
+            path = os.path.join(directory, f"{stem}.collapsed.txt")
+            body = self.collapsed()
+        else:
+            path = os.path.join(directory, f"{stem}.speedscope.json")
+            body = json.dumps(self.speedscope())
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(body)
+        self.path = path
+        prune_profiles(directory)
+        return path
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "file": os.path.basename(self.path) if self.path else None,
+            "samples": self.samples,
+            "duration_ms": round(self.duration_ms, 1),
+        }
+
+
+def prune_profiles(directory: Optional[str] = None, keep: Optional[int] = None) -> None:
+    """Delete the oldest profiles in `directory` beyond the newest PROFILE_MAX_FILES."""
+    directory = directory or settings.PROFILE_DIR
+    keep = settings.PROFILE_MAX_FILES if keep is None else keep
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if PROFILE_NAME_RE.match(entry.name) and entry.is_file():
+                try:
+                    entries.append((entry.stat().st_mtime, entry.name))
+                except OSError:
+                    continue
+    entries.sort(reverse=True)
+    for _, name in entries[max(keep, 0):]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+
+@contextlib.contextmanager
+def profiled(name: str) -> Iterator[SamplingProfiler]:
+    """Profile the calling thread for the duration of the block and save the result."""
+    profiler = SamplingProfiler(name)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        try:
+            profiler.save()
+        except OSError:
+            pass
+
+
+def maybe_profiled(enabled: bool, name: str) -> ContextManager[Optional[SamplingProfiler]]:
+    """`profiled(name)` if requested and PROFILING_ENABLED; otherwise a no-op yielding None."""
+    if enabled and settings.PROFILING_ENABLED:
+        return profiled(name)
+    return contextlib.nullcontext(None)
+
+
+def profile_requested(flag: Any) -> bool:
+    """Truthy header/query/argument values: 1, true, yes, on (any case), or a real True."""
+    if isinstance(flag, bool):
+        return flag
+    return str(flag or "").strip().lower() in ("1", "true", "yes", "on")
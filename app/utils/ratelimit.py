@@ -0,0 +1,163 @@
+from __future__ import annotations
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.config import settings
+
+INTERACTIVE = 0
+BATCH = 1
+
+# Priority of upstream calls made by the current request/task; batch jobs opt in
+# via `batch_priority()` so interactive requests are served first.
+request_priority: contextvars.ContextVar[int] = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when the wait queue is full or the wait would exceed the limit."""
+
+    def __init__(self, upstream: str, reason: str):
+        super().__init__(f"Rate limit for upstream '{upstream}': {reason}")
+        self.upstream = upstream
+
+
+@contextmanager
+def batch_priority() -> Iterator[None]:
+    token = request_priority.set(BATCH)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Token bucket with a bounded, priority-ordered wait queue. Waiters are
+    served strictly by (priority, arrival order), so batch work never jumps
+    ahead of an interactive request. `defer()` pauses the bucket, e.g. for an
+    upstream's Retry-After.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _delay(self, now: float) -> float:
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self, priority: Optional[int] = None) -> None:
+        if priority is None:
+            priority = request_priority.get()
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            if len(self._waiters) >= self.max_queue:
+                raise RateLimitExceeded(self.name, "wait queue full")
+            me = (priority, next(self._seq))
+            heapq.heappush(self._waiters, me)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    delay = self._delay(now)
+                    if self._waiters[0] == me and delay == 0.0:
+                        self._tokens -= 1
+                        return
+                    if now + delay > deadline:
+                        raise RateLimitExceeded(self.name, "wait would exceed limit")
+                    # Non-head waiters sleep until woken by the head taking its token
+                    self._cond.wait(timeout=delay if self._waiters[0] == me else deadline - now)
+            finally:
+                self._waiters.remove(me)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def defer(self, seconds: float) -> None:
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = min(self._tokens, 0.0)
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "queued": len(self._waiters),
+                "blocked_for_seconds": round(max(0.0, self._blocked_until - time.monotonic()), 2),
+            }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After is either delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except Exception:
+        return None
+
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+
+def _configured_limits() -> Dict[str, Tuple[float, int]]:
+    return {
+        "nominatim": (settings.NOMINATIM_RATE_PER_SECOND, settings.NOMINATIM_BURST),
+        "overpass": (settings.OVERPASS_RATE_PER_SECOND, settings.OVERPASS_BURST),
+    }
+
+
+def get_limiter(upstream: str) -> Optional[TokenBucket]:
+    """Returns the bucket for a rate-limited upstream, or None if it has no limit."""
+    bucket = _limiters.get(upstream)
+    if bucket is None:
+        limit = _configured_limits().get(upstream)
+        if not limit or limit[0] <= 0:
+            return None
+        with _limiters_lock:
+            bucket = _limiters.get(upstream)
+            if bucket is None:
+                rate, burst = limit
+                bucket = TokenBucket(
+                    upstream,
+                    rate,
+                    burst,
+                    settings.RATE_LIMIT_MAX_QUEUE,
+                    settings.RATE_LIMIT_MAX_WAIT_SECONDS,
+                )
+                _limiters[upstream] = bucket
+    return bucket
+
+
+def limiter_health() -> Dict[str, dict]:
+    return {name: b.snapshot() for name, b in sorted(_limiters.items())}
@@ -0,0 +1,149 @@
+from __future__ import annotations
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict
+
+from app.config import settings
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, upstream: str):
+        super().__init__(f"Circuit open for upstream '{upstream}'")
+        self.upstream = upstream
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker. After `failure_threshold`
+    consecutive failures the circuit opens and calls fail fast for
+    `reset_seconds`; then a single probe call is let through and its outcome
+    closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._state = self.HALF_OPEN
+            # Half-open: only one probe at a time
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def release(self) -> None:
+        """Give back a half-open probe slot when the call was never attempted."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._probe_in_flight = False
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies (seconds)."""
+
+    def __init__(self, window: int = 128):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> float | None:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        idx = min(len(ordered) - 1, max(0, int(round(p * (len(ordered) - 1)))))
+        return ordered[idx]
+
+
+class Upstream:
+    """Resilience state for one upstream provider (breaker + observed latency)."""
+
+    MIN_SAMPLES = 20
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS)
+        self.latency = LatencyTracker()
+
+    def timeout(self) -> float:
+        """
+        Timeout derived from the latency percentile, clamped to
+        [ADAPTIVE_TIMEOUT_MIN_SECONDS, REQUEST_TIMEOUT_SECONDS]. Until enough
+        samples exist the static REQUEST_TIMEOUT_SECONDS is used.
+        """
+        ceiling = settings.REQUEST_TIMEOUT_SECONDS
+        if len(self.latency) < self.MIN_SAMPLES:
+            return ceiling
+        p = self.latency.percentile(settings.ADAPTIVE_TIMEOUT_PERCENTILE) or ceiling
+        return max(settings.ADAPTIVE_TIMEOUT_MIN_SECONDS, min(ceiling, p * settings.ADAPTIVE_TIMEOUT_MULTIPLIER))
+
+    def snapshot(self) -> dict:
+        p50 = self.latency.percentile(0.5)
+        p95 = self.latency.percentile(0.95)
+        return {
+            "circuit": self.breaker.state,
+            "timeout_seconds": round(self.timeout(), 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+_registry: Dict[str, Upstream] = {}
+_registry_lock = threading.Lock()
+
+
+def get_upstream(name: str) -> Upstream:
+    up = _registry.get(name)
+    if up is None:
+        with _registry_lock:
+            up = _registry.setdefault(name, Upstream(name))
+    return up
+
+
+def upstream_health() -> Dict[str, dict]:
+    return {name: up.snapshot() for name, up in sorted(_registry.items())}
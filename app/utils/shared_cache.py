@@ -0,0 +1,178 @@
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+from app.utils import codec
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS shared_lease (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    holder TEXT NOT NULL,
+    until REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+"""
+
+# Take the lease only if nobody holds it or the holder's lease ran out (crashed worker)
+_TAKE_LEASE = """
+INSERT INTO shared_lease (namespace, key, holder, until) VALUES (?, ?, ?, ?)
+ON CONFLICT (namespace, key) DO UPDATE SET holder = excluded.holder, until = excluded.until
+WHERE shared_lease.until < ?
+"""
+
+
+def create_owner_only(path: str) -> None:
+    """Create the SQLite file `path` (and its directory) readable and writable by its owner only."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # SQLite gives the -wal and -shm files the database file's permissions
+    os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+    os.chmod(path, 0o600)
+
+
+class SharedCache:
+    """
+    Host-wide cache tier shared by every worker process: one SQLite file (WAL,
+    so readers never block the writer) holding values encoded by app.utils.codec
+    with absolute expiry times. The file is created readable by its owner only. A refresh lease per key makes sure only one worker calls the
+    upstream when a value expires; the others wait for its result.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.holder = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._writes = 0
+        self.stats_counts: Dict[str, int] = {"hits": 0, "misses": 0, "leases": 0, "waits": 0}
+        create_owner_only(path)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # Connections are per thread and never cross a fork
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+            self.holder = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=2.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, expires_at) if an unexpired value exists."""
+        try:
+            row = self._conn().execute(
+                "SELECT value, expires_at FROM shared_cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, time.time()),
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            self.stats_counts["misses"] += 1
+            return None
+        try:
+            value = codec.loads(row[0])
+        except ValueError:
+            return None
+        self.stats_counts["hits"] += 1
+        return value, row[1]
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: float) -> float:
+        """Store a value for `ttl_seconds`; returns its expiry time."""
+        now = time.time()
+        expires_at = now + ttl_seconds
+        try:
+            blob = codec.dumps(value)
+        except TypeError:
+            return expires_at
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO shared_cache (namespace, key, expires_at, value) VALUES (?, ?, ?, ?)",
+                (namespace, key, expires_at, blob),
+            )
+            self._writes += 1
+            if self._writes % 256 == 0:
+                conn.execute("DELETE FROM shared_cache WHERE expires_at <= ?", (now,))
+                conn.execute("DELETE FROM shared_lease WHERE until <= ?", (now,))
+        except sqlite3.Error:
+            pass
+        return expires_at
+
+    def acquire(self, namespace: str, key: str, seconds: float) -> bool:
+        """Try to become the one worker refreshing this key; atomic across processes."""
+        now = time.time()
+        try:
+            cur = self._conn().execute(_TAKE_LEASE, (namespace, key, self.holder, now + seconds, now))
+        except sqlite3.Error:
+            return True  # store unavailable: behave like a plain per-process cache
+        if cur.rowcount == 1:
+            self.stats_counts["leases"] += 1
+            return True
+        return False
+
+    def release(self, namespace: str, key: str) -> None:
+        try:
+            self._conn().execute(
+                "DELETE FROM shared_lease WHERE namespace = ? AND key = ? AND holder = ?", (namespace, key, self.holder)
+            )
+        except sqlite3.Error:
+            pass
+
+    def wait(self, namespace: str, key: str, timeout: float) -> Optional[Tuple[Any, float]]:
+        """Poll for the value another worker is refreshing; None if it did not arrive in time."""
+        self.stats_counts["waits"] += 1
+        deadline = time.monotonic() + timeout
+        delay = 0.01
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            hit = self.get(namespace, key)
+            if hit is not None:
+                return hit
+            delay = min(delay * 2, 0.1)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, **self.stats_counts}
+
+
+_shared: Optional[SharedCache] = None
+_shared_lock = threading.Lock()
+_shared_failed = False
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """The SHARED_CACHE_PATH tier, or None when unset (or the file cannot be opened)."""
+    global _shared, _shared_failed
+    if not settings.SHARED_CACHE_PATH or _shared_failed:
+        return None
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None and not _shared_failed:
+                try:
+                    _shared = SharedCache(settings.SHARED_CACHE_PATH)
+                except (OSError, sqlite3.Error):
+                    _shared_failed = True
+    return _shared
+
+
+def shared_cache_stats() -> Dict[str, Any]:
+    shared = get_shared_cache()
+    return shared.stats() if shared is not None else {"enabled": False}
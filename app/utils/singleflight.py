@@ -0,0 +1,116 @@
+from __future__ import annotations
+import asyncio
+import functools
+import inspect
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one execution.
+    The first caller runs the function; callers arriving while it is in flight
+    wait and receive the same result (or exception). Nothing is cached after
+    the call completes.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # Futures are bound to a loop, so coalescing is per event loop
+        loop = asyncio.get_running_loop()
+        loop_key = (id(loop), key)
+        fut = self._async_calls.get(loop_key)
+        if fut is not None:
+            return await asyncio.shield(fut)
+        fut = loop.create_future()
+        self._async_calls[loop_key] = fut
+        try:
+            result = await fn()
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            # Mark retrieved so a leader-only failure does not log "exception never retrieved"
+            fut.exception()
+            raise
+        finally:
+            self._async_calls.pop(loop_key, None)
+
+
+_group = SingleFlight()
+
+
+def _make_key(namespace: str, args: tuple, kwargs: dict) -> Hashable:
+    return (namespace, args, tuple(sorted(kwargs.items())))
+
+
+def singleflight(namespace: str) -> Callable:
+    """
+    Decorator that coalesces concurrent identical calls (same namespace and
+    arguments). Works for plain functions called from threads and for
+    coroutine functions awaited on an event loop. Wrapped plain functions also
+    get an ``aio`` attribute so asyncio code can await them: waiters on the
+    same loop share one worker thread, which in turn joins any thread-based
+    call already in flight.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                key = _make_key(namespace, args, kwargs)
+                return await _group.ado(key, lambda: fn(*args, **kwargs))
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = _make_key(namespace, args, kwargs)
+            return _group.do(key, lambda: fn(*args, **kwargs))
+
+        async def aio(*args, **kwargs):
+            key = _make_key(namespace, args, kwargs)
+            return await _group.ado(key, lambda: asyncio.to_thread(wrapper, *args, **kwargs))
+
+        wrapper.aio = aio  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorator
+
@@ -0,0 +1,120 @@
+"""
+Cold-start benchmark for the MCP stdio server.
+
+Spawns `python -m app.mcp_server` repeatedly, sends `initialize` and then
+`tools/list`, and measures wall time from process spawn to each response.
+Also checks that importing the server module does not pull in the heavy
+dependencies that are supposed to load lazily.
+
+    python benchmarks/bench_startup.py --runs 10 --budget-ms 400
+
+Exits non-zero if the median time to the `tools/list` response exceeds the
+budget or a heavy module is imported eagerly.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ["pydantic", "pydantic_settings", "httpx", "ics", "arrow", "numpy", "app.config", "app.services.pipeline"]
+
+
+def _frame(msg: Dict[str, Any]) -> bytes:
+    body = json.dumps(msg).encode("utf-8")
+    return f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body
+
+
+def _read_response(stream) -> Dict[str, Any]:
+    headers: Dict[str, str] = {}
+    while True:
+        line = stream.readline()
+        if not line:
+            raise RuntimeError("server closed stdout")
+        line = line.strip()
+        if not line:
+            break
+        k, _, v = line.decode("ascii").partition(":")
+        headers[k.strip().lower()] = v.strip()
+    return json.loads(stream.read(int(headers["content-length"])))
+
+
+def measure_once() -> Tuple[float, float]:
+    env = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONDONTWRITEBYTECODE="0")
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.mcp_server"],
+        cwd=ROOT,
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        init = {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {"protocolVersion": "2025-06-18"}}
+        proc.stdin.write(_frame(init))
+        proc.stdin.flush()
+        _read_response(proc.stdout)
+        t_init = time.perf_counter() - start
+
+        proc.stdin.write(_frame({"jsonrpc": "2.0", "id": 2, "method": "tools/list", "params": {}}))
+        proc.stdin.flush()
+        resp = _read_response(proc.stdout)
+        t_list = time.perf_counter() - start
+        if not resp.get("result", {}).get("tools"):
+            raise RuntimeError(f"unexpected tools/list response: {resp}")
+    finally:
+        proc.stdin.close()
+        proc.kill()
+        proc.wait()
+    return t_init, t_list
+
+
+def eager_heavy_imports() -> List[str]:
+    code = (
+        "import sys, json, app.mcp_server; "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("MCP_STARTUP_BUDGET_MS", 400)))
+    args = parser.parse_args()
+
+    measure_once()  # warm the OS page cache and .pyc files
+    inits: List[float] = []
+    lists: List[float] = []
+    for _ in range(args.runs):
+        t_init, t_list = measure_once()
+        inits.append(t_init * 1000)
+        lists.append(t_list * 1000)
+
+    med_init = statistics.median(inits)
+    med_list = statistics.median(lists)
+    print(f"initialize: median {med_init:.1f} ms, max {max(inits):.1f} ms")
+    print(f"tools/list: median {med_list:.1f} ms, max {max(lists):.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    eager = eager_heavy_imports()
+    ok = med_list <= args.budget_ms and not eager
+    if eager:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(eager)}")
+    if med_list > args.budget_ms:
+        print("FAIL: cold start exceeds budget")
+    if ok:
+        print("OK")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.services import calendar
+from app.utils import http
+
+
+def _ics(*events):
+    body = "".join(
+        f"BEGIN:VEVENT\r\nUID:{uid}\r\nDTSTAMP:20250101T000000Z\r\nDTSTART:{start}\r\nSUMMARY:{title}\r\n"
+        + (f"LOCATION:{location}\r\n" if location else "")
+        + "END:VEVENT\r\n"
+        for uid, start, title, location in events
+    )
+    return f"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//test//EN\r\n{body}END:VCALENDAR\r\n"
+
+
+WORK = _ics(
+    ("w1", "20300105T150000Z", "Standup", "1 Main St, New York, NY"),
+    ("w2", "20300103T150000Z", "Review", "2 Main St, New York, NY"),
+    ("w3", "20300102T150000Z", "Call", None),
+)
+HOME = _ics(
+    ("h1", "20300104T150000Z", "Dentist", "3 Court St, Brooklyn, NY"),
+    ("w2", "20300103T150000Z", "Review", "2 Main St, New York, NY"),
+)
+
+
+class _FeedClient:
+    def __init__(self, feeds, delays=None):
+        self.feeds = feeds
+        self.delays = delays or {}
+        self.requests = []
+
+    def request(self, method, url, timeout=None, params=None, headers=None, **kwargs):
+        self.requests.append((url, dict(headers or {})))
+        time.sleep(self.delays.get(url, 0.0))
+        etag = f'"{len(self.feeds[url])}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            return httpx.Response(304)
+        return httpx.Response(200, text=self.feeds[url], headers={"ETag": etag})
+
+
+@pytest.fixture
+def feeds(monkeypatch):
+    def install(urls, texts, delays=None):
+        client = _FeedClient(dict(zip(urls, texts)), delays)
+        monkeypatch.setattr(http, "get_shared_http_client", lambda: client)
+        monkeypatch.setattr(settings, "CALENDAR_ICS_URLS", ",".join(urls))
+        return client
+
+    monkeypatch.setattr(http, "get_limiter", lambda name: None)
+    monkeypatch.setattr(calendar, "_feeds", {})
+    monkeypatch.setattr(settings, "GOOGLE_CALENDAR_ICS_URL", None)
+    return install
+
+
+def test_feed_urls_are_combined_without_duplicates(monkeypatch):
+    monkeypatch.setattr(settings, "CALENDAR_ICS_URLS", " https://a/x.ics, https://b/y.ics ,,")
+    monkeypatch.setattr(settings, "GOOGLE_CALENDAR_ICS_URL", "https://a/x.ics")
+    assert calendar.calendar_feed_urls() == ["https://a/x.ics", "https://b/y.ics"]
+
+
+def test_feeds_are_merged_soonest_first(feeds):
+    feeds(["https://cal.test/merge-work.ics", "https://cal.test/merge-home.ics"], [WORK, HOME])
+    events = calendar.get_upcoming_events_from_ics(limit=10)
+    # The shared event appears once; the event without a location is left out
+    assert [title for title, _, _ in events] == ["Review", "Dentist", "Standup"]
+    assert events[0] == ("Review", "2030-01-03T15:00:00+00:00", "2 Main St, New York, NY")
+    assert [t for t, _, _ in calendar.get_upcoming_events_from_ics(limit=2)] == ["Review", "Dentist"]
+
+
+def test_unchanged_feed_is_revalidated_with_its_etag(feeds, monkeypatch):
+    monkeypatch.setattr(settings, "CALENDAR_CACHE_TTL_SECONDS", 0)
+    client = feeds(["https://cal.test/etag-work.ics"], [WORK])
+    first = calendar.get_upcoming_events_from_ics()
+    second = calendar.get_upcoming_events_from_ics()
+    assert first == second and len(first) == 2
+    assert client.requests[0][1] == {}
+    assert client.requests[1][1]["If-None-Match"] == f'"{len(WORK)}"'
+
+
+def test_slow_feed_misses_the_deadline_without_blocking(feeds, monkeypatch):
+    monkeypatch.setattr(settings, "CALENDAR_FEED_DEADLINE_SECONDS", 0.2)
+    slow, fast = "https://cal.test/slow-home.ics", "https://cal.test/fast-work.ics"
+    feeds([fast, slow], [WORK, HOME], delays={slow: 0.6})
+    start = time.monotonic()
+    events = calendar.get_upcoming_events_from_ics()
+    assert time.monotonic() - start < 0.5
+    assert [t for t, _, _ in events] == ["Review", "Standup"]
+    # The slow fetch finishes in the background and is served by the next call
+    calendar._feeds[slow].pending.result(timeout=2)
+    assert [t for t, _, _ in calendar.get_upcoming_events_from_ics()] == ["Review", "Dentist", "Standup"]
+
+
+def test_concurrent_callers_share_one_fetch(feeds):
+    url = "https://cal.test/shared.ics"
+    client = feeds([url], [WORK], delays={url: 0.2})
+    threads = [threading.Thread(target=calendar.get_upcoming_events_from_ics) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(client.requests) == 1
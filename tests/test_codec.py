@@ -0,0 +1,79 @@
+import math
+import os
+import pickle
+import stat
+
+import pytest
+
+from app.services.cities.base import OutageRecord
+from app.services.directions import RouteCandidate, RouteStep
+from app.services.osm import VenueAccess
+from app.utils import codec
+from app.utils.lastgood import LastGoodStore
+from app.utils.shared_cache import SharedCache
+
+
+def _route() -> RouteCandidate:
+    steps = [
+        RouteStep("WALKING", 120, 150, polyline="_p~iF~ps|U_ulLnnqC"),
+        RouteStep("TRANSIT", 900, 6000, line="Q", vehicle="SUBWAY", departure_stop="86 St", arrival_stop="Canal St", num_stops=7),
+    ]
+    return RouteCandidate("Q train", 25, 0, "transit", "https://maps.example/q", steps, polyline="_p~iF~ps|U")
+
+
+def test_cached_values_round_trip():
+    rec = OutageRecord("86 St (Q)", "EL801", "EL", "current", reason="Repair")
+    values = [
+        (40.7, -73.9, "New York, NY"),
+        ("Light rain", None),
+        {"dt": [1.0, 2.0], "temp": [3.5, math.nan]},
+        (VenueAccess("limited", "ramp", entrance="yes", distance_m=12.5),),
+        (None,),
+        {rec.key: rec},
+        {"__codec__": "tuple", "items": []},
+    ]
+    for value in values:
+        decoded = codec.loads(codec.dumps(value))
+        if isinstance(value, dict) and "temp" in value:
+            assert decoded["dt"] == value["dt"] and decoded["temp"][0] == 3.5 and math.isnan(decoded["temp"][1])
+        else:
+            assert decoded == value and type(decoded) is type(value)
+
+    [route] = codec.loads(codec.dumps([_route()]))
+    assert isinstance(route, RouteCandidate)
+    assert route.as_dict() == _route().as_dict()
+    assert route.stops == ["86 St", "Canal St"] and route.walking_m == 150
+    assert route.coords.shape[1] == 2
+
+
+def test_unknown_types_are_refused():
+    with pytest.raises(TypeError):
+        codec.dumps(object())
+    with pytest.raises(ValueError):
+        codec.loads(b'{"__codec__": "os.system", "value": "id"}')
+
+
+class _Boom:
+    def __reduce__(self):
+        return (pytest.fail, ("pickle payload was executed",))
+
+
+def test_shared_cache_is_private_and_ignores_pickles(tmp_path):
+    path = tmp_path / "shared.sqlite3"
+    cache = SharedCache(str(path))
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    cache.set("directions", "k", [_route()], 60)
+    [route] = cache.get("directions", "k")[0]
+    assert route.as_dict() == _route().as_dict()
+
+    cache._conn().execute("UPDATE shared_cache SET value = ?", (pickle.dumps(_Boom()),))
+    assert cache.get("directions", "k") is None
+
+
+def test_last_good_survives_restart(tmp_path):
+    path = str(tmp_path / "last_good.sqlite3")
+    rec = OutageRecord("86 St (Q)", "EL801", "EL", "current")
+    LastGoodStore(path).put("nyc_outage_records", "[]", {rec.key: rec})
+    value, _ = LastGoodStore(path).get("nyc_outage_records", "[]")
+    assert value == {rec.key: rec}
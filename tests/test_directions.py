@@ -0,0 +1,71 @@
+import time
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.services import directions
+from app.utils import http
+
+
+def _route(summary, seconds, steps):
+    return {"summary": summary, "legs": [{"duration": {"value": seconds}, "steps": steps}], "overview_polyline": {"points": "_p~iF~ps|U"}}
+
+
+def _bus_step(line):
+    return {"travel_mode": "TRANSIT", "duration": {"value": 600}, "distance": {"value": 3000},
+            "transit_details": {"line": {"short_name": line, "vehicle": {"type": "BUS"}},
+                                "departure_stop": {"name": "A"}, "arrival_stop": {"name": "B"}, "num_stops": 5}}
+
+
+_RESPONSES = {
+    "transit": [_route("M1", 1500, [_bus_step("M1")]), _route("M1", 1500, [_bus_step("M1")])],
+    "walking": [_route("5th Ave", 2400, [{"travel_mode": "WALKING", "duration": {"value": 2400}, "distance": {"value": 3000}}])],
+    "driving": [_route("FDR Dr", 900, [{"travel_mode": "DRIVING", "duration": {"value": 900}, "distance": {"value": 5000}}])],
+}
+
+
+class _DirectionsClient:
+    def __init__(self, delays):
+        self.delays = delays
+        self.modes = []
+
+    def request(self, method, url, timeout=None, params=None, **kwargs):
+        mode = params["mode"]
+        self.modes.append(mode)
+        time.sleep(self.delays.get(mode, 0.0))
+        return httpx.Response(200, json={"routes": _RESPONSES[mode]})
+
+
+@pytest.fixture
+def directions_client(monkeypatch):
+    def install(delays):
+        client = _DirectionsClient(delays)
+        monkeypatch.setattr(http, "get_shared_http_client", lambda: client)
+        return client
+
+    monkeypatch.setattr(http, "get_limiter", lambda name: None)
+    monkeypatch.setattr(settings, "GOOGLE_MAPS_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "DIRECTIONS_MODES", "transit,walking,driving")
+    return install
+
+
+def test_modes_are_fetched_concurrently_and_merged(directions_client):
+    client = directions_client({"transit": 0.3, "walking": 0.3, "driving": 0.3})
+    start = time.monotonic()
+    routes = directions._fetch_all_modes("Times Square", "The Met", None)
+    assert time.monotonic() - start < 0.8
+    assert sorted(client.modes) == ["driving", "transit", "walking"]
+    # The duplicate transit route is merged away; all-bus transit is labelled bus
+    assert [(r.mode, r.duration_min) for r in routes] == [("bus", 25), ("walk", 40), ("drive", 15)]
+    assert routes[0].steps[0].line == "M1" and routes[0].stops == ["A", "B"]
+    assert "dirflg=w" in routes[1].maps_url and "dirflg=d" in routes[2].maps_url
+
+
+def test_late_mode_is_dropped_at_the_deadline(directions_client, monkeypatch):
+    monkeypatch.setattr(settings, "DIRECTIONS_DEADLINE_SECONDS", 0.3)
+    directions_client({"driving": 1.5})
+    start = time.monotonic()
+    routes = directions._fetch_all_modes("Times Square", "Brooklyn Museum", None)
+    assert time.monotonic() - start < 1.0
+    assert [r.mode for r in routes] == ["bus", "walk"]
@@ -0,0 +1,103 @@
+from app.models.schemas import ContextBullet
+from app.services.directions import RouteCandidate, RouteStep
+from app.services.fusion import fuse_context
+from app.services.terrain import SlopeProfile
+from app.services.formatter import (
+    _truncate_words,
+    build_context_package,
+    compact_context_text,
+    encode_context_compact,
+    estimate_tokens,
+)
+
+
+def _package(texts):
+    bullets = [
+        ContextBullet(type="route_summary", text=texts[0], citations=["https://example.com/route"]),
+        *(ContextBullet(type="weather_risk", text=t, citations=[]) for t in texts[1:]),
+    ]
+    return build_context_package(
+        event_title="Museum Visit",
+        event_start_iso="2030-01-01T16:00:00-05:00",
+        event_location="The Met",
+        origin_label="Home",
+        origin_address="Times Square",
+        bullets=bullets,
+        alternative="Alternative: bus (55 min)",
+        raw_links=["https://example.com/route"],
+        sources=["directions"],
+    )
+
+
+def _size(enc):
+    return estimate_tokens([compact_context_text(enc)])
+
+
+def test_truncate_words_adds_ellipsis_only_when_words_removed():
+    assert _truncate_words("short text", 50) == "short text"
+    assert _truncate_words("one two three four five six", 3).endswith("…")
+
+
+def test_compact_encoding_respects_token_budget():
+    long_text = " ".join(f"word{i}" for i in range(80))
+    pkg = _package([long_text, "Light rain expected around arrival time"])
+    # Event and origin alone; no budget can go below this
+    floor = _size(encode_context_compact(pkg.model_copy(update={"highlights": [], "alternatives": []})))
+    full = _size(encode_context_compact(pkg))
+    for budget in range(floor, full + 1):
+        enc = encode_context_compact(pkg, token_budget=budget)
+        assert _size(enc) <= budget, budget
+
+
+def test_compact_encoding_drops_low_priority_bullets_first_and_keeps_order():
+    bullets = [
+        ContextBullet(type="route_summary", text="Take Q train (25 min).", citations=[]),
+        ContextBullet(type="accessibility_alert", text="Elevator outage at 57 St.", citations=[]),
+        ContextBullet(type="venue_access", text="Destination wheelchair access: yes", citations=[]),
+        ContextBullet(type="weather_risk", text="Light rain expected around arrival time", citations=[]),
+        ContextBullet(type="buffer_recommendation", text="Leave by 3:35 PM.", citations=[]),
+    ]
+    pkg = build_context_package(
+        "Museum Visit", "2030-01-01T16:00:00-05:00", "The Met", "Home", "Times Square",
+        bullets, "Alternative: bus (55 min)", ["https://example.com/route"], ["directions"],
+    )
+    full = encode_context_compact(pkg)
+    assert [h[0] for h in full["h"]] == ["route", "alert", "venue", "weather", "leave"]
+
+    enc = encode_context_compact(pkg, token_budget=_size(full) - 1)
+    # Weather is the least important bullet; the alternatives outlive it
+    assert [h[0] for h in enc["h"]] == ["route", "alert", "venue", "leave"]
+    assert enc["alt"]
+
+    without_alt = _encode_tokens(pkg, bullets[1:2])
+    enc = encode_context_compact(pkg, token_budget=without_alt)
+    assert [h[0] for h in enc["h"]] == ["alert"] and "alt" not in enc
+
+
+def _encode_tokens(pkg, bullets):
+    return _size(encode_context_compact(pkg.model_copy(update={"highlights": bullets, "alternatives": []})))
+
+
+def test_buffer_bullet_survives_with_every_bullet_kind():
+    walk = RouteStep("WALKING", 300, 400)
+    ride = RouteStep("TRANSIT", 900, 5000, line="Q", departure_stop="86 St", arrival_stop="57 St")
+    best = RouteCandidate("Take Q train (25 min)", 25, 0, "transit", "https://example.com/route", [walk, ride])
+    slope = SlopeProfile(max_grade_pct=14.0, sustained_grade_pct=3.0, steep_m=40.0, walking_m=400.0, worst_leg=0)
+    fused = fuse_context(
+        [best],
+        "2030-01-01T16:00:00-05:00",
+        20,
+        ["Elevator outage at 57 St"],
+        ("yes", "ramp at side entrance"),
+        "Light rain expected around arrival time",
+        slopes={best: slope},
+    )
+    pkg = build_context_package(
+        "Museum Visit", "2030-01-01T16:00:00-05:00", "The Met", "Home", "Times Square",
+        fused.bullets, None, fused.raw_links, ["directions"],
+    )
+    kinds = [b.type for b in pkg.highlights]
+    assert kinds == [
+        "route_summary", "accessibility_alert", "slope_warning", "venue_access", "weather_risk", "buffer_recommendation",
+    ]
+    assert pkg.highlights[-1].text.startswith("Leave by")
@@ -0,0 +1,24 @@
+from app.services.gazetteer import Gazetteer, normalize
+
+
+def _gazetteer() -> Gazetteer:
+    return Gazetteer(
+        [
+            (40.6782, -73.9442, "Brooklyn", [normalize("Brooklyn")]),
+            (40.6921, -73.9910, "55 Court St, Brooklyn", [normalize("55 Court St")]),
+            (40.7794, -73.9632, "The Met, 1000 5th Ave", [normalize("The Met"), normalize("1000 5th Ave")]),
+        ]
+    )
+
+
+def test_lookup_ignores_trailing_locality_parts():
+    gaz = _gazetteer()
+    assert gaz.lookup("Dr Smith, 55 Court St, Brooklyn, NY") == (40.6921, -73.9910, "55 Court St, Brooklyn")
+    # Only the city matches: leave it to the remote geocoder
+    assert gaz.lookup("Dr Smith, Brooklyn, NY") is None
+
+
+def test_lookup_matches_leading_venue_part():
+    gaz = _gazetteer()
+    assert gaz.lookup("The Met, New York, NY")[2] == "The Met, 1000 5th Ave"
+    assert gaz.lookup("Museum, 1000 Fifth Avenue, Manhattan")[2] == "The Met, 1000 5th Ave"
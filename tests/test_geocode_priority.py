@@ -0,0 +1,53 @@
+import threading
+import time
+
+import httpx
+
+from app.config import settings
+from app.services import geocode
+from app.utils import http
+from app.utils.ratelimit import TokenBucket, batch_priority
+
+
+class _FakeClient:
+    def __init__(self):
+        self.served = []
+        self.lock = threading.Lock()
+
+    def request(self, method, url, timeout=None, params=None, **kwargs):
+        if "googleapis" in url:
+            return httpx.Response(200, json={"results": []})
+        with self.lock:
+            self.served.append(params["q"])
+        return httpx.Response(200, json=[{"lat": "40.7", "lon": "-73.9", "display_name": params["q"]}])
+
+
+def test_batch_geocode_yields_to_later_interactive_one(monkeypatch):
+    bucket = TokenBucket("nominatim", rate=4.0, burst=1, max_queue=10, max_wait=5.0)
+    bucket.acquire()  # drain it so both calls have to queue
+    client = _FakeClient()
+    monkeypatch.setattr(http, "get_limiter", lambda name: bucket if name == "nominatim" else None)
+    monkeypatch.setattr(http, "get_shared_http_client", lambda: client)
+    monkeypatch.setattr(settings, "GOOGLE_MAPS_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "GEOCODE_STRATEGY", "hedged")
+    monkeypatch.setattr(settings, "GEOCODE_HEDGE_DELAY_SECONDS", 0.0)
+    monkeypatch.setattr(settings, "GAZETTEER_PATH", None)
+
+    def batch():
+        with batch_priority():
+            geocode.geocode_address("batch address for priority test")
+
+    def queued():
+        return bucket.snapshot()["queued"]
+
+    t_batch = threading.Thread(target=batch)
+    t_batch.start()
+    deadline = time.monotonic() + 2
+    while queued() < 1 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    t_interactive = threading.Thread(target=geocode.geocode_address, args=("interactive address for priority test",))
+    t_interactive.start()
+    t_batch.join(5)
+    t_interactive.join(5)
+
+    assert client.served == ["interactive address for priority test", "batch address for priority test"]
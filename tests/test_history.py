@@ -0,0 +1,40 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import mcp_server
+from app.config import settings
+from app.main import app
+from app.services import history
+
+
+@pytest.fixture
+def history_in_missing_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_DB_PATH", str(tmp_path / "data" / "history.sqlite3"))
+    monkeypatch.setattr(history, "_store", None)
+    yield tmp_path / "data"
+    if history._store is not None:
+        history._store.close()
+
+
+def test_history_creates_parent_directory(history_in_missing_dir):
+    resp = TestClient(app).get("/history")
+    assert resp.status_code == 200
+    assert history_in_missing_dir.is_dir()
+
+
+@pytest.mark.parametrize(
+    "uri",
+    [
+        "context/history?limit=abc",
+        "context/history?cursor=1.5",
+        "context/history?since=yesterday",
+    ],
+)
+def test_mcp_history_rejects_malformed_params(history_in_missing_dir, uri):
+    with pytest.raises(mcp_server.InvalidParams):
+        mcp_server._resources_read(uri)
+
+
+def test_mcp_history_accepts_valid_params(history_in_missing_dir):
+    result = mcp_server._resources_read("context/history?limit=5&since=2020-01-01T00:00:00")
+    assert result["contents"]
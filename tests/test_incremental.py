@@ -0,0 +1,71 @@
+from app.services.directions import RouteCandidate
+from app.services.fusion import fuse_context
+from app.services.incremental import RecentResults, refuse
+
+ARRIVAL = "2030-01-01T16:00:00-05:00"
+
+
+def _routes():
+    return [
+        RouteCandidate("Take Q train (25 min)", 25, 0, "transit", "https://example.com/q"),
+        RouteCandidate("Take bus M1 (40 min)", 40, 0, "transit", "https://example.com/m1"),
+    ]
+
+
+def _inputs(**overrides):
+    inputs = dict(
+        candidates=_routes(),
+        arrivals_iso=ARRIVAL,
+        buffer_min=20,
+        outages_texts=["Elevator outage at 57 St"],
+        venue_wc=("yes", ""),
+        weather_risk="Light rain expected around arrival time",
+    )
+    inputs.update(overrides)
+    return inputs
+
+
+def _versions(**overrides):
+    versions = dict(routes="r1", outages="o1", venue="v1", weather="w1", arrival="a1", buffer="b1", slope="s1", reliability="l1")
+    versions.update(overrides)
+    return versions
+
+
+def test_cold_refuse_matches_fuse_context():
+    state, recomputed = refuse(None, _versions(), **_inputs())
+    expected = fuse_context(**_inputs())
+    assert [b.model_dump() for b in state.fused.bullets] == [b.model_dump() for b in expected.bullets]
+    assert state.fused.leave_by_iso == expected.leave_by_iso
+    assert "ranking" in recomputed and "buffer_recommendation" in recomputed
+
+
+def test_unchanged_inputs_reuse_everything():
+    state, _ = refuse(None, _versions(), **_inputs())
+    again, recomputed = refuse(state, _versions(), **_inputs())
+    assert recomputed == []
+    assert again.fused is state.fused
+
+
+def test_only_bullets_of_changed_inputs_are_rebuilt():
+    state, _ = refuse(None, _versions(), **_inputs())
+    venue, recomputed = refuse(state, _versions(venue="v2"), **_inputs(venue_wc=("limited", "side door")))
+    assert recomputed == ["venue_access"]
+    by_kind = {b.type: b for b in venue.fused.bullets}
+    assert by_kind["venue_access"].text == "Destination wheelchair access: limited — side door"
+    for old in state.fused.bullets:
+        if old.type != "venue_access":
+            assert by_kind[old.type] is old
+
+    later, recomputed = refuse(venue, _versions(venue="v2", buffer="b2"), **_inputs(venue_wc=("limited", "side door"), buffer_min=30))
+    assert recomputed == ["leave_by", "buffer_recommendation"]
+    assert later.fused.leave_by_iso == "2030-01-01T15:05:00-05:00"
+
+
+def test_recent_results_keeps_the_newest_entries():
+    recent = RecentResults(max_entries=2)
+    recent.put(("a",), 1)
+    recent.put(("b",), 2)
+    assert recent.get(("a",)) == 1  # now the most recent
+    recent.put(("c",), 3)
+    assert recent.get(("b",)) is None
+    assert recent.get(("a",)) == 1 and recent.get(("c",)) == 3
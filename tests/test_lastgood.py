@@ -0,0 +1,64 @@
+import os
+import stat
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.services import osm
+from app.utils import lastgood
+
+
+@pytest.fixture
+def live_mode(monkeypatch):
+    monkeypatch.setattr(settings, "MOCK_MODE", False)
+    monkeypatch.setattr(lastgood, "_store", lastgood.LastGoodStore(None))
+
+
+def test_upstream_errors_are_served_from_last_good(live_mode):
+    answers = ["fresh", httpx.ConnectError("down")]
+
+    @lastgood.last_good("test_upstream", "test")
+    def fetch(x):
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    assert fetch(1) == "fresh"
+    with lastgood.track_staleness() as stale:
+        assert fetch(1) == "fresh"
+    assert "test" in stale
+
+
+def test_programming_errors_propagate(live_mode):
+    calls = []
+
+    @lastgood.last_good("test_bug", "test")
+    def fetch(x):
+        calls.append(x)
+        if len(calls) > 1:
+            return {}["missing"]
+        return "fresh"
+
+    assert fetch(1) == "fresh"
+    with pytest.raises(KeyError):
+        fetch(1)
+
+
+def test_store_file_is_owner_only(tmp_path):
+    path = tmp_path / "data" / "last_good.sqlite3"
+    lastgood.LastGoodStore(str(path))
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_untagged_venue_is_remembered(live_mode, monkeypatch):
+    results = [[None], None]
+    monkeypatch.setattr(osm, "_fetch_batch", lambda points: results.pop(0))
+    point = (40.1234, -73.5678)
+    assert osm.get_venue_accessibility_batch([point]) == [None]
+    osm._venue_lookup.cache_clear()
+    with lastgood.track_staleness() as stale:
+        assert osm.get_venue_accessibility_batch([point]) == [None]
+    # Answered from the remembered "nothing tagged", not from nothing at all
+    assert "osm_overpass" in stale
@@ -0,0 +1,66 @@
+import httpx
+import pytest
+
+from app.config import settings
+from app.services import osm
+from app.utils import http
+
+MET = (40.7794, -73.9632)
+MOMA = (40.7614, -73.9776)
+
+
+class _OverpassClient:
+    def __init__(self, elements):
+        self.elements = elements
+        self.queries = []
+
+    def request(self, method, url, timeout=None, data=None, **kwargs):
+        self.queries.append(data["data"])
+        return httpx.Response(200, json={"elements": self.elements})
+
+
+@pytest.fixture
+def overpass(monkeypatch):
+    client = _OverpassClient(
+        [
+            # Near the Met: a far feature, the nearest feature, and a tagged entrance
+            {"type": "node", "id": 1, "lat": MET[0] + 0.0005, "lon": MET[1], "tags": {"wheelchair": "no", "name": "Kiosk"}},
+            {"type": "way", "id": 2, "center": {"lat": MET[0] + 0.0001, "lon": MET[1]},
+             "tags": {"wheelchair": "yes", "name": "The Met", "wheelchair:description": "81st St entrance",
+                      "toilets:wheelchair": "yes"}},
+            {"type": "node", "id": 3, "lat": MET[0], "lon": MET[1] + 0.0001, "tags": {"entrance": "main", "wheelchair": "limited"}},
+            # Near MoMA: only an entrance is tagged
+            {"type": "node", "id": 4, "lat": MOMA[0], "lon": MOMA[1] + 0.0002, "tags": {"entrance": "yes", "wheelchair": "yes"}},
+        ]
+    )
+    monkeypatch.setattr(http, "get_shared_http_client", lambda: client)
+    monkeypatch.setattr(http, "get_limiter", lambda name: None)
+    osm._venue_lookup.cache_clear()
+    yield client
+    osm._venue_lookup.cache_clear()
+
+
+def test_batch_lookup_uses_one_union_query(overpass):
+    met, moma, nowhere = osm.get_venue_accessibility_batch([MET, MOMA, (40.0, -74.5)])
+    assert len(overpass.queries) == 1
+    assert met.name == "The Met" and met.wheelchair == "yes" and met.osm_id == "way/2"
+    assert met.note == "81st St entrance" and met.entrance == "limited" and met.toilets == "yes"
+    assert met.distance_m == pytest.approx(11.1, abs=0.5)
+    # Only an entrance tagged: it stands in for the venue
+    assert moma.wheelchair == "yes" and moma.entrance == "yes" and moma.name is None
+    assert nowhere is None
+
+
+def test_batch_results_fill_the_per_venue_cache(overpass):
+    osm.get_venue_accessibility_batch([MET, MOMA])
+    assert osm.get_venue_wheelchair_tag(*MET) == ("yes", "81st St entrance")
+    assert osm.get_venue_accessibility_batch([MOMA, MET])[1].name == "The Met"
+    assert len(overpass.queries) == 1
+
+
+def test_batches_are_split_by_batch_size(overpass, monkeypatch):
+    monkeypatch.setattr(settings, "OVERPASS_BATCH_SIZE", 2)
+    points = [MET, MOMA, (40.0, -74.5), (40.1, -74.4), (40.2, -74.3)]
+    osm.get_venue_accessibility_batch(points)
+    assert len(overpass.queries) == 3
+    assert overpass.queries[0].count("nwr[\"wheelchair\"]") == 2
@@ -0,0 +1,35 @@
+import os
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.utils import profiling
+
+
+def test_profiling_is_off_by_default():
+    assert settings.model_fields["PROFILING_ENABLED"].default is False
+    with profiling.maybe_profiled(True, "test") as profiler:
+        assert profiler is None
+
+
+def test_profiles_capped_oldest_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_MAX_FILES", 3)
+    paths = []
+    for i in range(5):
+        profiler = profiling.SamplingProfiler(f"run{i}")
+        paths.append(profiler.save(str(tmp_path)))
+        os.utime(paths[-1], (1000 + i, 1000 + i))
+    (tmp_path / "notes.txt").write_text("kept")
+    profiling.prune_profiles(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(p) for p in paths[2:]] + ["notes.txt"])
+
+
+def test_profiles_endpoint_requires_profiling(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    name = os.path.basename(profiling.SamplingProfiler("served").save())
+    client = TestClient(app)
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", False)
+    assert client.get(f"/profiles/{name}").status_code == 404
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    assert client.get(f"/profiles/{name}").status_code == 200
@@ -0,0 +1,105 @@
+import itertools
+from datetime import datetime, timezone
+
+from dateutil import tz as dateutil_tz
+from dateutil.rrule import rrulestr
+
+from app.services import calendar
+from app.services.recurrence import RecurringSeries, _jump_ahead, parse_ics_datetimes
+
+NY = dateutil_tz.gettz("America/New_York")
+
+
+def _starts(series, after, n):
+    return [iso for _, _, iso, _ in itertools.islice(series.occurrences(after.timestamp()), n)]
+
+
+def _full_expansion(rule, start, after, n):
+    return [dt.isoformat() for dt in itertools.islice((d for d in rrulestr(rule, dtstart=start) if d > after), n)]
+
+
+def test_jump_ahead_matches_full_expansion():
+    cases = [
+        ("FREQ=WEEKLY;BYDAY=MO,TH", datetime(2015, 3, 2, 9, 30, tzinfo=NY)),
+        ("FREQ=MONTHLY", datetime(2016, 1, 31, 18, 0, tzinfo=NY)),
+        ("FREQ=YEARLY", datetime(2012, 2, 29, 12, 0, tzinfo=timezone.utc)),
+        ("FREQ=DAILY;INTERVAL=3", datetime(2019, 11, 2, 8, 0, tzinfo=NY)),
+        ("FREQ=HOURLY;INTERVAL=5", datetime(2024, 3, 9, 22, 0, tzinfo=timezone.utc)),
+    ]
+    after = datetime(2030, 3, 9, 12, 0, tzinfo=NY)
+    for rule, start in cases:
+        series = RecurringSeries("Class", "1 Main St", start, rule=rule, rdates=[start])
+        assert _starts(series, after, 6) == _full_expansion(rule, start, after, 6), rule
+
+
+def test_jump_ahead_skips_the_history():
+    start = datetime(2000, 1, 3, 9, 0, tzinfo=NY)
+    rule, restart = _jump_ahead("FREQ=WEEKLY", start, datetime(2030, 1, 1, tzinfo=NY))
+    assert rule == "FREQ=WEEKLY"
+    assert datetime(2029, 12, 1, tzinfo=NY) < restart < datetime(2030, 1, 1, tzinfo=NY)
+    assert restart.weekday() == start.weekday() and restart.hour == 9
+
+
+def test_count_rules_keep_their_start():
+    start = datetime(2020, 1, 1, 9, 0, tzinfo=timezone.utc)
+    assert _jump_ahead("FREQ=DAILY;COUNT=5", start, datetime(2030, 1, 1, tzinfo=timezone.utc)) == ("FREQ=DAILY;COUNT=5", start)
+    series = RecurringSeries("Course", "1 Main St", start, rule="FREQ=DAILY;COUNT=5", rdates=[start])
+    assert _starts(series, datetime(2020, 1, 3, tzinfo=timezone.utc), 10) == [
+        "2020-01-03T09:00:00+00:00", "2020-01-04T09:00:00+00:00", "2020-01-05T09:00:00+00:00",
+    ]
+    assert _starts(series, datetime(2030, 1, 1, tzinfo=timezone.utc), 1) == []
+
+
+def test_occurrences_keep_the_zone_and_apply_skips_and_rdates():
+    start = datetime(2020, 1, 6, 9, 0, tzinfo=NY)
+    skipped = datetime(2030, 3, 11, 9, 0, tzinfo=NY)
+    extra = datetime(2030, 3, 13, 17, 0, tzinfo=NY)
+    series = RecurringSeries(
+        "Standup", "1 Main St", start, rule="FREQ=WEEKLY",
+        rdates=[start, extra], skip=frozenset({skipped.timestamp()}),
+    )
+    # DST starts 2030-03-10 in New York: 09:00 local moves from -05:00 to -04:00
+    assert _starts(series, datetime(2030, 3, 1, tzinfo=NY), 4) == [
+        "2030-03-04T09:00:00-05:00", "2030-03-13T17:00:00-04:00",
+        "2030-03-18T09:00:00-04:00", "2030-03-25T09:00:00-04:00",
+    ]
+
+
+def test_parse_ics_datetimes_forms():
+    utc, local, day, period = (
+        parse_ics_datetimes("20300101T150000Z", {}, NY),
+        parse_ics_datetimes("20300101T100000", {"TZID": ["America/New_York"]}, None),
+        parse_ics_datetimes("20300101,bad", {}, NY),
+        parse_ics_datetimes("20300101T150000Z/PT1H", {}, None),
+    )
+    assert utc == period == [datetime(2030, 1, 1, 15, tzinfo=timezone.utc)]
+    assert local[0].timestamp() == utc[0].timestamp()
+    assert day == [datetime(2030, 1, 1, tzinfo=NY)]
+
+
+FEED = (
+    "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//test//EN\r\n"
+    "BEGIN:VEVENT\r\nUID:weekly\r\nDTSTAMP:20200101T000000Z\r\nDTSTART:20200106T140000Z\r\n"
+    "RRULE:FREQ=WEEKLY\r\nEXDATE:20300107T140000Z\r\nSUMMARY:Standup\r\nLOCATION:1 Main St, New York, NY\r\nEND:VEVENT\r\n"
+    "BEGIN:VEVENT\r\nUID:weekly\r\nDTSTAMP:20200101T000000Z\r\nRECURRENCE-ID:20300114T140000Z\r\n"
+    "DTSTART:20300115T160000Z\r\nSUMMARY:Standup (moved)\r\nLOCATION:2 Main St, New York, NY\r\nEND:VEVENT\r\n"
+    "BEGIN:VEVENT\r\nUID:weekly\r\nDTSTAMP:20200101T000000Z\r\nRECURRENCE-ID:20300121T140000Z\r\n"
+    "DTSTART:20300121T140000Z\r\nSTATUS:CANCELLED\r\nSUMMARY:Standup\r\nLOCATION:1 Main St, New York, NY\r\nEND:VEVENT\r\n"
+    "END:VCALENDAR\r\n"
+)
+
+
+def test_parse_feed_expands_series_with_overrides():
+    events, series = calendar._parse_feed(FEED)
+    assert [title for _, title, _, _ in events] == ["Standup (moved)"]
+    assert len(series) == 1
+    merged = itertools.islice(calendar._merged(
+        [calendar.FeedState("x", events=events, starts=[e[0] for e in events], series=series)],
+        datetime(2030, 1, 1, tzinfo=timezone.utc).timestamp(),
+    ), 3)
+    # 01-07 is an EXDATE, 01-14 moved to 01-15, 01-21 cancelled
+    assert [(title, iso) for _, title, iso, _ in merged] == [
+        ("Standup (moved)", "2030-01-15T16:00:00+00:00"),
+        ("Standup", "2030-01-28T14:00:00+00:00"),
+        ("Standup", "2030-02-04T14:00:00+00:00"),
+    ]
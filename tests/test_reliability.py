@@ -0,0 +1,65 @@
+import pytest
+
+from app.config import settings
+from app.services.cities.base import CityProvider, OutageRecord
+from app.utils import lastgood
+
+
+class FlakyCity(CityProvider):
+    code = "testcity"
+    name = "Test City"
+    feed_up = True
+
+    def fetch_outage_records(self):
+        if not self.feed_up:
+            return None
+        rec = OutageRecord("Main St", "EL101", "EL", "current")
+        return {rec.key: rec}
+
+
+@pytest.fixture
+def live_mode(monkeypatch):
+    monkeypatch.setattr(settings, "MOCK_MODE", False)
+    monkeypatch.setattr(settings, "RELIABILITY_PATH", None)
+    monkeypatch.setattr(lastgood, "_store", lastgood.LastGoodStore(None))
+
+
+def test_live_snapshot_is_recorded(live_mode):
+    city = FlakyCity()
+    assert city.station_statuses() == {"Main St": "Multiple accessibility equipment outages"}
+    assert city.station_unavailability()["Main St"] > 0
+
+
+def test_last_good_snapshot_is_not_recorded(live_mode):
+    FlakyCity().outage_records()  # a worker that read the feed before it went down
+    city = FlakyCity()
+    city.feed_up = False
+    city.outage_records.__wrapped__.cache_clear()
+    before = dict(city.station_unavailability())
+    assert city.station_statuses() == {"Main St": "Multiple accessibility equipment outages"}
+    assert city.station_unavailability() == before
+
+
+class PlannedWorkCity(FlakyCity):
+    def fetch_outage_records(self):
+        rec = OutageRecord("Main St", "EL101", "EL", "upcoming")
+        return {rec.key: rec}
+
+
+def test_planned_outages_are_not_recorded(live_mode):
+    city = PlannedWorkCity()
+    assert city.station_statuses()
+    assert city.station_unavailability() == {}
+    assert city.history.stats()["buckets_observed"] == 1
+
+
+def test_every_worker_records_shared_snapshots(live_mode, tmp_path, monkeypatch):
+    from app.utils import shared_cache
+
+    monkeypatch.setattr(settings, "SHARED_CACHE_PATH", str(tmp_path / "shared.sqlite3"))
+    monkeypatch.setattr(shared_cache, "_shared", None)
+    FlakyCity().outage_records()  # the worker holding the refresh lease
+    other = FlakyCity()
+    other.feed_up = False  # would fail if it read the feed itself
+    assert other.station_statuses()
+    assert other.station_unavailability()["Main St"] > 0
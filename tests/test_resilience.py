@@ -0,0 +1,107 @@
+import time
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.services import geocode
+from app.utils import http, resilience
+from app.utils.resilience import CircuitBreaker, CircuitOpenError, Upstream
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_then_lets_one_probe_through(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # one probe at a time
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_timeout_adapts_to_observed_latency():
+    up = Upstream("test_adaptive")
+    assert up.timeout() == settings.REQUEST_TIMEOUT_SECONDS
+    for _ in range(Upstream.MIN_SAMPLES):
+        up.latency.record(0.1)
+    assert up.timeout() == settings.ADAPTIVE_TIMEOUT_MIN_SECONDS
+    for _ in range(128):
+        up.latency.record(1.0)
+    assert up.timeout() == pytest.approx(min(settings.REQUEST_TIMEOUT_SECONDS, 1.0 * settings.ADAPTIVE_TIMEOUT_MULTIPLIER))
+
+
+class _CountingClient:
+    def __init__(self, status):
+        self.status = status
+        self.calls = 0
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls += 1
+        return httpx.Response(self.status)
+
+
+def test_open_circuit_fails_fast_without_touching_the_network(monkeypatch):
+    monkeypatch.setattr(settings, "CIRCUIT_FAILURE_THRESHOLD", 2)
+    client = _CountingClient(503)
+    monkeypatch.setattr(http, "get_shared_http_client", lambda: client)
+    monkeypatch.setattr(http, "get_limiter", lambda name: None)
+    for _ in range(2):
+        assert http.upstream_request("test_failing", "GET", "https://example.invalid/").status_code == 503
+    with pytest.raises(CircuitOpenError):
+        http.upstream_request("test_failing", "GET", "https://example.invalid/")
+    assert client.calls == 2
+
+
+class _GeocodeClient:
+    def __init__(self, google_delay):
+        self.google_delay = google_delay
+
+    def request(self, method, url, timeout=None, params=None, **kwargs):
+        if "googleapis" in url:
+            time.sleep(self.google_delay)
+            return httpx.Response(200, json={"results": [
+                {"geometry": {"location": {"lat": 1.0, "lng": 2.0}}, "formatted_address": "google"}
+            ]})
+        return httpx.Response(200, json=[{"lat": "40.7", "lon": "-73.9", "display_name": "nominatim"}])
+
+
+def test_hedged_geocode_answers_from_nominatim_when_google_is_slow(monkeypatch):
+    monkeypatch.setattr(http, "get_shared_http_client", lambda: _GeocodeClient(1.0))
+    monkeypatch.setattr(http, "get_limiter", lambda name: None)
+    monkeypatch.setattr(settings, "GOOGLE_MAPS_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "GEOCODE_STRATEGY", "hedged")
+    monkeypatch.setattr(settings, "GEOCODE_HEDGE_DELAY_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "GAZETTEER_PATH", None)
+    start = time.monotonic()
+    assert geocode.geocode_address("hedged geocode test address") == (40.7, -73.9, "nominatim")
+    assert time.monotonic() - start < 0.8
+
+
+def test_sequential_geocode_prefers_google(monkeypatch):
+    monkeypatch.setattr(http, "get_shared_http_client", lambda: _GeocodeClient(0.0))
+    monkeypatch.setattr(http, "get_limiter", lambda name: None)
+    monkeypatch.setattr(settings, "GOOGLE_MAPS_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "GEOCODE_STRATEGY", "sequential")
+    monkeypatch.setattr(settings, "GAZETTEER_PATH", None)
+    assert geocode.geocode_address("sequential geocode test address") == (1.0, 2.0, "google")
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+from app.services import sessions as sessions_mod
+from app.services.sessions import SessionStore
+
+
+def test_peek_treats_expired_session_as_missing(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions_mod.time, "monotonic", lambda: now[0])
+    store = SessionStore(max_sessions=10, ttl_seconds=60, max_bytes=1 << 20)
+    store.set_last_package("alice", {"k": 1})
+    assert store.peek("alice").last_context_package == {"k": 1}
+
+    now[0] += 61
+    assert store.peek("alice") is None
+    # peek does not refresh it either
+    assert store.peek("alice") is None
+
+
+def test_peek_does_not_refresh_session(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions_mod.time, "monotonic", lambda: now[0])
+    store = SessionStore(max_sessions=10, ttl_seconds=60, max_bytes=1 << 20)
+    store.get("bob")
+    now[0] += 40
+    assert store.peek("bob") is not None
+    now[0] += 30
+    assert store.peek("bob") is None
+
+
+
+def test_mcp_session_falls_back_to_home_address(monkeypatch):
+    from app import mcp_server
+    from app.config import settings
+    from app.services import history, pipeline
+    from app.services.formatter import build_context_package
+
+    used = []
+
+    def run_pipeline(title, start, location, origin, buffer_minutes, **kwargs):
+        used.append(origin)
+        pkg = build_context_package(title, start, location, "Origin", origin, [], None, [], [])
+        return SimpleNamespace(package=pkg)
+
+    monkeypatch.setattr(settings, "HOME_ADDRESS", "Times Square, New York, NY")
+    monkeypatch.setattr(pipeline, "run_pipeline", run_pipeline)
+    monkeypatch.setattr(history, "record_history", lambda session_id, result: None)
+    pkg = mcp_server._orchestrate_build_context(True, None, 20, session_id="mcp-client-7")
+    assert used == ["Times Square, New York, NY"]
+    assert pkg.origin.address == "Times Square, New York, NY"
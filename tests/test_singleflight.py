@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.utils.singleflight import singleflight
+
+
+def test_concurrent_identical_calls_run_once():
+    gate = threading.Event()
+    calls = []
+
+    @singleflight("test_sf_threads")
+    def fetch(x):
+        calls.append(x)
+        gate.wait(5)
+        return x * 2
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(fetch, 21) for _ in range(8)]
+        time.sleep(0.2)  # let every caller join the flight
+        gate.set()
+        assert [f.result() for f in futures] == [42] * 8
+    assert calls == [21]
+    # Nothing is cached once the flight has landed
+    assert fetch(21) == 42 and calls == [21, 21]
+
+
+def test_different_arguments_do_not_share_a_flight():
+    calls = []
+
+    @singleflight("test_sf_keys")
+    def fetch(x):
+        calls.append(x)
+        return x
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        assert sorted(pool.map(fetch, [1, 2, 3, 4])) == [1, 2, 3, 4]
+    assert sorted(calls) == [1, 2, 3, 4]
+
+
+def test_waiters_receive_the_leaders_error():
+    gate = threading.Event()
+    calls = []
+
+    @singleflight("test_sf_errors")
+    def fetch():
+        calls.append(1)
+        gate.wait(5)
+        raise RuntimeError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(fetch) for _ in range(4)]
+        time.sleep(0.2)
+        gate.set()
+        for f in futures:
+            with pytest.raises(RuntimeError, match="upstream down"):
+                f.result()
+    assert calls == [1]
+
+
+def test_async_callers_share_one_thread_call():
+    calls = []
+
+    @singleflight("test_sf_async")
+    def fetch(x):
+        calls.append(x)
+        time.sleep(0.1)
+        return x + 1
+
+    async def main():
+        return await asyncio.gather(*(fetch.aio(1) for _ in range(5)))
+
+    assert asyncio.run(main()) == [2] * 5
+    assert calls == [1]
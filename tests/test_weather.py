@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.config import settings
+from app.services import weather
+
+# 2030-01-01 20:00 UTC = 15:00 in New York
+_START = int(datetime(2030, 1, 1, 20, tzinfo=timezone.utc).timestamp())
+
+
+def _hours(rain):
+    return {
+        "dt": [float(_START + 3600 * i) for i in range(len(rain))],
+        "rain": rain,
+        "snow": [0.0] * len(rain),
+        "wind": [1.0] * len(rain),
+        "temp": [5.0] * len(rain),
+    }
+
+
+@pytest.fixture
+def live_weather(monkeypatch):
+    monkeypatch.setattr(settings, "MOCK_MODE", False)
+    monkeypatch.setattr(settings, "OPENWEATHER_API_KEY", "test-key")
+    fetched = []
+
+    def fetch(tile_lat, tile_lon):
+        fetched.append((tile_lat, tile_lon))
+        # Heavy rain from 16:00 New York time, only on the northern tile
+        return _hours([0.0, 3.0, 0.0] if tile_lat > 40.7 else [0.0, 0.0, 0.0])
+
+    monkeypatch.setattr(weather, "_fetch_hourly", fetch)
+    return fetched
+
+
+def test_corridor_weather_fetches_each_tile_once_and_covers_the_trip(live_weather):
+    points = [(40.61, -73.99), (40.612, -73.991), (40.78, -73.96)]
+    exposure = weather.get_corridor_weather(points, "2030-01-01T15:30:00-05:00", "2030-01-01T16:10:00-05:00")
+    assert len(live_weather) == exposure.tiles == 2
+    assert exposure.hazards == ["heavy rain"]
+    assert exposure.penalty == 2
+
+
+def test_worst_hour_is_shown_in_the_event_zone(live_weather):
+    exposure = weather.get_corridor_weather([(40.78, -73.96)], "2030-01-01T15:30:00-05:00", "2030-01-01T16:10:00-05:00")
+    assert "worst around 16:00)" in exposure.risk_text
+    assert exposure.worst_hour_iso == "2030-01-01T16:00:00-05:00"
+
+
+def test_worst_hour_without_event_zone_says_utc(live_weather):
+    exposure = weather.get_corridor_weather([(40.78, -73.96)], "2030-01-01T20:30:00", "2030-01-01T21:10:00")
+    assert "worst around 21:00 UTC)" in exposure.risk_text
+
+
+def test_trip_outside_forecast_uses_nearest_hour(live_weather):
+    exposure = weather.get_corridor_weather([(40.78, -73.96)], None, "2030-01-05T12:00:00-05:00")
+    assert exposure.hazards == []
+    assert exposure.hours == 1